@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from common.get_data import get_watchlist_hist, get_since, set_default_source
+from common.data_source import FileSource
+from common.memo import ResultCache, content_hash, DEFAULT_MAX_BYTES
+from common import profiling
+from common.profiling import profiled
+from indicators.pipeline import run_pipeline
+from indicators.render import render_chart, init_worker, FORMATS
+import stockview
+
+
+# Batch run of stockview over a watchlist.
+# Every symbol is one job (indicators + charts) on a process pool. The results are memoized in a ResultCache
+# (see common/memo.py): the indicator columns under a hash of the bars and the indicator config, every chart
+# under a hash of the bars, the symbol (part of the file name and title), the indicator config, the chart parameters
+# and the format. Symbols whose bars did not change since the last run are served from the cache without starting a job.
+
+# Config file (JSON), all keys optional:
+#   {"years": 4, "fmt": "pdf", "indicators": [["sma", {"window_size": 50}], ...], "charts": [["adx", {"adx_num": 14}], ...]}
+# The bars start on the first day of the month years ago (see window_start), or on "start" (e.g. "2020-01-01") if given.
+DEFAULT_CONFIG = {
+    'years': 4,
+    'start': None,
+    'fmt': 'pdf',
+    'indicators': stockview.indicators,
+    'charts': stockview.charts,
+}
+
+
+def read_config(path: str = None) -> dict :
+    """DEFAULT_CONFIG updated with the JSON file path (if given).
+    """
+    config = dict(DEFAULT_CONFIG)
+    if path is not None :
+        with open(path) as f :
+            config.update(json.load(f))
+    config['indicators'] = [(name, dict(params)) for name, params in config['indicators']]
+    config['charts'] = [(chart, dict(params)) for chart, params in config['charts']]
+    assert config['fmt'] in FORMATS, f"Unknown output format {config['fmt']}. Available: {FORMATS}"
+    return config
+
+
+def window_start(config: dict, today: pd.Timestamp = None) -> pd.Timestamp :
+    """First day of the bars: config['start'] or the first day of the month config['years'] before today.
+    The start moves only once a month, so the bars and result cache keys of symbols without new bars stay the same
+    from one daily run to the next.
+    """
+    if config['start'] is not None :
+        return pd.Timestamp(config['start'])
+    today = pd.Timestamp.today() if today is None else pd.Timestamp(today)
+    return (today - pd.DateOffset(years=config['years'])).normalize().replace(day=1)
+
+
+def read_watchlist(path: str) -> list[str] :
+    """Ticker symbols of a watchlist file: one per line, '#' starts a comment.
+    """
+    with open(path) as f :
+        symbols = [line.split('#')[0].strip() for line in f]
+    return [symbol for symbol in symbols if symbol]
+
+
+def _symbol_job(symbol: str, df: pd.core.frame.DataFrame, config: dict, results: pd.core.frame.DataFrame,
+    charts: list[int], path: str, memory: bool = None) :
+    """Compute the indicators of one symbol (if results is None) and render the charts with the given positions in
+    config['charts']. Returns (results, {position: file}, recorded profile or None).
+    """
+    def run() :
+        with profiling.symbol(symbol) :
+            res = run_pipeline(df, config['indicators']) if results is None else results
+            full = df.join(res)
+            files = {i: render_chart(path, symbol, config['charts'][i][0], full, config['charts'][i][1], config['fmt']) for i in charts}
+        return res, files
+
+    if memory is None :
+        return (*run(), None)
+    with profiling.profile(memory=memory) as prof :
+        res, files = run()
+    return res, files, (prof.events, prof.counters)
+
+
+@profiled('run')
+def run_batch(histories: dict[str, pd.core.frame.DataFrame], config: dict, path: str, memo: ResultCache = None,
+    max_workers: int = None) -> tuple[dict, dict, dict] :
+    """Indicators and charts of config for every {symbol: bars} in histories, rendered into path.
+    Work found in memo (default: ResultCache()) is skipped; new results are added to it and the cache is evicted
+    to its size limit afterwards. max_workers=1 runs in the calling process.
+    Returns ({symbol: indicator DataFrame}, {symbol: [chart file names in path]}, {symbol: exception}).
+    """
+    memo = ResultCache() if memo is None else memo
+    os.makedirs(path, exist_ok=True)
+    results, files, failures, jobs = {}, {}, {}, {}
+    for symbol, df in histories.items() :
+        key = content_hash(df, 'indicators', config['indicators'])
+        results[symbol] = memo.get_frame(key)
+        files[symbol] = [None] * len(config['charts'])
+        keys = [content_hash(df, 'chart', symbol, config['indicators'], chart, params, config['fmt']) for chart, params in config['charts']]
+        for i, chart_key in enumerate(keys) :
+            files[symbol][i] = memo.get_file(chart_key, path)
+        missing = [i for i, file in enumerate(files[symbol]) if file is None]
+        if results[symbol] is None or missing :
+            jobs[symbol] = (key, keys, missing)
+
+    def store(symbol: str, res: pd.core.frame.DataFrame, rendered: dict) :
+        key, keys, _ = jobs[symbol]
+        if results[symbol] is None :
+            memo.put_frame(key, res)
+            results[symbol] = res
+        for i, file in rendered.items() :
+            memo.put_file(keys[i], file)
+            files[symbol][i] = os.path.basename(file)
+
+    if max_workers == 1 or len(jobs) <= 1 :
+        for symbol, (_, _, missing) in jobs.items() :
+            try :
+                res, rendered, _ = _symbol_job(symbol, histories[symbol], config, results[symbol], missing, path)
+                store(symbol, res, rendered)
+            except Exception as e :
+                failures[symbol] = e
+    elif jobs :
+        prof = profiling.active()
+        memory = None if prof is None else prof.memory
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker) as executor :
+            futures = {
+                executor.submit(_symbol_job, symbol, histories[symbol], config, results[symbol], missing, path, memory): symbol
+                for symbol, (_, _, missing) in jobs.items()}
+            for future in as_completed(futures) :
+                symbol = futures[future]
+                try :
+                    res, rendered, recorded = future.result()
+                    store(symbol, res, rendered)
+                except Exception as e :
+                    failures[symbol] = e
+                    continue
+                if recorded is not None :
+                    prof.merge(*recorded)
+    memo.evict()
+
+    for symbol in failures :
+        results.pop(symbol, None)
+        files.pop(symbol, None)
+    return results, {symbol: [file for file in names if file is not None] for symbol, names in files.items()}, failures
+
+
+def main(argv: list[str] = None) -> int :
+    parser = argparse.ArgumentParser(description='Compute the indicators and render the charts for a watchlist.')
+    parser.add_argument('watchlist', help='file with one ticker symbol per line')
+    parser.add_argument('--config', help='JSON file with years or start, fmt, indicators and charts (default: those of stockview.py)')
+    parser.add_argument('--output', default=os.getcwd(), help='directory of the charts')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes (default: all cores)')
+    parser.add_argument('--memo-dir', default=None, help='result cache directory (default: $STOCKVIEW_MEMO_DIR or <cache>/results)')
+    parser.add_argument('--csv-dir', default=None, help='read the bars from CSV files in this directory instead of Yahoo Finance (bypasses the download cache)')
+    parser.add_argument('--memo-size', type=float, default=DEFAULT_MAX_BYTES / 2**20, help='result cache size limit in MiB')
+    args = parser.parse_args(argv)
+
+    config = read_config(args.config)
+    fetch_args = {}
+    if args.csv_dir is not None :
+        set_default_source(FileSource(args.csv_dir))
+        # The download cache is keyed only by ticker and interval, the CSV bars must not end up in it.
+        fetch_args['cache'] = False
+    data, failures = get_watchlist_hist(read_watchlist(args.watchlist), fetch=get_since, start=window_start(config), **fetch_args)
+    memo = ResultCache(args.memo_dir, max_bytes=int(args.memo_size * 2**20))
+    results, files, errors = run_batch(data, config, args.output, memo=memo, max_workers=args.workers)
+    failures.update(errors)
+    print(f'{len(files)} symbols done, {sum(len(names) for names in files.values())} charts in {args.output}')
+    for symbol, error in failures.items() :
+        print(f'Failed {symbol}: {error}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main())
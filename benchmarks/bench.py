@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import cached_property
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_ohlcv
+from common.cache import write_hist
+from common.data_source import DataSource
+from common.get_data import get_cached_stock_hist
+from indicators.moving_average import add_sma, add_ema, add_wma
+from indicators.trend_indicators import add_true_range, add_average_true_range, add_adx, add_macd
+from indicators.price_channels import add_bollinger_bands, add_donchian_channel, add_keltner_channel
+from indicators.pipeline import run_pipeline
+from indicators.backtest import backtest_grid
+from indicators.render import CHARTS, render_chart
+import stockview
+
+
+# Offline benchmark suite: python -m benchmarks.bench [--sizes ...] [--only ...] [--output ...] [--baseline ...]
+# Every benchmark runs on deterministic synthetic bars (benchmarks/synthetic.py), data access is replayed
+# from a local cache, so no network is needed and results are comparable between runs.
+# Wall time is the best of --repeat runs; peak memory is the tracemalloc peak of one extra run
+# (NumPy and pandas buffers are included, memory-mapped files are not).
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+MAX_PLOT_BARS = 10_000
+TICKER = 'BENCH'
+
+
+class ReplaySource(DataSource) :
+    """Serves fixed bars like a download (respecting start), used instead of yfinance.
+    """
+    def __init__(self, df: pd.core.frame.DataFrame) :
+        super().__init__(retries=0, backoff=0.0)
+        self.df = df
+
+    def history(self, company: str, period: str = None, interval: str = '1d', start=None) -> pd.core.frame.DataFrame :
+        if start is not None :
+            return self.df[self.df.index >= start]
+        return self.df
+
+
+class _Data :
+    """Inputs of the benchmarks for one size; derived inputs are built on first use (outside the timings).
+    """
+    def __init__(self, n_bars: int, workdir: str) :
+        self.n_bars = n_bars
+        self.workdir = workdir
+        self.bars = synthetic_ohlcv(n_bars)
+        self._caches = 0
+
+    @cached_property
+    def indicators(self) -> pd.core.frame.DataFrame :
+        return self.bars.join(run_pipeline(df=self.bars, specs=stockview.indicators))
+
+    def empty_cache(self) -> str :
+        self._caches += 1
+        return os.path.join(self.workdir, f'cache{self._caches}')
+
+    @cached_property
+    def warm_cache(self) -> str :
+        cache_dir = self.empty_cache()
+        write_hist(self.bars, TICKER, '1d', cache_dir)
+        return cache_dir
+
+
+def _add(add_fn, **params) :
+    def setup(data) :
+        df = data.bars.copy()
+        return lambda : add_fn(df, **params)
+    return setup
+
+
+def _plot(chart: str, params: dict, downsample: bool) :
+    params = {**params, 'downsample': downsample}
+    return lambda data : lambda : render_chart(data.workdir, TICKER, chart, data.indicators, params)
+
+
+def _get_data(warm: bool) :
+    def setup(data) :
+        cache_dir = data.warm_cache if warm else data.empty_cache()
+        source = ReplaySource(data.bars)
+        return lambda : get_cached_stock_hist(TICKER, cache_dir=cache_dir, max_age=pd.Timedelta(days=365), source=source)
+    return setup
+
+
+def _stockview(data) :
+    cache_dir, source = data.warm_cache, ReplaySource(data.bars)
+
+    def run() :
+        df = get_cached_stock_hist(TICKER, cache_dir=cache_dir, max_age=pd.Timedelta(days=365), source=source)
+        files, failures = stockview.run_stockview(df, company=TICKER, path=data.workdir, max_workers=1)
+        assert not failures, f'Rendering failed: {failures}'
+    return run
+
+
+# Benchmark name -> (setup(data) -> function to time, size limited by max_plot_bars)
+BENCHMARKS = {
+    'add_sma': (_add(add_sma, window_size=50), False),
+    'add_ema': (_add(add_ema, n_smooth=10), False),
+    'add_wma': (_add(add_wma, window_size=5), False),
+    'add_true_range': (_add(add_true_range, tr_factor=14), False),
+    'add_average_true_range': (_add(add_average_true_range, window_size=14), False),
+    'add_adx': (_add(add_adx, n_smooth=14), False),
+    'add_macd': (_add(add_macd, fast=12, slow=26), False),
+    'add_bollinger_bands': (_add(add_bollinger_bands, sma_window=20, factor=2), False),
+    'add_donchian_channel': (_add(add_donchian_channel, window_size=20), False),
+    'add_keltner_channel': (_add(add_keltner_channel, ema_window=20, atr_range=20, atr_factor=2.0), False),
+    'run_pipeline': (lambda data : lambda : run_pipeline(df=data.bars, specs=stockview.indicators), False),
+    'backtest_grid': (lambda data : lambda : backtest_grid(
+        {TICKER: data.bars}, 'adx', {'n_smooth': [10, 14, 20], 'strong_trend': [20, 25]}), False),
+    'get_data:cold': (_get_data(warm=False), False),
+    'get_data:warm': (_get_data(warm=True), False),
+    'stockview': (_stockview, True),
+}
+for chart, params in stockview.charts :
+    BENCHMARKS[CHARTS[chart].__name__] = (_plot(chart, params, downsample=False), True)
+    BENCHMARKS[f'{CHARTS[chart].__name__}:downsample'] = (_plot(chart, params, downsample=True), False)
+
+
+def measure(setup, data: _Data, repeat: int = 3) -> dict :
+    """Best wall time of repeat runs and peak traced memory of one run of setup(data)().
+    The first run includes one-time costs (e.g. numba compilation if not cached yet), so repeat should be > 1.
+    """
+    times = []
+    for _ in range(repeat) :
+        run = setup(data)
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    run = setup(data)
+    tracemalloc.start()
+    try :
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally :
+        tracemalloc.stop()
+    return {'seconds': min(times), 'peak_bytes': peak}
+
+
+def environment() -> dict :
+    try :
+        import numba
+        numba_version = numba.__version__
+    except ImportError :
+        numba_version = None
+    return {
+        'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+        'numpy': np.__version__, 'pandas': pd.__version__, 'matplotlib': matplotlib.__version__, 'numba': numba_version,
+        'date': pd.Timestamp.now(tz='UTC').isoformat()}
+
+
+def run_benchmarks(sizes: list[int] = DEFAULT_SIZES, only: list[str] = None, repeat: int = 3,
+    max_plot_bars: int = MAX_PLOT_BARS, log=print) -> dict :
+    """Run the benchmarks whose names start with one of only (all if None) for every size.
+    Benchmarks with a size limit (plots without downsampling, stockview) are capped at max_plot_bars.
+    Returns {'environment': ..., 'results': [{'name', 'bars', 'seconds', 'peak_bytes'}, ...]}.
+    """
+    names = [name for name in BENCHMARKS if only is None or any(name.startswith(prefix) for prefix in only)]
+    assert names, f'No benchmark matches {only}. Available: {list(BENCHMARKS)}'
+    results = []
+    for n_bars in sizes :
+        with tempfile.TemporaryDirectory() as workdir :
+            data = _Data(n_bars, workdir)
+            for name in names :
+                setup, limited = BENCHMARKS[name]
+                if limited and n_bars > max_plot_bars :
+                    continue
+                result = {'name': name, 'bars': n_bars, **measure(setup, data, repeat)}
+                log(f"{name:40s} {n_bars:>10d} bars {result['seconds']:10.4f} s {result['peak_bytes'] / 2**20:10.1f} MiB")
+                results.append(result)
+    return {'environment': environment(), 'results': results}
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.25, min_seconds: float = 5e-3,
+    min_bytes: int = 1 << 20) -> list[dict] :
+    """Regressions of results against baseline (both as returned by run_benchmarks).
+    A metric regresses if it grew by more than threshold (relative) and by more than min_seconds / min_bytes
+    (absolute, to ignore timer noise of very short benchmarks).
+    """
+    old = {(r['name'], r['bars']): r for r in baseline['results']}
+    regressions = []
+    for new in results['results'] :
+        ref = old.get((new['name'], new['bars']))
+        if ref is None :
+            continue
+        for metric, minimum in (('seconds', min_seconds), ('peak_bytes', min_bytes)) :
+            if new[metric] > ref[metric] * (1 + threshold) and new[metric] - ref[metric] > minimum :
+                regressions.append({'name': new['name'], 'bars': new['bars'], 'metric': metric,
+                    'baseline': ref[metric], 'value': new[metric], 'ratio': new[metric] / ref[metric]})
+    return regressions
+
+
+def main(argv: list[str] = None) -> int :
+    parser = argparse.ArgumentParser(description='Offline benchmarks of the indicators, plots and data access.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='numbers of bars (up to 10M)')
+    parser.add_argument('--only', nargs='+', help='run benchmarks whose names start with these prefixes')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-plot-bars', type=int, default=MAX_PLOT_BARS, help='size limit for plots without downsampling')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.25, help='relative growth reported as regression')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    args = parser.parse_args(argv)
+
+    if args.list :
+        print('\n'.join(BENCHMARKS))
+        return 0
+    results = run_benchmarks(sizes=args.sizes, only=args.only, repeat=args.repeat, max_plot_bars=args.max_plot_bars)
+    if args.output :
+        with open(args.output, 'w') as f :
+            json.dump(results, f, indent=1)
+    if args.baseline :
+        with open(args.baseline) as f :
+            regressions = compare(results, json.load(f), threshold=args.threshold)
+        for r in regressions :
+            print(f"REGRESSION {r['name']} ({r['bars']} bars): {r['metric']} {r['baseline']:.4g} -> {r['value']:.4g} ({r['ratio']:.2f}x)")
+        if regressions :
+            return 1
+        print('No regressions.')
+    return 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+# Import-time budget of the compute-only API: python -m benchmarks.startup [--modules ...] [--seconds ...] [--mib ...]
+# Every module is imported in fresh interpreters (the repository root on sys.path). Import time is the best of
+# --repeat runs (the first run also pays for cold file caches), resident memory is the peak RSS of the interpreter
+# after the import (including the interpreter itself). On Linux it is read from VmHWM, because ru_maxrss keeps the
+# peak of the parent process across fork and exec (e.g. when run from pytest); elsewhere ru_maxrss is used. Besides the budget, none of the FORBIDDEN
+# modules may be loaded: plotting, downloads and the compiled kernels import them lazily (see common/plotting.py,
+# common/data_source.py, indicators/kernels.py). The budget is about twice the measured import of indicators.compute
+# (0.3 s, 68 MiB with Python 3.11, pandas 3.0; importing numba or matplotlib as well exceeds the memory budget).
+# Exit code 1 if a module is over budget or loads a forbidden module; tests/test_startup.py runs the same check.
+
+DEFAULT_MODULES = ['indicators.compute']
+FORBIDDEN = ('matplotlib', 'yfinance', 'numba')
+BUDGET_SECONDS = 0.6
+BUDGET_MIB = 100
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**10 if sys.platform == 'darwin' else 1)
+try :
+    with open('/proc/self/status') as f :
+        kib = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+except (OSError, StopIteration) :
+    pass
+print(json.dumps({{
+    'seconds': seconds,
+    'mib': kib / 2**10,
+    'forbidden': sorted(name for name in {forbidden!r} if name in sys.modules),
+}}))
+'''
+
+
+def probe(module: str, forbidden: tuple = FORBIDDEN) -> dict :
+    """Import time (s), peak RSS (MiB) and loaded forbidden modules of one import in a fresh interpreter.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    out = subprocess.run([sys.executable, '-c', _PROBE.format(module=module, forbidden=tuple(forbidden))],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def check_startup(modules: list[str] = DEFAULT_MODULES, seconds: float = BUDGET_SECONDS, mib: float = BUDGET_MIB,
+    repeat: int = 3, forbidden: tuple = FORBIDDEN) -> list[dict] :
+    """Measure every module (best time and lowest peak RSS of repeat imports) against the budget.
+    Returns one result per module; 'violations' lists what is over budget.
+    """
+    results = []
+    for module in modules :
+        runs = [probe(module, forbidden) for _ in range(repeat)]
+        result = {
+            'module': module,
+            'seconds': min(run['seconds'] for run in runs),
+            'mib': min(run['mib'] for run in runs),
+            'forbidden': sorted(set().union(*(run['forbidden'] for run in runs))),
+        }
+        result['violations'] = [f"loads {', '.join(result['forbidden'])}"] if result['forbidden'] else []
+        if result['seconds'] > seconds :
+            result['violations'].append(f"import time {result['seconds']:.3f} s > {seconds:.3f} s")
+        if result['mib'] > mib :
+            result['violations'].append(f"peak RSS {result['mib']:.1f} MiB > {mib:.1f} MiB")
+        results.append(result)
+    return results
+
+
+def main(argv: list[str] = None) -> int :
+    parser = argparse.ArgumentParser(description='Check the import time and memory of the compute-only API.')
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES, help='modules to import')
+    parser.add_argument('--seconds', type=float, default=BUDGET_SECONDS, help='import time budget')
+    parser.add_argument('--mib', type=float, default=BUDGET_MIB, help='peak resident memory budget in MiB')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = check_startup(args.modules, seconds=args.seconds, mib=args.mib, repeat=args.repeat)
+    if args.output :
+        with open(args.output, 'w') as f :
+            json.dump(results, f, indent=1)
+    for r in results :
+        status = 'OVER BUDGET: ' + '; '.join(r['violations']) if r['violations'] else 'ok'
+        print(f"{r['module']}: {r['seconds']:.3f} s, {r['mib']:.1f} MiB peak RSS - {status}")
+    return 1 if any(r['violations'] for r in results) else 0
+
+
+if __name__ == '__main__' :
+    sys.exit(main())
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+
+# Deterministic synthetic OHLCV data for benchmarks (and offline experiments).
+# Close is a geometric random walk, High/Low lie around it and Open lies between them,
+# so every indicator sees realistic inputs (positive prices, High >= Close, Open >= Low, ...).
+
+
+def synthetic_ohlcv(n_bars: int, seed: int = 0, freq: str = 'min', end: str = '2024-01-02 16:00',
+    tz: str = 'America/New_York', volatility: float = 0.001) -> pd.core.frame.DataFrame :
+    """n_bars bars ending at end (same data for the same arguments).
+    The default frequency is one minute, so that even 10M bars have valid timestamps; use freq='B' for daily bars.
+    """
+    assert n_bars > 0, f'n_bars must be positive.'
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, volatility, n_bars)))
+    high = close * (1 + rng.uniform(0, 1.5 * volatility, n_bars))
+    low = close * (1 - rng.uniform(0, 1.5 * volatility, n_bars))
+    open_ = low + (high - low) * rng.uniform(0, 1, n_bars)
+    volume = rng.integers(1_000, 100_000, n_bars).astype(np.int64)
+    index = pd.date_range(end=end, periods=n_bars, freq=freq, tz=tz, name='Date')
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
@@ -0,0 +1,247 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from common.profiling import profiled
+
+
+# Layout of the cache (one directory per ticker and interval):
+#   <cache_dir>/<interval>/<TICKER>/meta.json   Columns, number of rows, time zone, last refresh
+#   <cache_dir>/<interval>/<TICKER>/index.bin   Bar timestamps (int64, ns since epoch, UTC)
+#   <cache_dir>/<interval>/<TICKER>/col<i>.bin  One raw little-endian file per column
+# The files are plain arrays, so they can be memory-mapped and sliced without loading the full history.
+# 'rows' in meta.json is authoritative: bytes behind it (e.g. after a crash) are ignored and overwritten.
+# Rows below 'rows' are never modified in place without a journal: an append that replaces cached bars (e.g. the
+# unfinished bar of the current day) first writes the new bars and their position to pending.npz, and read_meta
+# finishes an append that was interrupted. write_hist builds the files in a temporary directory which then replaces
+# the old one, so a crash leaves either the old history, the new one or no cache entry at all.
+
+DEFAULT_MAX_AGE = pd.Timedelta(hours=12)
+
+
+def default_cache_dir() -> str :
+    """Cache directory: $STOCKVIEW_CACHE_DIR or ~/.cache/stockview.
+    """
+    return os.environ.get('STOCKVIEW_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'stockview'))
+
+
+def _ticker_dir(ticker: str, interval: str, cache_dir: str = None) -> str :
+    return os.path.join(cache_dir or default_cache_dir(), interval, ticker.upper())
+
+
+def _write_meta(path: str, meta: dict) -> None :
+    tmp = os.path.join(path, 'meta.json.tmp')
+    with open(tmp, 'w') as f :
+        json.dump(meta, f, indent=1)
+    os.replace(tmp, os.path.join(path, 'meta.json'))
+
+
+def index_ns(index: pd.DatetimeIndex) -> np.ndarray :
+    """Timestamps of index as int64 nanoseconds since the epoch (UTC), the format of index.bin.
+    """
+    return np.asarray(index.as_unit('ns').asi8, dtype='<i8')
+
+
+def _column_arrays(df: pd.core.frame.DataFrame, columns: list[dict]) -> list[tuple[str, str, np.ndarray]] :
+    """(file, dtype, values) of the index and every column of df.
+    """
+    arrays = [('index.bin', '<i8', index_ns(df.index))]
+    return arrays + [(c['file'], c['dtype'], df[c['name']].to_numpy(dtype=c['dtype'])) for c in columns]
+
+
+def _write_columns(path: str, arrays: list[tuple[str, str, np.ndarray]], rows: int, mode: str) -> None :
+    """Write the arrays (see _column_arrays) behind the first rows entries of every file ('r+b') or into new files ('wb').
+    """
+    for file, dtype, values in arrays :
+        with open(os.path.join(path, file), mode) as f :
+            offset = rows * np.dtype(dtype).itemsize
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+
+def _write_pending(path: str, arrays: list[tuple[str, str, np.ndarray]], keep: int) -> None :
+    tmp = os.path.join(path, 'pending.tmp.npz')
+    np.savez(tmp, keep=keep, **{f'a{i}': values for i, (_, _, values) in enumerate(arrays)})
+    os.replace(tmp, os.path.join(path, 'pending.npz'))
+
+
+def _remove_pending(path: str) -> None :
+    try :
+        os.remove(os.path.join(path, 'pending.npz'))
+    except FileNotFoundError :
+        pass  # finished by a reader in the meantime
+
+
+def _finish_pending(path: str, meta: dict) -> dict :
+    """Redo an append that was interrupted while it replaced cached rows (see pending.npz above).
+    Returns the metadata after the append (meta itself if nothing was pending).
+    """
+    file = os.path.join(path, 'pending.npz')
+    try :
+        data = np.load(file)
+    except FileNotFoundError :
+        return meta
+    with data :
+        keep = int(data['keep'])
+        files = [('index.bin', '<i8')] + [(c['file'], c['dtype']) for c in meta['columns']]
+        arrays = [(name, dtype, data[f'a{i}']) for i, (name, dtype) in enumerate(files)]
+    _write_columns(path, arrays, rows=keep, mode='r+b')
+    meta['rows'] = keep + len(arrays[0][2])
+    _write_meta(path, meta)
+    _remove_pending(path)
+    return meta
+
+
+def read_meta(ticker: str, interval: str = '1d', cache_dir: str = None) -> dict :
+    """Metadata of a cached ticker or None if the ticker is not cached.
+    """
+    path = _ticker_dir(ticker, interval, cache_dir)
+    try :
+        with open(os.path.join(path, 'meta.json')) as f :
+            meta = json.load(f)
+    except FileNotFoundError :
+        return None
+    return _finish_pending(path, meta)
+
+
+def is_stale(meta: dict, max_age: pd.Timedelta = DEFAULT_MAX_AGE) -> bool :
+    """True if the cache entry was refreshed more than max_age ago (or does not exist).
+    """
+    if meta is None :
+        return True
+    return time.time() - meta['fetched'] > pd.Timedelta(max_age).total_seconds()
+
+
+@profiled('cache')
+def write_hist(df: pd.core.frame.DataFrame, ticker: str, interval: str = '1d', cache_dir: str = None) -> dict :
+    """Replace the cached history of ticker by df.
+    """
+    path = _ticker_dir(ticker, interval, cache_dir)
+    tmp = f'{path}.tmp{os.getpid()}'
+    os.makedirs(tmp, exist_ok=True)
+    df = df.sort_index()
+    columns = [{'name': name, 'file': f'col{i}.bin', 'dtype': np.dtype(dtype).newbyteorder('<').str}
+        for i, (name, dtype) in enumerate(df.dtypes.items())]
+    _write_columns(tmp, _column_arrays(df, columns), rows=0, mode='wb')
+    meta = {
+        'ticker': ticker.upper(), 'interval': interval,
+        'tz': None if df.index.tz is None else str(df.index.tz), 'index_name': df.index.name,
+        'columns': columns, 'rows': len(df), 'fetched': time.time(),
+    }
+    _write_meta(tmp, meta)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return meta
+
+
+@profiled('cache')
+def append_hist(df: pd.core.frame.DataFrame, ticker: str, interval: str = '1d', cache_dir: str = None) -> dict :
+    """Append new bars to the cached history of ticker.
+    Cached bars at or after the first new bar are replaced (e.g. an unfinished bar of the current day).
+    """
+    meta = read_meta(ticker, interval, cache_dir)
+    if meta is None :
+        return write_hist(df, ticker, interval, cache_dir)
+    if len(df) > 0 and [c['name'] for c in meta['columns']] != list(df.columns) :
+        # Data source changed its columns: rewrite everything.
+        old = read_hist(ticker, interval, cache_dir=cache_dir)
+        return write_hist(pd.concat([old[old.index < df.index.min()], df]), ticker, interval, cache_dir)
+
+    path = _ticker_dir(ticker, interval, cache_dir)
+    df = df.sort_index()
+    pending = False
+    if len(df) > 0 :
+        if meta['tz'] is not None :
+            df = df.tz_convert(meta['tz'])
+        keep = int(np.searchsorted(_mmap_index(path, meta), index_ns(df.index)[0], side='left'))
+        arrays = _column_arrays(df, meta['columns'])
+        pending = keep < meta['rows']
+        if pending :
+            _write_pending(path, arrays, keep)
+        _write_columns(path, arrays, rows=keep, mode='r+b')
+        meta['rows'] = keep + len(df)
+    meta['fetched'] = time.time()
+    _write_meta(path, meta)
+    if pending :
+        _remove_pending(path)
+    return meta
+
+
+def _mmap_index(path: str, meta: dict) -> np.ndarray :
+    if meta['rows'] == 0 :
+        return np.empty(0, dtype='<i8')
+    return np.memmap(os.path.join(path, 'index.bin'), dtype='<i8', mode='r', shape=(meta['rows'],))
+
+
+def last_timestamp(ticker: str, interval: str = '1d', cache_dir: str = None) -> pd.Timestamp :
+    """Timestamp of the last cached bar of ticker (None if nothing is cached).
+    """
+    meta = read_meta(ticker, interval, cache_dir)
+    if meta is None or meta['rows'] == 0 :
+        return None
+    last = pd.Timestamp(int(_mmap_index(_ticker_dir(ticker, interval, cache_dir), meta)[-1]), tz='UTC')
+    return last.tz_localize(None) if meta['tz'] is None else last.tz_convert(meta['tz'])
+
+
+@profiled('cache')
+def read_hist(ticker: str, interval: str = '1d', start=None, end=None, cache_dir: str = None) -> pd.core.frame.DataFrame :
+    """Read the cached bars of ticker with start <= timestamp <= end (both optional).
+    Only the requested slice is read from disk.
+    """
+    meta = read_meta(ticker, interval, cache_dir)
+    assert meta is not None, f'{ticker} ({interval}) is not cached.'
+    path = _ticker_dir(ticker, interval, cache_dir)
+
+    lo, hi = _row_range(_mmap_index(path, meta), meta, start, end)
+    return _read_rows(path, meta, lo, hi)
+
+
+def _row_range(index: np.ndarray, meta: dict, start, end) -> tuple[int, int] :
+    """Rows [lo, hi) of the cached bars with start <= timestamp <= end.
+    """
+    lo, hi = 0, len(index)
+    if start is not None :
+        lo = int(np.searchsorted(index, index_ns(pd.DatetimeIndex([_as_cache_tz(start, meta)]))[0], side='left'))
+    if end is not None :
+        hi = int(np.searchsorted(index, index_ns(pd.DatetimeIndex([_as_cache_tz(end, meta)]))[0], side='right'))
+    return lo, max(lo, hi)
+
+
+def _read_rows(path: str, meta: dict, lo: int, hi: int) -> pd.core.frame.DataFrame :
+    index = _mmap_index(path, meta)
+    timestamps = pd.to_datetime(np.array(index[lo:hi]), utc=True)
+    timestamps = timestamps.tz_localize(None) if meta['tz'] is None else timestamps.tz_convert(meta['tz'])
+    data = {}
+    for c in meta['columns'] :
+        if meta['rows'] == 0 :
+            data[c['name']] = np.empty(0, dtype=c['dtype'])
+        else :
+            values = np.memmap(os.path.join(path, c['file']), dtype=c['dtype'], mode='r', shape=(meta['rows'],))
+            data[c['name']] = np.array(values[lo:hi]).astype(np.dtype(c['dtype']).newbyteorder('='))
+    return pd.DataFrame(data, index=pd.DatetimeIndex(timestamps, name=meta['index_name']))
+
+
+def iter_hist(ticker: str, interval: str = '1d', chunk_size: int = 1_000_000, start=None, end=None, cache_dir: str = None) :
+    """Iterate over the cached bars of ticker (start <= timestamp <= end) in DataFrames of at most chunk_size rows.
+    Only one chunk is read from the memory-mapped files at a time, so histories larger than RAM can be processed.
+    Bars appended while iterating are not included.
+    """
+    assert chunk_size > 0, f'chunk_size must be positive.'
+    meta = read_meta(ticker, interval, cache_dir)
+    assert meta is not None, f'{ticker} ({interval}) is not cached.'
+    path = _ticker_dir(ticker, interval, cache_dir)
+    lo, hi = _row_range(_mmap_index(path, meta), meta, start, end)
+    for first in range(lo, hi, chunk_size) :
+        yield _read_rows(path, meta, first, min(first + chunk_size, hi))
+
+
+def _as_cache_tz(timestamp, meta: dict) -> pd.Timestamp :
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tz is None :
+        return timestamp if meta['tz'] is None else timestamp.tz_localize(meta['tz'])
+    return timestamp if meta['tz'] is not None else timestamp.tz_convert('UTC').tz_localize(None)
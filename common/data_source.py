@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+
+import pandas as pd
+
+
+class FetchError(RuntimeError) :
+    """Raised if a data source could not deliver a stock history (after all retries).
+    """
+
+
+class RateLimiter :
+    """Allow at most calls_per_second calls (shared by all threads using the same limiter).
+    """
+    def __init__(self, calls_per_second: float) :
+        self.interval = 1.0 / calls_per_second
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None :
+        with self._lock :
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now :
+            time.sleep(slot - now)
+
+
+class DataSource :
+    """Interface of a stock data source.
+    Subclasses implement history(); callers use fetch(), which adds rate limiting and retries.
+    period: yfinance-like period ('max', '5d', '1mo', '1y', ...), start: first bar (inclusive), interval: bar size.
+    """
+    def __init__(self, calls_per_second: float = None, retries: int = 3, backoff: float = 1.0) :
+        self.limiter = None if calls_per_second is None else RateLimiter(calls_per_second)
+        self.retries = retries
+        self.backoff = backoff
+
+    def history(self, company: str, period: str = None, interval: str = '1d', start=None) -> pd.core.frame.DataFrame :
+        raise NotImplementedError
+
+    def fetch(self, company: str, period: str = None, interval: str = '1d', start=None, allow_empty: bool = False) -> pd.core.frame.DataFrame :
+        """Fetch a stock history. Failed (or empty) fetches are retried with exponential backoff.
+        Raises FetchError when all attempts failed.
+        """
+        error = None
+        for attempt in range(self.retries + 1) :
+            if attempt > 0 :
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            if self.limiter is not None :
+                self.limiter.wait()
+            try :
+                df = self.history(company, period=period, interval=interval, start=start)
+            except Exception as e :
+                error = e
+                continue
+            if not df.empty or allow_empty :
+                return df
+            error = None
+            if start is not None :
+                # Nothing after start is not an error worth retrying.
+                break
+        raise FetchError(f'Fetching data for {company} not successful.') from error
+
+
+class YahooSource(DataSource) :
+    """Yahoo Finance (yfinance).
+    """
+    def __init__(self, calls_per_second: float = 5.0, retries: int = 3, backoff: float = 1.0) :
+        super().__init__(calls_per_second=calls_per_second, retries=retries, backoff=backoff)
+
+    def history(self, company: str, period: str = None, interval: str = '1d', start=None) -> pd.core.frame.DataFrame :
+        import yfinance as yf
+        yf_comp = yf.Ticker(company)
+        if start is None :
+            return yf_comp.history(period=period, interval=interval)
+        return yf_comp.history(start=start, interval=interval)
+
+
+_PERIODS = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}
+
+
+class FileSource(DataSource) :
+    """Local files <directory>/<TICKER>_<interval>.csv (or <TICKER>.csv) with the bar timestamps in the first column.
+    Used as offline replacement for yfinance (tests, benchmarks, fixtures).
+    Time zone aware timestamps are converted to tz (default: UTC).
+    """
+    def __init__(self, directory: str, tz: str = 'UTC', calls_per_second: float = None, retries: int = 0, backoff: float = 0.0) :
+        super().__init__(calls_per_second=calls_per_second, retries=retries, backoff=backoff)
+        self.directory = directory
+        self.tz = tz
+
+    def history(self, company: str, period: str = None, interval: str = '1d', start=None) -> pd.core.frame.DataFrame :
+        path = os.path.join(self.directory, f'{company.upper()}_{interval}.csv')
+        if not os.path.exists(path) :
+            path = os.path.join(self.directory, f'{company.upper()}.csv')
+        df = pd.read_csv(path, index_col=0)
+        index = pd.to_datetime(df.index, utc=True)
+        if len(df) > 0 and _has_offset(df.index[0]) :
+            index = index.tz_convert(self.tz)
+        else :
+            index = index.tz_localize(None)
+        df.index = pd.DatetimeIndex(index, name=df.index.name)
+        df = df.sort_index()
+
+        if start is not None :
+            return df[df.index >= _localize(start, df.index.tz)]
+        if period is None or period == 'max' or df.empty :
+            return df
+        if period == 'ytd' :
+            return df[df.index.year == df.index[-1].year]
+        unit = period.lstrip('0123456789')
+        return df[df.index > df.index[-1] - pd.DateOffset(**{_PERIODS[unit]: int(period[:-len(unit)])})]
+
+
+def _has_offset(timestamp: str) -> bool :
+    return pd.Timestamp(timestamp).tz is not None
+
+
+def _localize(timestamp, tz) -> pd.Timestamp :
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tz is None :
+        return timestamp if tz is None else timestamp.tz_localize(tz)
+    return timestamp.tz_convert(tz)
@@ -1,30 +1,144 @@
-import yfinance as yf
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 
+from common.cache import read_meta, is_stale, write_hist, append_hist, read_hist, last_timestamp, DEFAULT_MAX_AGE
+from common.data_source import DataSource, YahooSource, FileSource, FetchError
+from common import profiling
+from common.profiling import profiled
+
+
+_default_source = YahooSource()
+
+# Period of the first download of a ticker per bar interval.
+# Yahoo Finance serves intraday bars only for the recent past, older bars are kept by the cache (common/cache.py).
+FIRST_PERIODS = {'1m': '7d', '2m': '60d', '5m': '60d', '15m': '60d', '30m': '60d', '60m': '730d', '90m': '60d', '1h': '730d'}
+
+
+def set_default_source(source: DataSource) -> None :
+    """Data source used when no source is passed (default: Yahoo Finance).
+    For example, set_default_source(FileSource('fixtures/')) runs everything offline.
+    """
+    global _default_source
+    _default_source = source
+
+
+@profiled('fetch')
+def get_comp_stock_hist(company: str, period: str = None, interval: str = '1d', start=None,
+    source: DataSource = None, allow_empty: bool = False) -> pd.core.frame.DataFrame :
+    source = _default_source if source is None else source
+    return source.fetch(company, period=period, interval=interval, start=start, allow_empty=allow_empty)
+
+
+@profiled('cache')
+def refresh_cache(company: str, interval: str = '1d', max_age: pd.Timedelta = DEFAULT_MAX_AGE,
+    cache_dir: str = None, source: DataSource = None) -> dict :
+    """Make sure the cached history of company is at most max_age old and return its metadata (see common/cache.py).
+    Unknown tickers are downloaded completely once (intraday intervals: as far back as available, see FIRST_PERIODS).
+    Afterwards, only the bars since the last cached bar are fetched and appended.
+    """
+    meta = read_meta(company, interval, cache_dir)
+    if meta is None :
+        profiling.count('cache_miss', company)
+        df = get_comp_stock_hist(company=company, period=FIRST_PERIODS.get(interval, 'max'), interval=interval, source=source)
+        return write_hist(df, company, interval, cache_dir)
+    if is_stale(meta, max_age) :
+        profiling.count('cache_stale', company)
+        last = last_timestamp(company, interval, cache_dir)
+        # No new bars (e.g. weekend or holiday) is not an error.
+        new = get_comp_stock_hist(company=company, period='max', interval=interval, start=last, source=source, allow_empty=True)
+        meta = append_hist(new, company, interval, cache_dir)
+    else :
+        profiling.count('cache_hit', company)
+    return meta
+
+
+@profiled('fetch')
+def get_cached_stock_hist(company: str, interval: str = '1d', start=None, end=None,
+    max_age: pd.Timedelta = DEFAULT_MAX_AGE, cache_dir: str = None, source: DataSource = None) -> pd.core.frame.DataFrame :
+    """Stock history served from the local cache.
+    start/end (inclusive) select the slice that is read from disk.
+    """
+    refresh_cache(company=company, interval=interval, max_age=max_age, cache_dir=cache_dir, source=source)
+    return read_hist(company, interval, start=start, end=end, cache_dir=cache_dir)
+
+
+@profiled('filter')
+def _get_since(offset: pd.DateOffset, company: str, cache: bool, max_age: pd.Timedelta, source: DataSource,
+    start=None) -> pd.core.frame.DataFrame :
+    """Bars after today - offset, or from start on (inclusive) if start is given.
+    """
+    if cache :
+        tz_df = refresh_cache(company=company, max_age=max_age, source=source)['tz']
+    else :
+        df = get_comp_stock_hist(company=company, period='max', source=source)
+        tz_df = df.iloc[0].name.tz
+    if start is None :
+        timestamp = pd.Timestamp.today(tz=tz_df) - offset
+    else :
+        timestamp = pd.Timestamp(start)
+        timestamp = timestamp.tz_localize(tz_df) if timestamp.tz is None else timestamp.tz_convert(tz_df)
+    if cache :
+        df = read_hist(company, start=timestamp)
+    return df[df.index > timestamp] if start is None else df[df.index >= timestamp]
+
+
+@profiled('fetch')
+def get_since(start, company: str, cache: bool = True, max_age: pd.Timedelta = DEFAULT_MAX_AGE,
+    source: DataSource = None) -> pd.core.frame.DataFrame :
+    """Stock history from start on (inclusive, e.g. '2020-01-01'; without a time zone in the one of the bars).
+    Unlike get_last_years, the first bar does not change from day to day.
+    """
+    return _get_since(None, company=company, cache=cache, max_age=max_age, source=source, start=start)
+
+
+@profiled('fetch')
+def get_last_years(years: int, company: str, cache: bool = True, max_age: pd.Timedelta = DEFAULT_MAX_AGE,
+    source: DataSource = None) -> pd.core.frame.DataFrame :
+    return _get_since(pd.DateOffset(years=years), company=company, cache=cache, max_age=max_age, source=source)
+
 
-def get_comp_stock_hist(company: str, period: str) -> pd.core.frame.DataFrame :
-    yf_comp = yf.Ticker(company)
-    df = yf_comp.history(period=period)
-    assert not df.empty, "Fetching data not successful. Try again."
-    return df
+@profiled('fetch')
+def get_last_months(months: int, company: str, cache: bool = True, max_age: pd.Timedelta = DEFAULT_MAX_AGE,
+    source: DataSource = None) -> pd.core.frame.DataFrame :
+    return _get_since(pd.DateOffset(months=months), company=company, cache=cache, max_age=max_age, source=source)
 
 
-def get_last_years(years: int, company: str) -> pd.core.frame.DataFrame :
-    df = get_comp_stock_hist(company=company, period='max')
-    tz_df = df.iloc[0].name.tz
-    timestamp = pd.Timestamp.today(tz=tz_df) - pd.DateOffset(years=years)
-    return df[df.index > timestamp]
+@profiled('fetch')
+def get_last_days(days: int, company: str, cache: bool = True, max_age: pd.Timedelta = DEFAULT_MAX_AGE,
+    source: DataSource = None) -> pd.core.frame.DataFrame :
+    return _get_since(pd.DateOffset(days=days), company=company, cache=cache, max_age=max_age, source=source)
 
 
-def get_last_months(months: int, company: str) -> pd.core.frame.DataFrame :
-    df = get_comp_stock_hist(company=company, period='max')
-    tz_df = df.iloc[0].name.tz
-    timestamp = pd.Timestamp.today(tz=tz_df) - pd.DateOffset(months=months)
-    return df[df.index > timestamp]
+@profiled('fetch')
+def get_watchlist_hist(companies: list[str], fetch=get_cached_stock_hist, max_workers: int = 8, **kwargs) -> tuple[dict, dict] :
+    """Fetch the histories of many companies concurrently with at most max_workers threads.
+    fetch is called as fetch(company=company, **kwargs), e.g. fetch=get_last_years with years=4.
+    The source's rate limit is shared by all threads.
+    Returns ({company: DataFrame}, {company: exception}) so that single failures do not stop the batch.
+    Tickers are case-insensitive (like the cache); a ticker listed several times is fetched once, under its first spelling.
+    """
+    # Duplicates would refresh the same cache directory concurrently.
+    unique = {}
+    for company in companies :
+        unique.setdefault(company.upper(), company)
+    data, failures = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool :
+        futures = {company: pool.submit(fetch, company=company, **kwargs) for company in unique.values()}
+        for company, future in futures.items() :
+            try :
+                data[company] = future.result()
+            except Exception as e :
+                failures[company] = e
+    return data, failures
 
 
-def get_last_days(days: int, company: str) -> pd.core.frame.DataFrame :
-    df = get_comp_stock_hist(company=company, period='max')
-    tz_df = df.iloc[0].name.tz
-    timestamp = pd.Timestamp.today(tz=tz_df) - pd.DateOffset(days=days)
-    return df[df.index > timestamp]
+def ingest_intraday(companies: list[str], interval: str = '1m', max_age: pd.Timedelta = pd.Timedelta(0),
+    cache_dir: str = None, source: DataSource = None, max_workers: int = 8) -> tuple[dict, dict] :
+    """Append the latest intraday bars of many companies to the on-disk cache (see common/cache.py).
+    Run it regularly (for 1m bars at least weekly, Yahoo Finance only serves the last days) to build up a history
+    that can be far larger than RAM; process it in chunks with indicators/chunked.py.
+    Returns ({company: cache metadata}, {company: exception}).
+    """
+    return get_watchlist_hist(companies, fetch=refresh_cache, max_workers=max_workers,
+        interval=interval, max_age=max_age, cache_dir=cache_dir, source=source)
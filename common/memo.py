@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from common.cache import default_cache_dir, index_ns
+from common import profiling
+
+
+# On-disk cache of computed results, keyed by a content hash of the input bars and the parameters.
+# Layout (one directory per entry):
+#   <memo_dir>/<key[:2]>/<key>/meta.json   Kind of the entry, columns / file name
+#   <memo_dir>/<key[:2]>/<key>/frame.npz   DataFrame entries: index (ns since epoch, UTC) and one array per column
+#   <memo_dir>/<key[:2]>/<key>/<file>      File entries (e.g. a rendered chart)
+# Entries are written to a temporary directory and renamed, so readers never see half-written entries.
+# The modification time of an entry is its last use; evict() removes the least recently used entries
+# until the cache is smaller than max_bytes.
+
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+def default_memo_dir() -> str :
+    """Result cache directory: $STOCKVIEW_MEMO_DIR or results/ in the data cache directory.
+    """
+    return os.environ.get('STOCKVIEW_MEMO_DIR', os.path.join(default_cache_dir(), 'results'))
+
+
+def content_hash(df: pd.core.frame.DataFrame, *params) -> str :
+    """SHA-256 of the bars of df (timestamps, column names, dtypes and values) and params (JSON-serializable).
+    """
+    h = hashlib.sha256()
+    h.update(index_ns(df.index).tobytes() if isinstance(df.index, pd.DatetimeIndex) else np.asarray(df.index).tobytes())
+    for name, values in df.items() :
+        values = np.ascontiguousarray(values.to_numpy())
+        h.update(json.dumps([str(name), values.dtype.str]).encode())
+        h.update(values.tobytes())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class ResultCache :
+    """Content-addressed store of DataFrames and files with size-based (least recently used) eviction.
+    """
+    def __init__(self, directory: str = None, max_bytes: int = DEFAULT_MAX_BYTES) :
+        self.directory = directory or default_memo_dir()
+        self.max_bytes = max_bytes
+
+    def _entry(self, key: str) -> str :
+        return os.path.join(self.directory, key[:2], key)
+
+    def _read_meta(self, key: str) -> dict :
+        path = self._entry(key)
+        try :
+            with open(os.path.join(path, 'meta.json')) as f :
+                meta = json.load(f)
+        except FileNotFoundError :
+            profiling.count('memo_miss')
+            return None
+        profiling.count('memo_hit')
+        os.utime(path)
+        return meta
+
+    def _write(self, key: str, meta: dict, write) -> None :
+        path = self._entry(key)
+        tmp = f'{path}.tmp{os.getpid()}'
+        os.makedirs(tmp, exist_ok=True)
+        write(tmp)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f :
+            json.dump(meta, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+    def get_frame(self, key: str) -> pd.core.frame.DataFrame :
+        """Cached DataFrame or None.
+        """
+        meta = self._read_meta(key)
+        if meta is None :
+            return None
+        with np.load(os.path.join(self._entry(key), 'frame.npz')) as data :
+            index = pd.to_datetime(data['index'], utc=True)
+            index = index.tz_localize(None) if meta['tz'] is None else index.tz_convert(meta['tz'])
+            return pd.DataFrame({col: data[f'c{i}'] for i, col in enumerate(meta['columns'])},
+                index=pd.DatetimeIndex(index, name=meta['index_name']))
+
+    def put_frame(self, key: str, df: pd.core.frame.DataFrame) -> None :
+        """Store a DataFrame with a DatetimeIndex.
+        """
+        meta = {'kind': 'frame', 'columns': [str(col) for col in df.columns],
+            'tz': None if df.index.tz is None else str(df.index.tz), 'index_name': df.index.name}
+        arrays = {f'c{i}': df[col].to_numpy() for i, col in enumerate(df.columns)}
+        self._write(key, meta, lambda tmp : np.savez(os.path.join(tmp, 'frame.npz'), index=index_ns(df.index), **arrays))
+
+    def get_file(self, key: str, path: str) -> str :
+        """Copy the cached file into the directory path. Returns its name or None.
+        """
+        meta = self._read_meta(key)
+        if meta is None :
+            return None
+        os.makedirs(path, exist_ok=True)
+        shutil.copyfile(os.path.join(self._entry(key), meta['file']), os.path.join(path, meta['file']))
+        return meta['file']
+
+    def put_file(self, key: str, file: str) -> None :
+        """Store a copy of file.
+        """
+        name = os.path.basename(file)
+        self._write(key, {'kind': 'file', 'file': name}, lambda tmp : shutil.copyfile(file, os.path.join(tmp, name)))
+
+    def size(self) -> int :
+        """Total size of all entries in bytes.
+        """
+        return sum(size for _, _, size in self._entries())
+
+    def _entries(self) -> list[tuple[float, str, int]] :
+        entries = []
+        if not os.path.isdir(self.directory) :
+            return entries
+        for prefix in os.scandir(self.directory) :
+            if not prefix.is_dir() :
+                continue
+            for entry in os.scandir(prefix.path) :
+                if entry.is_dir() and '.tmp' not in entry.name :
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                    entries.append((entry.stat().st_mtime, entry.path, size))
+        return entries
+
+    def evict(self) -> int :
+        """Remove the least recently used entries until the cache is not larger than max_bytes.
+        Returns the number of removed entries.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        removed = 0
+        for _, path, size in entries :
+            if total <= self.max_bytes :
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,164 @@
+import functools
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from common.profiling import profiled
+
+
+# Drawing helpers shared by the plot_* functions.
+# Bars are drawn as one PolyCollection instead of one Rectangle artist per bar (like plt.bar would),
+# and figures are always closed after saving (or when drawing fails, see closes_figures), so rendering many charts
+# does not accumulate memory.
+# With downsampling, long series are reduced to about one bucket per pixel of the axis:
+# lines keep the first, last, minimum and maximum point of every bucket (M4), bars are merged into one bar
+# from the lowest to the highest value of the bucket. Both look the same as drawing every point.
+# matplotlib is only imported when a figure is drawn, so the indicator modules (which import these helpers for
+# their plot_* functions) can be used for computations without loading it (see benchmarks/startup.py).
+
+
+def closes_figures(plot) :
+    """Decorator of the plot_* functions: the figures opened by a call that raises are closed
+    (save_figure closes the figure of a successful call).
+    """
+    @functools.wraps(plot)
+    def wrapper(*args, **kwargs) :
+        plt = sys.modules.get('matplotlib.pyplot')
+        before = set(plt.get_fignums()) if plt is not None else set()
+        try :
+            return plot(*args, **kwargs)
+        except BaseException :
+            plt = sys.modules.get('matplotlib.pyplot')
+            if plt is not None :
+                for num in set(plt.get_fignums()) - before :
+                    plt.close(num)
+            raise
+    return wrapper
+
+
+def subplots(*args, **kwargs) :
+    """plt.subplots, importing matplotlib.pyplot on first use.
+    """
+    import matplotlib.pyplot as plt
+    return plt.subplots(*args, **kwargs)
+
+
+def x_values(index) -> np.ndarray :
+    """Matplotlib x coordinates of an index (date numbers for a DatetimeIndex).
+    """
+    if isinstance(index, pd.DatetimeIndex) :
+        if index.tz is not None :
+            index = index.tz_convert('UTC').tz_localize(None)
+        import matplotlib.dates as mdates
+        return mdates.date2num(index.to_numpy())
+    return np.asarray(index, dtype=float)
+
+
+def axis_width(ax) -> int :
+    """Width of an axis in pixels (at the figure dpi), the number of buckets used for downsampling.
+    """
+    return max(1, int(ax.get_window_extent().width))
+
+
+def _buckets(values: np.ndarray, max_points: int) -> np.ndarray :
+    """(buckets x size) view of values padded with NaN, size = ceil(len / max_points).
+    """
+    size = -(-len(values) // max_points)
+    padded = np.full(-(-len(values) // size) * size, np.nan)
+    padded[:len(values)] = values
+    return padded.reshape(-1, size)
+
+
+def line_points(columns: list, max_points: int) -> np.ndarray :
+    """Sorted positions of the points to draw for the given series (M4 downsampling, union over all series).
+    Keeps the first, last, minimum and maximum point of each of max_points buckets.
+    Buckets without values keep their first point (NaN), so gaps in the lines remain visible.
+    """
+    n = len(columns[0])
+    if n <= max_points :
+        return np.arange(n)
+    keep = []
+    for values in columns :
+        blocks = _buckets(np.asarray(values, dtype=float), max_points)
+        nan = np.isnan(blocks)
+        base = np.arange(len(blocks)) * blocks.shape[1]
+        keep += [base, np.minimum(base + blocks.shape[1] - 1, n - 1),
+            base + np.where(nan, np.inf, blocks).argmin(axis=1), base + np.where(nan, -np.inf, blocks).argmax(axis=1)]
+    return np.unique(np.concatenate(keep))
+
+
+def thin(df: pd.core.frame.DataFrame, columns: list[str], max_points: int = None) -> pd.core.frame.DataFrame :
+    """Rows of df needed to draw the given columns as lines with max_points buckets (all rows if max_points is None).
+    """
+    if max_points is None :
+        return df
+    return df.iloc[line_points([df[col] for col in columns], max_points)]
+
+
+def bar_collection(ax, index, height, bottom=0.0, width: float = 0.8, max_points: int = None, **kwargs) -> 'PolyCollection' :
+    """Draw vertical bars (like ax.bar) as a single collection artist.
+    index: x positions (DatetimeIndex or numbers), height/bottom: bar heights and lower ends, width in x units (days).
+    max_points: merge neighbouring bars into at most max_points bars spanning from the lowest to the highest value.
+    """
+    x = x_values(index)
+    height = np.broadcast_to(np.asarray(height, dtype=float), x.shape)
+    bottom = np.broadcast_to(np.asarray(bottom, dtype=float), x.shape)
+    if max_points is not None and len(x) > max_points :
+        # Bars with a NaN height or bottom are not drawn, so they do not count for the extent of their bucket.
+        top = bottom + height
+        low, high = _buckets(np.minimum(bottom, top), max_points), _buckets(np.maximum(bottom, top), max_points)
+        with warnings.catch_warnings() :
+            warnings.simplefilter('ignore', RuntimeWarning)  # buckets without bars
+            bottom, top = np.nanmin(low, axis=1), np.nanmax(high, axis=1)
+        first = np.arange(len(low)) * low.shape[1]
+        last = np.minimum(first + low.shape[1] - 1, len(x) - 1)
+        x, width, height = (x[first] + x[last]) / 2, x[last] - x[first] + width, top - bottom
+    else :
+        width = np.broadcast_to(np.asarray(width, dtype=float), x.shape)
+    keep = ~(np.isnan(height) | np.isnan(bottom))
+    x, height, bottom, width = x[keep], height[keep], bottom[keep], width[keep]
+    left, right, top = x - width / 2, x + width / 2, bottom + height
+    verts = np.stack([
+        np.column_stack([left, bottom]), np.column_stack([left, top]),
+        np.column_stack([right, top]), np.column_stack([right, bottom])], axis=1)
+    from matplotlib.collections import PolyCollection
+    collection = PolyCollection(verts, linewidths=0, **kwargs)
+    ax.add_collection(collection, autolim=True)
+    if isinstance(index, pd.DatetimeIndex) :
+        ax.xaxis_date(tz=None)
+    ax.autoscale_view()
+    return collection
+
+
+def price_range(ax, df: pd.core.frame.DataFrame, company: str, color: str = 'blue', width: float = 0.8,
+    max_points: int = None) -> 'PolyCollection' :
+    """Daily price range (Low to High) as bars.
+    """
+    return bar_collection(ax, df.index, height=df['High'] - df['Low'], bottom=df['Low'], width=width, max_points=max_points,
+        color=color, label=f'{company} Chart')
+
+
+def signal_lines(axs: list, days, color: str) -> None :
+    """Dashed vertical lines at the given days over the full height of every axis (one artist per axis).
+    """
+    if len(days) == 0 :
+        return
+    x = x_values(pd.DatetimeIndex(days)) if isinstance(days, pd.DatetimeIndex) else days
+    for ax in axs :
+        ax.vlines(x, 0, 1, transform=ax.get_xaxis_transform(), color=color, linestyle='--', linewidth=0.5)
+
+
+@profiled('save')
+def save_figure(fig, path: str, name: str, fmt: str = 'pdf') -> str :
+    """Save fig as <path>/<name>.<fmt> and close it. Returns the path of the file.
+    """
+    import matplotlib.pyplot as plt
+    file = f'{path}/{name}.{fmt}'
+    try :
+        fig.tight_layout()
+        fig.savefig(file, format=fmt)
+    finally :
+        plt.close(fig)
+    return file
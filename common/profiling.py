@@ -0,0 +1,208 @@
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+# Instrumentation of the data access, indicator, plot and driver functions.
+# Functions decorated with @profiled(stage) record one event per call while a profile is active:
+# stage (fetch, cache, filter, compute, plot, save, run), function, symbol, start (epoch seconds), wall time,
+# rows (of the returned or first DataFrame/Series) and bytes allocated (net, only with memory=True).
+# Cache hits/misses are counted with count().
+# A profile is activated with the profile() context manager or by setting $STOCKVIEW_PROFILE to an output file
+# (written at exit; a name ending in .trace.json gives a Chrome trace, anything else JSON).
+# Without an active profile, a decorated function only checks one global before calling the original.
+
+_active = None
+_symbol = contextvars.ContextVar('symbol', default=None)
+_SYMBOL_PARAMS = ('company', 'ticker', 'symbol')
+
+
+class Profile :
+    """Events and counters recorded while the profile is active.
+    memory: trace allocations with tracemalloc (bytes per call, slows down pure Python code).
+    """
+    def __init__(self, memory: bool = False) :
+        self.memory = memory
+        self.events = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def _add(self, event: dict) -> None :
+        with self._lock :
+            self.events.append(event)
+
+    def call(self, stage: str, func, args: tuple, kwargs: dict) :
+        symbol = _call_symbol(func, args, kwargs)
+        allocated = tracemalloc.get_traced_memory()[0] if self.memory else None
+        result = None
+        start, clock = time.time(), time.perf_counter()
+        try :
+            result = func(*args, **kwargs)
+            return result
+        finally :
+            event = {
+                'stage': stage, 'name': func.__name__, 'symbol': symbol, 'start': start,
+                'seconds': time.perf_counter() - clock, 'rows': _rows(result, args, kwargs), 'pid': os.getpid(), 'tid': threading.get_ident()}
+            if allocated is not None :
+                event['bytes'] = tracemalloc.get_traced_memory()[0] - allocated
+            self._add(event)
+
+    def count(self, name: str, symbol: str = None, n: int = 1) -> None :
+        symbol = _symbol.get() if symbol is None else symbol
+        with self._lock :
+            self.counters[(name, symbol)] = self.counters.get((name, symbol), 0) + n
+        self._add({'stage': 'counter', 'name': name, 'symbol': symbol, 'start': time.time(),
+            'seconds': 0.0, 'rows': None, 'pid': os.getpid(), 'tid': threading.get_ident()})
+
+    def merge(self, events: list[dict], counters: dict) -> None :
+        """Add the events of another profile (e.g. recorded in a worker process).
+        """
+        with self._lock :
+            self.events.extend(events)
+            for key, n in counters.items() :
+                self.counters[key] = self.counters.get(key, 0) + n
+
+    def summary(self) -> pd.core.frame.DataFrame :
+        """Calls, total seconds, rows and bytes per (stage, function, symbol), slowest first.
+        """
+        df = pd.DataFrame([e for e in self.events if e['stage'] != 'counter'],
+            columns=['stage', 'name', 'symbol', 'seconds', 'rows', 'bytes'])
+        df['calls'] = 1
+        return (df.groupby(['stage', 'name', 'symbol'], dropna=False)[['calls', 'seconds', 'rows', 'bytes']]
+            .sum(min_count=1).sort_values('seconds', ascending=False))
+
+    def to_dict(self) -> dict :
+        return {
+            'events': self.events,
+            'counters': [{'name': name, 'symbol': symbol, 'count': n} for (name, symbol), n in self.counters.items()]}
+
+    def to_json(self, file: str) -> None :
+        with open(file, 'w') as f :
+            json.dump(self.to_dict(), f, indent=1)
+
+    def to_chrome_trace(self, file: str) -> None :
+        """Trace Event Format, viewable in chrome://tracing or Perfetto.
+        """
+        trace, origin = [], min((e['start'] for e in self.events), default=0.0)
+        for e in self.events :
+            args = {key: e[key] for key in ('symbol', 'rows', 'bytes') if e.get(key) is not None}
+            if e['stage'] == 'counter' :
+                trace.append({'name': e['name'], 'cat': 'counter', 'ph': 'i', 's': 't', 'ts': (e['start'] - origin) * 1e6,
+                    'pid': e['pid'], 'tid': e['tid'], 'args': args})
+            else :
+                trace.append({'name': e['name'], 'cat': e['stage'], 'ph': 'X', 'ts': (e['start'] - origin) * 1e6, 'dur': e['seconds'] * 1e6,
+                    'pid': e['pid'], 'tid': e['tid'], 'args': args})
+        with open(file, 'w') as f :
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+    def save(self, file: str) -> None :
+        """Chrome trace if file ends with .trace.json, JSON otherwise.
+        """
+        if file.endswith('.trace.json') :
+            self.to_chrome_trace(file)
+        else :
+            self.to_json(file)
+
+
+def _rows(result, args: tuple, kwargs: dict) :
+    for value in (result,) + args + tuple(kwargs.values()) :
+        if isinstance(value, (pd.DataFrame, pd.Series)) :
+            return len(value)
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _signature(func) -> inspect.Signature :
+    return inspect.signature(func)
+
+
+def _call_symbol(func, args: tuple, kwargs: dict) :
+    for param in _SYMBOL_PARAMS :
+        if param in kwargs :
+            return kwargs[param]
+    if args :
+        names = list(_signature(func).parameters)
+        for param in _SYMBOL_PARAMS :
+            if param in names and names.index(param) < len(args) :
+                return args[names.index(param)]
+    return _symbol.get()
+
+
+def profiled(stage: str) :
+    """Decorator: record calls of the function as stage while a profile is active.
+    """
+    def decorator(func) :
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) :
+            if _active is None :
+                return func(*args, **kwargs)
+            return _active.call(stage, func, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, symbol: str = None, n: int = 1) -> None :
+    """Increase the counter name (e.g. 'cache_hit') of symbol if a profile is active.
+    """
+    if _active is not None :
+        _active.count(name, symbol, n)
+
+
+def active() -> Profile :
+    """The active profile or None.
+    """
+    return _active
+
+
+@contextmanager
+def profile(memory: bool = False) :
+    """Record all profiled calls inside the with block:
+    with profile() as prof :
+        ...
+    prof.summary() / prof.to_json(file) / prof.to_chrome_trace(file)
+    """
+    global _active
+    previous, _active = _active, Profile(memory=memory)
+    started = memory and not tracemalloc.is_tracing()
+    if started :
+        tracemalloc.start()
+    try :
+        yield _active
+    finally :
+        if started :
+            tracemalloc.stop()
+        _active = previous
+
+
+@contextmanager
+def symbol(name: str) :
+    """Attribute the calls inside the with block to symbol name (for functions without a company argument).
+    """
+    token = _symbol.set(name)
+    try :
+        yield
+    finally :
+        _symbol.reset(token)
+
+
+def _profile_from_environment() -> None :
+    global _active
+    file = os.environ.get('STOCKVIEW_PROFILE')
+    if not file :
+        return
+    _active = Profile(memory=os.environ.get('STOCKVIEW_PROFILE_MEMORY', '') not in ('', '0'))
+    if _active.memory :
+        tracemalloc.start()
+    atexit.register(_active.save, file)
+
+
+_profile_from_environment()
@@ -0,0 +1,161 @@
+import itertools
+import inspect
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from indicators.panel import run_panel, to_panel, pack_order, pack, unpack
+from indicators.signals import Signals, adx_signals, macd_signals, donchian_signals, keltner_signals, bollinger_signals
+from common.profiling import profiled
+
+
+# Vectorized backtests of the signal rules (see indicators/signals.py).
+# All strategies are evaluated at once on a (time x strategies) block, one column per (symbol, parameter set).
+# A position is opened at the close of the bar with a buy event and held until the close of the bar with the next
+# sell event (with short=True the sell event opens a short position instead of only closing the long one).
+# Bars on which both events fire keep the position. Symbols without a bar keep their last price.
+
+
+class Backtest(NamedTuple) :
+    """stats: one row per strategy with
+        pnl           profit per share in price units (after costs)
+        return        compounded return of the strategy (0.1 = +10 %)
+        max_drawdown  largest drop of the equity from its running peak (0.2 = -20 %)
+        trades        number of opened positions
+        exposure      fraction of bars with an open position
+    equity: (time x strategies) equity curves starting at 1 (None if not requested).
+    """
+    stats: pd.core.frame.DataFrame
+    equity: pd.core.frame.DataFrame
+
+
+def _forward_fill(x: np.ndarray) -> np.ndarray :
+    """Replace NaN by the last non-NaN value before it along the time axis (NaN before the first one).
+    """
+    rows = np.arange(len(x)).reshape((-1,) + (1,) * (x.ndim - 1))
+    last = np.maximum.accumulate(np.where(np.isnan(x), 0, rows), axis=0)
+    return np.take_along_axis(x, last, axis=0)
+
+
+def positions(buy, sell, short: bool = False) -> np.ndarray :
+    """Position after the close of every bar: 1 (long), 0 (flat) or -1 (short, only with short=True).
+    """
+    buy, sell = np.asarray(buy, dtype=bool), np.asarray(sell, dtype=bool)
+    event = np.where(buy & ~sell, 1.0, np.where(sell & ~buy, -1.0 if short else 0.0, np.nan))
+    return np.nan_to_num(_forward_fill(event), nan=0.0)
+
+
+@profiled('compute')
+def backtest(close, buy, sell, short: bool = False, cost: float = 0.0, equity: bool = True) -> Backtest :
+    """Backtest the events buy/sell on close (Series, 1-D array, (time x strategies) DataFrame or 2-D array).
+    cost: transaction cost as fraction of the traded value (e.g. 0.001 = 0.1 % per buy or sell).
+    """
+    columns = close.columns if isinstance(close, pd.DataFrame) else None
+    index = close.index if isinstance(close, (pd.Series, pd.DataFrame)) else pd.RangeIndex(len(close))
+    price = _forward_fill(np.asarray(close, dtype=np.float64))
+    if price.ndim == 1 :
+        price = price[:, None]
+    if columns is None :
+        columns = pd.RangeIndex(price.shape[1])
+    pos = positions(buy, sell, short=short).reshape(price.shape)
+
+    held = np.zeros_like(pos)
+    held[1:] = pos[:-1]
+    prev = np.full_like(price, np.nan)
+    prev[1:] = price[:-1]
+    # Position changes are traded at the close of their bar, returns are earned on the bar after.
+    turnover = np.abs(pos - np.concatenate((np.zeros((1, pos.shape[1])), pos[:-1])))
+    change = np.nan_to_num(price - prev)
+    returns = np.nan_to_num(held * (price / prev - 1)) - cost * turnover
+    curve = np.cumprod(1 + returns, axis=0)
+
+    stats = pd.DataFrame({
+        'pnl': (held * change).sum(axis=0) - cost * np.nansum(turnover * price, axis=0),
+        'return': curve[-1] - 1 if len(curve) > 0 else np.zeros(price.shape[1]),
+        # The running peak starts at the initial equity 1, so costs of a trade on the first bar count as drawdown.
+        'max_drawdown': (1 - curve / np.maximum.accumulate(np.maximum(curve, 1.0), axis=0)).max(axis=0, initial=0.0),
+        'trades': ((pos != 0) & (pos != held)).sum(axis=0),
+        'exposure': (held != 0).mean(axis=0) if len(held) > 0 else np.zeros(price.shape[1]),
+    }, index=columns)
+    return Backtest(stats, pd.DataFrame(curve, index=index, columns=columns) if equity else None)
+
+
+# Rules: indicators and signals of every trading rule; panel(specs) returns the output columns of the indicators
+# in specs and the fields 'High', 'Low' and 'Close' as (time x symbols) arrays.
+def adx_rule(panel, n_smooth: int = 14, strong_trend: float = 25) -> Signals :
+    c = panel([('adx', {'n_smooth': n_smooth})])
+    return adx_signals(c[f'DI{n_smooth}plus'], c[f'DI{n_smooth}minus'], c[f'ADX{n_smooth}'], strong_trend=strong_trend)
+
+
+def macd_rule(panel, fast: int = 12, slow: int = 26) -> Signals :
+    c = panel([('macd', {'fast': fast, 'slow': slow})])
+    return macd_signals(c[f'MACD{fast}-{slow}'], c[f'MACD{fast}-{slow}-trigger-{9}'])
+
+
+def donchian_rule(panel, window_size: int = 20) -> Signals :
+    c = panel([('donchian_channel', {'window_size': window_size})])
+    return donchian_signals(c['Close'], c[f'MAX{window_size}'], c[f'MIN{window_size}'])
+
+
+def keltner_rule(panel, ema_window: int = 20, atr_range: int = 20, atr_factor: float = 2.0) -> Signals :
+    c = panel([('keltner_channel', {'ema_window': ema_window, 'atr_range': atr_range, 'atr_factor': atr_factor})])
+    return keltner_signals(c['Close'], c[f'Keltner-upper-{ema_window}-{atr_range}'], c[f'Keltner-lower-{ema_window}-{atr_range}'])
+
+
+def bollinger_rule(panel, sma_window: int = 20, factor: float = 2) -> Signals :
+    c = panel([('bollinger_bands', {'sma_window': sma_window, 'factor': factor})])
+    return bollinger_signals(c['High'], c['Low'], c[f'BBand-upper-{sma_window}-{factor}'], c[f'BBand-lower-{sma_window}-{factor}'])
+
+
+RULES = {
+    'adx': adx_rule,
+    'macd': macd_rule,
+    'donchian_channel': donchian_rule,
+    'keltner_channel': keltner_rule,
+    'bollinger_bands': bollinger_rule,
+}
+
+
+@profiled('run')
+def backtest_grid(histories: dict[str, pd.core.frame.DataFrame], rule: str, grid: dict[str, list] = None,
+    short: bool = False, cost: float = 0.0, equity: bool = False) -> Backtest :
+    """Backtest rule for every symbol in histories ({symbol: OHLC DataFrame}, e.g. from get_watchlist_hist)
+    and every parameter set of grid (all combinations), e.g.
+    backtest_grid(data, 'adx', {'n_smooth': [10, 14, 20], 'strong_trend': [20, 25]}).
+    Parameters missing in grid keep the defaults of the rule function. The indicators are computed with run_panel
+    (all symbols at once, every distinct indicator only once) and all strategies are backtested in one block.
+    Returns a Backtest whose rows (stats) and columns (equity) are indexed by (parameters..., symbol).
+    """
+    assert rule in RULES, f'Unknown rule {rule}. Available: {list(RULES)}'
+    grid = grid or {}
+    unknown = set(grid) - set(list(inspect.signature(RULES[rule]).parameters)[1:])
+    assert not unknown, f'Unknown parameters {sorted(unknown)} of rule {rule}.'
+
+    fields = {field: to_panel(histories, field) for field in ('High', 'Low', 'Close')}
+    # The signals compare every bar with the previous bar of the same symbol, so they are computed on the
+    # packed blocks (the bars of every symbol without gaps, see indicators/panel.py) and moved back afterwards.
+    order, count = pack_order(*(fields[field].to_numpy(dtype=float) for field in ('High', 'Low', 'Close')))
+    packed = {field: pack(df.to_numpy(dtype=float), order, count) for field, df in fields.items()}
+    computed = {}
+
+    def panel(specs: list[tuple[str, dict]]) -> dict[str, np.ndarray] :
+        key = repr(specs)
+        if key not in computed :
+            res = run_panel(fields['High'], fields['Low'], fields['Close'], specs)
+            computed[key] = {col: pack(df.to_numpy(), order, count) for col, df in res.items()}
+            computed[key].update(packed)
+        return computed[key]
+
+    names = list(grid)
+    combos = list(itertools.product(*grid.values()))
+    buy, sell = [], []
+    for values in combos :
+        signals = RULES[rule](panel, **dict(zip(names, values)))
+        buy.append(unpack(signals.buy.astype(float), order, count) == 1)
+        sell.append(unpack(signals.sell.astype(float), order, count) == 1)
+
+    symbols = list(fields['Close'].columns)
+    columns = pd.MultiIndex.from_tuples([tuple(values) + (symbol,) for values in combos for symbol in symbols], names=names + ['symbol'])
+    close = pd.DataFrame(np.tile(fields['Close'].to_numpy(dtype=float), len(combos)), index=fields['Close'].index, columns=columns)
+    return backtest(close, np.concatenate(buy, axis=1), np.concatenate(sell, axis=1), short=short, cost=cost, equity=equity)
@@ -0,0 +1,252 @@
+import numpy as np
+import pandas as pd
+
+from indicators.kernels import recursive_filter, rolling_mean, rolling_var, EMA, WILDER, RUNNING_MEAN
+from indicators.moving_average import exponential_moving_average, weighted_moving_average
+from indicators.trend_indicators import true_range_values, wilder_smooth, directional_index
+from indicators.pipeline import plan, indicator_params, output_columns
+from common.cache import iter_hist
+from common.profiling import profiled
+
+
+# Chunked (out-of-core) mode of the indicator pipeline.
+# The bars are processed in chunks, e.g. straight from the memory-mapped cache (see common/cache.py), and every
+# node of the pipeline carries the state it needs across chunk boundaries:
+#   TR1, DM            last High, Low and Close
+#   TR, DMS, EMA, MACD last input and output of the recursion (Wilder sum, EMA value)
+#   ADX                last DX and ADX
+#   SMA, ATR, STD      accumulators and last n values of the rolling mean / variance (see indicators/kernels.py)
+#   WMA, DONCHIAN      last n - 1 values
+# The first values of TR, DMS and ADX are seeded with sums and means over their first bars, so the first chunk is
+# buffered until it is long enough. The values are identical to run_pipeline on the full history.
+
+
+def _tr1(f, r, s) :
+    first = 'close' not in s
+    close = f['Close']
+    prev_close = np.concatenate(([s.get('close', np.nan)], close[:-1]))
+    s['close'] = close[-1]
+    tr1 = true_range_values(f['High'], f['Low'], prev_close)
+    if first :
+        tr1[:1] = np.nan
+    return {'TR1': tr1}
+
+
+def _dm(f, r, s) :
+    first = 'high' not in s
+    prev_high = np.concatenate(([s.get('high', np.nan)], f['High'][:-1]))
+    prev_low = np.concatenate(([s.get('low', np.nan)], f['Low'][:-1]))
+    s['high'], s['low'] = f['High'][-1], f['Low'][-1]
+    up = f['High'] - prev_high
+    down = prev_low - f['Low']
+    dm_plus = np.where((up > down) & (up > 0), up, 0.0)
+    dm_minus = np.where((down > up) & (down > 0), down, 0.0)
+    if first :
+        dm_plus[:1] = np.nan
+        dm_minus[:1] = np.nan
+    return {'DMplus': dm_plus, 'DMminus': dm_minus}
+
+
+def _continue(s: dict, key: str, x: np.ndarray, kind: int, a: float, first) -> np.ndarray :
+    """Recursive filter of x, continued from the last output of the previous chunk.
+    first() computes the first chunk (with its seed).
+    """
+    if key in s :
+        # x[0] follows the seed (the previous output), so a dummy input is put in front.
+        y = recursive_filter(np.concatenate(([np.nan], x)), kind=kind, a=a, seed=s[key], start=0)[1:]
+    else :
+        y = np.asarray(first(), dtype=np.float64)
+    s[key] = y[-1]
+    return y
+
+
+def _tr(f, r, s, n) :
+    return {f'TR{n}': _continue(s, 'tr', r['TR1'], WILDER, n, lambda : wilder_smooth(pd.Series(r['TR1']), n))}
+
+
+def _dm_smooth(f, r, s, n) :
+    return {
+        f'DM{n}plus': _continue(s, 'plus', r['DMplus'], WILDER, n, lambda : wilder_smooth(pd.Series(r['DMplus']), n)),
+        f'DM{n}minus': _continue(s, 'minus', r['DMminus'], WILDER, n, lambda : wilder_smooth(pd.Series(r['DMminus']), n))}
+
+
+def _adx(f, r, s, n) :
+    if 'adx' not in s :
+        di_plus, di_minus, dx, adx = directional_index(
+            dm_plus=pd.Series(r[f'DM{n}plus']), dm_minus=pd.Series(r[f'DM{n}minus']), tr=pd.Series(r[f'TR{n}']), n_smooth=n)
+        di_plus, di_minus, dx = di_plus.to_numpy(), di_minus.to_numpy(), dx.to_numpy()
+    else :
+        # Same element-wise operations as directional_index, without its seed.
+        with np.errstate(divide='ignore', invalid='ignore') :
+            di_plus = 100 * r[f'DM{n}plus'] / r[f'TR{n}']
+            di_minus = 100 * r[f'DM{n}minus'] / r[f'TR{n}']
+            dx = 100 * abs((di_plus - di_minus) / (di_plus + di_minus))
+    adx = _continue(s, 'adx', dx, RUNNING_MEAN, n, lambda : adx)
+    return {f'DI{n}plus': di_plus, f'DI{n}minus': di_minus, 'DX': dx, f'ADX{n}': adx}
+
+
+def _sma(f, r, s, n) :
+    sma, s['mean'] = rolling_mean(f['Close'], n, s.get('mean'))
+    return {f'SMA{n}': sma}
+
+
+def _ema(f, r, s, n) :
+    return {f'EMA{n}': _continue(s, 'ema', f['Close'], EMA, 2 / (n + 1), lambda : exponential_moving_average(f['Close'], n))}
+
+
+def _with_tail(s: dict, key: str, x: np.ndarray, n: int) -> tuple[np.ndarray, int] :
+    """x behind the last n values of the previous chunks, and the number of values put in front.
+    """
+    tail = s.get(key, np.empty(0))
+    values = np.concatenate((tail, x))
+    s[key] = values[max(len(values) - n, 0):].copy()
+    return values, len(tail)
+
+
+def _wma(f, r, s, n) :
+    values, skip = _with_tail(s, 'close', f['Close'], n - 1)
+    return {f'WMA{n}': weighted_moving_average(values, window_size=n)[skip:]}
+
+
+def _atr(f, r, s, n) :
+    atr, s['mean'] = rolling_mean(r['TR1'], n, s.get('mean'))
+    return {f'ATR{n}': atr}
+
+
+def _macd(f, r, s, fast, slow) :
+    col = f'MACD{fast}-{slow}'
+    macd = r[f'EMA{fast}'] - r[f'EMA{slow}']
+    return {col: macd, f'{col}-trigger-{9}': _continue(s, 'trigger', macd, EMA, 2 / (9 + 1), lambda : exponential_moving_average(macd, 9))}
+
+
+def _std(f, r, s, n) :
+    var, s['var'] = rolling_var(f['Close'] - r[f'SMA{n}'], n, s.get('var'))
+    # Like pandas, negative variances from rounding give a standard deviation of 0.
+    return {f'STD{n}': np.sqrt(np.where(var < 0, 0.0, var))}
+
+
+def _bollinger(f, r, s, n, factor) :
+    return {
+        f'BBand-upper-{n}-{factor}': r[f'SMA{n}'] + factor * r[f'STD{n}'],
+        f'BBand-lower-{n}-{factor}': r[f'SMA{n}'] - factor * r[f'STD{n}']}
+
+
+def _donchian(f, r, s, n) :
+    high, skip = _with_tail(s, 'high', f['High'], n - 1)
+    low, _ = _with_tail(s, 'low', f['Low'], n - 1)
+    upper = pd.Series(high).rolling(window=n).max().to_numpy()[skip:]
+    lower = pd.Series(low).rolling(window=n).min().to_numpy()[skip:]
+    return {f'MAX{n}': upper, f'MIN{n}': lower, f'MIDDLE{n}': (upper + lower) / 2}
+
+
+def _keltner(f, r, s, ema_window, atr_range, atr_factor) :
+    ema, atr = r[f'EMA{ema_window}'], r[f'ATR{atr_range}']
+    return {
+        f'Keltner-upper-{ema_window}-{atr_range}': ema + atr * atr_factor,
+        f'Keltner-lower-{ema_window}-{atr_range}': ema - atr * atr_factor}
+
+
+# Node type: (compute function, number of bars the first chunk needs for the seeds)
+_NODES = {
+    'TR1': (_tr1, lambda : 1),
+    'DM': (_dm, lambda : 1),
+    'TR': (_tr, lambda n : n + 1),
+    'DMS': (_dm_smooth, lambda n : n + 1),
+    'ADX': (_adx, lambda n : 2*n + 1),
+    'SMA': (_sma, lambda n : 1),
+    'EMA': (_ema, lambda n : 1),
+    'WMA': (_wma, lambda n : 1),
+    'ATR': (_atr, lambda n : 1),
+    'MACD': (_macd, lambda fast, slow : 1),
+    'STD': (_std, lambda n : 1),
+    'BB': (_bollinger, lambda n, factor : 1),
+    'DONCHIAN': (_donchian, lambda n : 1),
+    'KELTNER': (_keltner, lambda ema_window, atr_range, atr_factor : 1),
+}
+
+
+class ChunkedPipeline :
+    """Indicator pipeline over a history that arrives in chunks (DataFrames with 'High', 'Low' and 'Close').
+    update(chunk) returns the output columns (like run_pipeline) for the bars processed so far; during the
+    warm-up of the seeds the first chunks are buffered and an empty DataFrame is returned.
+    finish() processes what is still buffered (only for histories shorter than the warm-up).
+    """
+    def __init__(self, specs: list[tuple[str, dict]], dtype=None) :
+        self.specs = specs
+        self.dtype = dtype
+        self.nodes = plan(specs)
+        self.columns = []
+        for name, params in specs :
+            p = indicator_params(name, params)
+            if name == 'ema' :
+                assert p['refcol'] == 'Close' and p['colname'] is None, f'The pipeline computes EMAs of Close only.'
+            elif name == 'adx' :
+                assert p['n_smooth'] > 0, f'n_smooth must be positive.'
+            for col in output_columns(name, params) :
+                if col not in self.columns :
+                    self.columns.append(col)
+        self.warmup = max(_NODES[node[0]][1](*node[1:]) for node in self.nodes)
+        self.state = {node: {} for node in self.nodes}
+        self.rows = 0
+        self._buffer = []
+
+    def _compute(self, block: pd.core.frame.DataFrame) -> pd.core.frame.DataFrame :
+        fields = {col: block[col].to_numpy(dtype=np.float64) for col in ('High', 'Low', 'Close')}
+        results = {}
+        for node in self.nodes :
+            results.update(_NODES[node[0]][0](fields, results, self.state[node], *node[1:]))
+        self.rows += len(block)
+        return pd.DataFrame({col: np.asarray(results[col], dtype=self.dtype) for col in self.columns}, index=block.index)
+
+    @profiled('compute')
+    def update(self, chunk: pd.core.frame.DataFrame) -> pd.core.frame.DataFrame :
+        if self.rows == 0 :
+            self._buffer.append(chunk)
+            if sum(len(c) for c in self._buffer) < self.warmup :
+                return pd.DataFrame({col: np.empty(0, dtype=self.dtype) for col in self.columns}, index=chunk.index[:0])
+            chunk, self._buffer = pd.concat(self._buffer), []
+        if len(chunk) == 0 :
+            return pd.DataFrame({col: np.empty(0, dtype=self.dtype) for col in self.columns}, index=chunk.index)
+        return self._compute(chunk)
+
+    def finish(self) -> pd.core.frame.DataFrame :
+        """Check the length of the history like run_pipeline and compute the buffered bars.
+        """
+        rows = self.rows + sum(len(c) for c in self._buffer)
+        for name, params in self.specs :
+            p = indicator_params(name, params)
+            if name == 'adx' :
+                n = p['n_smooth']
+                assert rows > 2*n+2, f'At least {2*n+2} trading days for ADX{n} needed.'
+            elif name in ('sma', 'wma') :
+                n = p['window_size']
+                assert rows > n, f'At least {n} trading days for {name.upper()}{n} needed.'
+        buffer, self._buffer = self._buffer, []
+        if sum(len(c) for c in buffer) == 0 :
+            return pd.DataFrame({col: np.empty(0, dtype=self.dtype) for col in self.columns})
+        return self._compute(pd.concat(buffer))
+
+
+def run_chunked(chunks, specs: list[tuple[str, dict]], dtype=None) :
+    """Compute the indicators in specs over an iterable of consecutive chunks of one history.
+    Yields the output columns chunk by chunk (the first chunks may be merged for the warm-up);
+    pd.concat of all yielded DataFrames equals run_pipeline(pd.concat(chunks), specs, dtype).
+    """
+    pipeline = ChunkedPipeline(specs, dtype=dtype)
+    for chunk in chunks :
+        out = pipeline.update(chunk)
+        if len(out) > 0 :
+            yield out
+    out = pipeline.finish()
+    if len(out) > 0 :
+        yield out
+
+
+def run_cached(ticker: str, specs: list[tuple[str, dict]], interval: str = '1m', chunk_size: int = 1_000_000,
+    start=None, end=None, cache_dir: str = None, dtype=None) :
+    """run_chunked over the cached history of ticker (see common/cache.py), read chunk_size bars at a time.
+    Only one chunk of bars and results is in memory at any time, e.g.
+    for out in run_cached('AAPL', [('adx', {'n_smooth': 14}), ('macd', {})], interval='1m') :
+        append_hist(out, 'AAPL-indicators', interval='1m')
+    """
+    return run_chunked(iter_hist(ticker, interval, chunk_size, start=start, end=end, cache_dir=cache_dir), specs, dtype=dtype)
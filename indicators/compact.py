@@ -0,0 +1,62 @@
+import functools
+import inspect
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+# Compact output of the add_* functions.
+# By default an add_* function writes its outputs and all intermediates (e.g. TR1, DMplus, DX for ADX) as float64
+# columns into df. Decorated with @compact_output(outputs), it additionally accepts:
+#   intermediates=False  only the output columns are written, the intermediates are computed on a shallow copy
+#   dtype=np.float32     the output columns are stored with this dtype (the intermediates keep theirs)
+#   inplace=False        df is not modified, the outputs are returned as IndicatorValues (plain arrays)
+
+
+class IndicatorValues(NamedTuple) :
+    """Outputs of an indicator as arrays: values[column] belongs to index.
+    """
+    index: pd.Index
+    values: dict[str, np.ndarray]
+
+    def to_frame(self) -> pd.core.frame.DataFrame :
+        return pd.DataFrame(self.values, index=self.index)
+
+    @property
+    def nbytes(self) -> int :
+        return sum(values.nbytes for values in self.values.values())
+
+
+def compact_output(outputs) :
+    """Decorator for add_*(df, ...) functions. outputs(params) -> names of the output columns,
+    where params are the bound arguments (with defaults). The decorated function gets outputs as attribute.
+    """
+    def decorator(func) :
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(df, *args, intermediates: bool = True, dtype=None, inplace: bool = True, **kwargs) :
+            if intermediates and dtype is None and inplace :
+                return func(df, *args, **kwargs)
+            bound = signature.bind(df, *args, **kwargs)
+            bound.apply_defaults()
+            work = df.copy(deep=False)
+            func(work, *args, **kwargs)
+            columns = {col: work[col].to_numpy(dtype=dtype) for col in outputs(bound.arguments)}
+            if not inplace :
+                return IndicatorValues(df.index, columns)
+            for col in work.columns :
+                if col in columns :
+                    df[col] = columns[col]
+                elif intermediates and col not in df.columns :
+                    df[col] = work[col]
+
+        parameters = list(signature.parameters.values()) + [
+            inspect.Parameter('intermediates', inspect.Parameter.KEYWORD_ONLY, default=True),
+            inspect.Parameter('dtype', inspect.Parameter.KEYWORD_ONLY, default=None),
+            inspect.Parameter('inplace', inspect.Parameter.KEYWORD_ONLY, default=True)]
+        wrapper.__signature__ = signature.replace(parameters=parameters)
+        wrapper.outputs = outputs
+        return wrapper
+    return decorator
@@ -0,0 +1,19 @@
+from indicators.moving_average import add_sma, add_ema, add_wma, exponential_moving_average, weighted_moving_average
+from indicators.trend_indicators import add_true_range, add_average_true_range, add_adx, add_macd, macd_histogram, adx_crossovers
+from indicators.price_channels import add_bollinger_bands, add_donchian_channel, add_keltner_channel
+from indicators.compact import IndicatorValues
+from indicators.pipeline import run_pipeline
+from indicators.panel import run_panel, to_panel
+from indicators.chunked import ChunkedPipeline, run_chunked, run_cached
+from indicators.sweep import Sweep, sweep_sma, sweep_wma, sweep_ema, sweep_donchian_channel, sweep_bollinger_bands, sweep_keltner_channel
+from indicators.streaming import (StreamingIndicator, StreamingSMA, StreamingEMA, StreamingWMA, StreamingATR, StreamingADX,
+    StreamingMACD, StreamingBollingerBands, StreamingDonchianChannel, StreamingKeltnerChannel)
+from indicators.signals import Signals, crossings, adx_signals, macd_signals, donchian_signals, keltner_signals, bollinger_signals
+from indicators.backtest import Backtest, backtest, backtest_grid, positions, RULES
+
+
+# Compute-only API for workers that never plot or download, e.g.
+#   from indicators.compute import run_pipeline, backtest_grid
+# Importing it loads neither matplotlib (imported by common/plotting.py on the first figure) nor yfinance
+# (imported by YahooSource on the first download). benchmarks/startup.py checks this together with the
+# import time and memory of a fresh interpreter.
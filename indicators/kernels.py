@@ -0,0 +1,223 @@
+import math
+import threading
+
+import numpy as np
+
+
+# Kinds of recursive filters supported by recursive_filter().
+# EMA:          y(t) = x(t) * a + (1 - a) * y(t-1)
+# WILDER:       y(t) = y(t-1) - y(t-1) / a + x(t)
+# RUNNING_MEAN: y(t) = ((a - 1) * y(t-1) + x(t)) / a
+EMA = 0
+WILDER = 1
+RUNNING_MEAN = 2
+
+
+def _filter_loop(x, y, start: int, kind: int, a: float) :
+    """Run the recursion in place on y, starting after the seed at y[start].
+    The arithmetic is kept in exactly the same order as the original per-row implementations,
+    so the results are bit-identical to them.
+    """
+    if kind == EMA :
+        b = 1 - a
+        for i in range(start + 1, len(x)) :
+            y[i] = x[i] * a + b * y[i-1]
+    elif kind == WILDER :
+        for i in range(start + 1, len(x)) :
+            y[i] = y[i-1] - y[i-1] / a + x[i]
+    else :
+        b = a - 1
+        for i in range(start + 1, len(x)) :
+            y[i] = (b * y[i-1] + x[i]) / a
+    return y
+
+
+def _filter_loop_2d(x, y, start: int, kind: int, a: float) :
+    """_filter_loop for a (time x columns) block; every column is filtered independently.
+    """
+    for j in range(x.shape[1]) :
+        _filter_loop(x[:, j], y[:, j], start, kind, a)
+    return y
+
+
+def recursive_filter(values, kind: int, a: float, seed, start: int = 0) -> np.ndarray :
+    """Shared recursive smoothing kernel used by EMA, Wilder smoothing (TR/DM) and the ADX running mean.
+    values: 1-D input (array or Series) or 2-D (time x columns) block, seed: value(s) of the output at index start.
+    Entries before start are NaN. Returns a new float64 array.
+    If numba is installed the loop is compiled (on the first call), otherwise it runs on plain Python floats (1-D)
+    or NumPy rows (2-D).
+    """
+    x = np.asarray(values, dtype=np.float64)
+    y = np.full(x.shape, np.nan)
+    if start >= len(x) :
+        return y
+    y[start] = seed
+    if x.ndim == 2 :
+        if _compiled() :
+            return _filter_loop_2d(x, y, start, kind, float(a))
+        # Vectorized over the columns, one NumPy operation per time step.
+        return _filter_loop(x, y, start, kind, float(a))
+    if _compiled() :
+        return _filter_loop(x, y, start, kind, float(a))
+    # Python floats are much faster to index than NumPy scalars.
+    return np.array(_filter_loop(x.tolist(), y.tolist(), start, kind, float(a)), dtype=np.float64)
+
+
+# Resumable rolling mean and variance with a fixed window, for chunked computation (see indicators/chunked.py).
+# They replicate the (Kahan-compensated) add/remove algorithms of pandas' rolling mean() and var(), so a series
+# processed in any number of chunks gives exactly the values of Series.rolling(n).mean() / .var() on the full series.
+# The state of a series is its accumulator array plus the last n input values (the tail):
+#   mean: [sum, compensation add, compensation remove, count, negative count, same-value count, previous value]
+#   var:  [count, mean, sum of squared deviations, compensation add, compensation remove]
+# Like pandas, the variance of a window is recomputed from its values after an update that lost too much precision.
+# Entries of x before skip are the tail of the previous chunk (already accumulated), out gets the results for x[skip:].
+
+_INV_COND_TOL = np.finfo(np.float64).eps * 1e3
+
+
+def _rolling_mean_loop(x, out, skip: int, n: int, acc) :
+    total, comp_add, comp_remove, nobs, neg, same, prev = acc[0], acc[1], acc[2], acc[3], acc[4], acc[5], acc[6]
+    for i in range(skip, len(x)) :
+        if i >= n :
+            v = x[i-n]
+            if v == v :
+                nobs -= 1
+                y = -v - comp_remove
+                t = total + y
+                comp_remove = t - total - y
+                total = t
+                if math.copysign(1.0, v) < 0 :
+                    neg -= 1
+        v = x[i]
+        if v == v :
+            nobs += 1
+            y = v - comp_add
+            t = total + y
+            comp_add = t - total - y
+            total = t
+            if math.copysign(1.0, v) < 0 :
+                neg += 1
+            same = same + 1 if v == prev else 1
+            prev = v
+        r = math.nan
+        if nobs >= n and nobs > 0 :
+            r = total / nobs
+            if same >= nobs :
+                r = prev
+            elif neg == 0 and r < 0 :
+                r = 0.0
+            elif neg == nobs and r > 0 :
+                r = 0.0
+        out[i-skip] = r
+    acc[0], acc[1], acc[2], acc[3], acc[4], acc[5], acc[6] = total, comp_add, comp_remove, nobs, neg, same, prev
+    return out
+
+
+def _var_add(v, acc, comp: int) :
+    """Welford step with Kahan compensation acc[comp]; returns True if the update lost too much precision.
+    """
+    prev_m2 = acc[2]
+    acc[0] += 1
+    prev_mean = acc[1] - acc[comp]
+    y = v - acc[comp]
+    t = y - acc[1]
+    acc[comp] = t + acc[1] - y
+    acc[1] = acc[1] + t / acc[0]
+    acc[2] = acc[2] + (v - prev_mean) * (v - acc[1])
+    return prev_m2 * _INV_COND_TOL > acc[2]
+
+
+def _var_remove(v, acc) :
+    prev_m2 = acc[2]
+    acc[0] -= 1
+    if acc[0] == 0 :
+        acc[1], acc[2] = 0.0, 0.0
+        return False
+    prev_mean = acc[1] - acc[4]
+    y = v - acc[4]
+    t = y - acc[1]
+    acc[4] = t + acc[1] - y
+    acc[1] = acc[1] - t / acc[0]
+    acc[2] = acc[2] - (v - prev_mean) * (v - acc[1])
+    return prev_m2 * _INV_COND_TOL > acc[2]
+
+
+def _rolling_var_loop(x, out, skip: int, n: int, acc) :
+    for i in range(skip, len(x)) :
+        unstable = False
+        if i >= n and x[i-n] == x[i-n] :
+            unstable = _var_remove(x[i-n], acc)
+        if x[i] == x[i] :
+            unstable = _var_add(x[i], acc, 3) or unstable
+        if i == 0 or n == 1 or unstable :
+            # Recompute the window from scratch, like pandas after an ill-conditioned update.
+            for k in range(5) :
+                acc[k] = 0.0
+            for j in range(max(i - n + 1, 0), i + 1) :
+                if x[j] == x[j] :
+                    _var_add(x[j], acc, 3)
+        out[i-skip] = acc[2] / (acc[0] - 1) if acc[0] >= n and acc[0] > 1 else math.nan
+    return out
+
+
+# numba takes longer to import than pandas, so it is only imported (and the loops compiled) on the first call
+# of a kernel: importing the indicator modules (e.g. indicators/compute.py) does not pay for it.
+_numba = None  # None: not loaded yet, True: loops compiled, False: numba not installed
+_numba_lock = threading.Lock()
+
+
+def _compiled() -> bool :
+    """Replace the loops by their numba-compiled versions on first use. Returns False if numba is not installed.
+    """
+    global _numba, _filter_loop, _filter_loop_2d, _var_add, _var_remove, _rolling_mean_loop, _rolling_var_loop
+    if _numba is None :
+        with _numba_lock :
+            if _numba is None :
+                try :
+                    from numba import njit
+                except ImportError :
+                    _numba = False
+                    return _numba
+                jit = njit(cache=True, nogil=True)
+                # The loops call each other through the module globals, which numba resolves when it compiles them.
+                _filter_loop, _filter_loop_2d = jit(_filter_loop), jit(_filter_loop_2d)
+                _var_add, _var_remove = jit(_var_add), jit(_var_remove)
+                _rolling_mean_loop, _rolling_var_loop = jit(_rolling_mean_loop), jit(_rolling_var_loop)
+                _numba = True
+    return _numba
+
+
+def _rolling(values, n: int, state, size: int) -> tuple[np.ndarray, tuple] :
+    compiled = _compiled()
+    loop = _rolling_mean_loop if size == 7 else _rolling_var_loop
+    x = np.asarray(values, dtype=np.float64)
+    if state is None :
+        acc = np.zeros(size)
+        if size == 7 :
+            # The same-value count of the mean starts at the first value (as in pandas).
+            acc[6] = x[0] if len(x) > 0 else np.nan
+        tail = np.empty(0)
+    else :
+        acc, tail = state[0].copy(), state[1]
+    ext = np.concatenate((tail, x))
+    out = np.empty(len(x))
+    if compiled :
+        loop(ext, out, len(tail), n, acc)
+    else :
+        acc_list = acc.tolist()
+        out[:] = loop(ext.tolist(), [0.0] * len(x), len(tail), n, acc_list)
+        acc[:] = acc_list
+    return out, (acc, ext[max(len(ext) - n, 0):].copy())
+
+
+def rolling_mean(values, n: int, state: tuple = None) -> tuple[np.ndarray, tuple] :
+    """Rolling mean of values (window n, min_periods n), continued from the state returned for the previous chunk.
+    Returns (values identical to Series.rolling(n).mean() of the concatenated chunks, state for the next chunk).
+    """
+    return _rolling(values, n, state, 7)
+
+
+def rolling_var(values, n: int, state: tuple = None) -> tuple[np.ndarray, tuple] :
+    """Rolling variance (ddof=1) like rolling_mean(), identical to Series.rolling(n).var().
+    """
+    return _rolling(values, n, state, 5)
@@ -1,7 +1,14 @@
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 
+from indicators.kernels import recursive_filter, EMA
+from indicators.compact import compact_output
+from common.profiling import profiled
+from common.plotting import closes_figures, subplots, price_range, thin, axis_width, save_figure
 
+
+@profiled('compute')
+@compact_output(lambda p : [f"SMA{p['window_size']}"])
 def add_sma(df: pd.core.frame.DataFrame, window_size: int) :
     """Add SMA to DataFrame
     The Simple Moving Average (SMA) is an arithmetic mean commonly used as a window_size=50 or window_size=200-day moving average.
@@ -12,25 +19,49 @@ def add_sma(df: pd.core.frame.DataFrame, window_size: int) :
     df[f'SMA{window_size}'] = df['Close'].rolling(window=window_size, min_periods=window_size).mean()
 
 
+def exponential_moving_average(values, n_smooth: int) -> np.ndarray :
+    """EMA of values (array or Series), seeded with the first value.
+    SF (Smoothing Factor) = 2/ (n_smooth + 1)
+    """
+    values = np.asarray(values, dtype=float)
+    return recursive_filter(values, kind=EMA, a=2 / (n_smooth + 1), seed=values[0])
+
+
+@profiled('compute')
+@compact_output(lambda p : [p['colname'] or f"EMA{p['n_smooth']}"])
 def add_ema(df: pd.core.frame.DataFrame, n_smooth: int, refcol: str = 'Close', colname: str = None) :
     """Add Exponential Moving Average (EMA) to DataFrame
     SF (Smoothing Factor) = 2/ (n_smooth + 1)
     EMA(t) = C(t) * SF + (1 - SF) * EMA(t-1)
     refcol: Reference that is used for EMA calculation (column of df).
     """
-    sf = 2 / (n_smooth + 1)
-    
     if colname == None :
         colname = f'EMA{n_smooth}'
 
-    ema = pd.Series(0.0, index=df.index)
-    ema.iloc[0] = df.iloc[0][refcol]
-    for i in range(1, len(df)):
-        ema.iloc[i] = df.iloc[i][refcol] * sf + (1 - sf) * ema.iloc[i-1]
-    
-    df[colname] = ema
+    df[colname] = exponential_moving_average(df[refcol], n_smooth=n_smooth)
+
 
+def weighted_moving_average(values, window_size: int) :
+    """WMA of values (Series, 1-D array or 2-D (time x columns) block) with weights 1..window_size.
+    The most recent value has the highest weight.
+    The weighted sum is accumulated one window position at a time for all days at once (in the same order
+    as sum(window * range(1, window_size + 1))), so no Python callback per window is needed.
+    """
+    x = np.asarray(values, dtype=float)
+    n = window_size
+    wma = np.full(x.shape, np.nan)
+    if len(x) >= n :
+        acc = 0
+        for k in range(n) :
+            acc = acc + x[k:len(x) - n + 1 + k] * (k + 1)
+        wma[n - 1:] = acc / sum(range(1, n + 1))
+    if isinstance(values, pd.Series) :
+        return pd.Series(wma, index=values.index, name=values.name)
+    return wma
 
+
+@profiled('compute')
+@compact_output(lambda p : [f"WMA{p['window_size']}"])
 def add_wma(df: pd.core.frame.DataFrame, window_size: int) :
     """Add WMA to DataFrame
     A Weighted Moving Average (WMA) assigns greater significance to recent data by multiplying each price with a weighted factor.
@@ -40,25 +71,26 @@ def add_wma(df: pd.core.frame.DataFrame, window_size: int) :
     """
     assert len(df) > window_size, f'At least {window_size} trading days for WMA{window_size} needed.'
 
-    def _rolling_multiply(window) :
-        wz = len(window) + 1
-        return sum(window * range(1, wz)) / sum(range(1, wz))
-    
-    df[f'WMA{window_size}'] = df['Close'].rolling(window=window_size, min_periods=window_size).apply(_rolling_multiply, raw=True)
+    df[f'WMA{window_size}'] = weighted_moving_average(df['Close'], window_size=window_size)
 
 
-def plot_average(path: str, df: pd.core.frame.DataFrame, company: str, indicators: list[str]) :
+@profiled('plot')
+@closes_figures
+def plot_average(path: str, df: pd.core.frame.DataFrame, company: str, indicators: list[str], fmt: str = 'pdf',
+    downsample: bool = False) -> str :
     """Plot moving average indicators for one company.
+    downsample: draw about one bar and a few line points per pixel instead of every day (for long histories).
     """
-    plt.figure(figsize=(15,5))
-    plt.title(f'Moving average indicator(s) for company {company}')
+    fig, ax = subplots(figsize=(15,5))
+    ax.set_title(f'Moving average indicator(s) for company {company}')
+    max_points = axis_width(ax) if downsample else None
 
-    plt.bar(x=df.index, height=df['High']-df['Low'], bottom=df['Low'], color='blue', label=f'{company} Chart')
+    price_range(ax, df, company, max_points=max_points)
     
     for indicator in indicators :
-        plt.plot(df.index, df[indicator], label=f'{indicator}', linewidth=0.5)
+        lines = thin(df, [indicator], max_points)
+        ax.plot(lines.index, lines[indicator], label=f'{indicator}', linewidth=0.5)
 
-    plt.xlim(left=df.index.min(), right=df.index.max())
-    plt.legend(loc='upper left')
-    plt.tight_layout()
-    plt.savefig(f'{path}/MovingAverageIndicators_{company}.pdf')
+    ax.set_xlim(left=df.index.min(), right=df.index.max())
+    ax.legend(loc='upper left')
+    return save_figure(fig, path, f'MovingAverageIndicators_{company}', fmt)
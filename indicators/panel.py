@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+
+from indicators.kernels import recursive_filter, EMA, WILDER, RUNNING_MEAN
+from indicators.moving_average import weighted_moving_average
+from indicators.trend_indicators import true_range_values
+from indicators.pipeline import plan, output_columns
+from common.profiling import profiled
+
+
+# Panel (multi-symbol) mode of the indicator pipeline.
+# Each OHLC field is a (time x symbols) block, and every indicator is computed for all symbols at once.
+# Symbols may have different histories (NaN-padded starts, gaps from different trading calendars, earlier ends):
+# before computing, the complete bars of every column are packed to the top of the block; afterwards the results
+# are moved back to their timestamps. This way all seeds (first EMA value, first Wilder sum, first ADX mean)
+# are at the same row for every symbol, and the values are identical to running the add_* functions on each
+# symbol's own history.
+
+
+def pack_order(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> tuple[np.ndarray, np.ndarray] :
+    """Row order that moves the complete bars of every column to the top (stable), and their number per column.
+    """
+    valid = ~(np.isnan(high) | np.isnan(low) | np.isnan(close))
+    return np.argsort(~valid, axis=0, kind='stable'), valid.sum(axis=0)
+
+
+def pack(block: np.ndarray, order: np.ndarray, count: np.ndarray) -> np.ndarray :
+    """Move the complete bars of every column to the top (NaN-padded at the end).
+    """
+    packed = np.take_along_axis(block, order, axis=0)
+    packed[np.arange(len(block))[:, None] >= count[None, :]] = np.nan
+    return packed
+
+
+def unpack(packed: np.ndarray, order: np.ndarray, count: np.ndarray) -> np.ndarray :
+    """Inverse of pack (NaN at the timestamps without a complete bar).
+    """
+    block = np.full(packed.shape, np.nan)
+    inside = np.arange(len(packed))[:, None] < count[None, :]
+    np.put_along_axis(block, order, np.where(inside, packed, np.nan), axis=0)
+    return block
+
+
+def _column_sums(block: np.ndarray) -> np.ndarray :
+    """Sum of every column, summed the same way as Series.sum() (pairwise over contiguous values).
+    """
+    return np.ascontiguousarray(block.T).sum(axis=1)
+
+
+def _column_nanmeans(block: np.ndarray) -> np.ndarray :
+    """Mean of the non-NaN values of every column, like Series.mean().
+    """
+    mask = np.isnan(block)
+    count = mask.shape[0] - mask.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore') :
+        return _column_sums(np.where(mask, 0.0, block)) / count
+
+
+def _shift(block: np.ndarray) -> np.ndarray :
+    shifted = np.full(block.shape, np.nan)
+    shifted[1:] = block[:-1]
+    return shifted
+
+
+def _rolling(block: np.ndarray, n: int) :
+    return pd.DataFrame(block).rolling(window=n, min_periods=n)
+
+
+def _ema(x: np.ndarray, n: int) -> np.ndarray :
+    return recursive_filter(x, kind=EMA, a=2 / (n + 1), seed=x[0])
+
+
+def _wilder(x: np.ndarray, n: int) -> np.ndarray :
+    return recursive_filter(x, kind=WILDER, a=n, seed=_column_sums(x[1:(n + 1)]), start=n)
+
+
+def _tr1(f, r) :
+    prev_close = _shift(f['Close'])
+    tr1 = true_range_values(f['High'], f['Low'], prev_close)
+    tr1[:1] = np.nan
+    return {'TR1': tr1}
+
+
+def _dm(f, r) :
+    up = f['High'] - _shift(f['High'])
+    down = _shift(f['Low']) - f['Low']
+    dm_plus = np.where((up > down) & (up > 0), up, 0.0)
+    dm_minus = np.where((down > up) & (down > 0), down, 0.0)
+    dm_plus[:1] = np.nan
+    dm_minus[:1] = np.nan
+    return {'DMplus': dm_plus, 'DMminus': dm_minus}
+
+
+def _tr(f, r, n) :
+    return {f'TR{n}': _wilder(r['TR1'], n)}
+
+
+def _dm_smooth(f, r, n) :
+    return {f'DM{n}plus': _wilder(r['DMplus'], n), f'DM{n}minus': _wilder(r['DMminus'], n)}
+
+
+def _adx(f, r, n) :
+    with np.errstate(invalid='ignore', divide='ignore') :
+        di_plus = 100 * r[f'DM{n}plus'] / r[f'TR{n}']
+        di_minus = 100 * r[f'DM{n}minus'] / r[f'TR{n}']
+        dx = 100 * np.abs((di_plus - di_minus) / (di_plus + di_minus))
+    adx = recursive_filter(dx, kind=RUNNING_MEAN, a=n, seed=_column_nanmeans(dx[n:(2*n + 1)]), start=2*n)
+    return {f'DI{n}plus': di_plus, f'DI{n}minus': di_minus, 'DX': dx, f'ADX{n}': adx}
+
+
+def _sma(f, r, n) :
+    return {f'SMA{n}': _rolling(f['Close'], n).mean().to_numpy()}
+
+
+def _ema_node(f, r, n) :
+    return {f'EMA{n}': _ema(f['Close'], n)}
+
+
+def _wma(f, r, n) :
+    return {f'WMA{n}': weighted_moving_average(f['Close'], window_size=n)}
+
+
+def _atr(f, r, n) :
+    return {f'ATR{n}': _rolling(r['TR1'], n).mean().to_numpy()}
+
+
+def _macd(f, r, fast, slow) :
+    col = f'MACD{fast}-{slow}'
+    macd = r[f'EMA{fast}'] - r[f'EMA{slow}']
+    return {col: macd, f'{col}-trigger-{9}': _ema(macd, 9)}
+
+
+def _std(f, r, n) :
+    return {f'STD{n}': pd.DataFrame(f['Close'] - r[f'SMA{n}']).rolling(window=n).std().to_numpy()}
+
+
+def _bollinger(f, r, n, factor) :
+    return {
+        f'BBand-upper-{n}-{factor}': r[f'SMA{n}'] + factor * r[f'STD{n}'],
+        f'BBand-lower-{n}-{factor}': r[f'SMA{n}'] - factor * r[f'STD{n}']}
+
+
+def _donchian(f, r, n) :
+    upper = pd.DataFrame(f['High']).rolling(window=n).max().to_numpy()
+    lower = pd.DataFrame(f['Low']).rolling(window=n).min().to_numpy()
+    return {f'MAX{n}': upper, f'MIN{n}': lower, f'MIDDLE{n}': (upper + lower) / 2}
+
+
+def _keltner(f, r, ema_window, atr_range, atr_factor) :
+    ema, atr = r[f'EMA{ema_window}'], r[f'ATR{atr_range}']
+    return {
+        f'Keltner-upper-{ema_window}-{atr_range}': ema + atr * atr_factor,
+        f'Keltner-lower-{ema_window}-{atr_range}': ema - atr * atr_factor}
+
+
+# Same nodes as in indicators/pipeline.py, computed on (time x symbols) arrays.
+_PANEL_NODES = {
+    'TR1': _tr1, 'DM': _dm, 'TR': _tr, 'DMS': _dm_smooth, 'ADX': _adx,
+    'SMA': _sma, 'EMA': _ema_node, 'WMA': _wma, 'ATR': _atr, 'MACD': _macd,
+    'STD': _std, 'BB': _bollinger, 'DONCHIAN': _donchian, 'KELTNER': _keltner,
+}
+
+
+@profiled('compute')
+def run_panel(high: pd.core.frame.DataFrame, low: pd.core.frame.DataFrame, close: pd.core.frame.DataFrame,
+    specs: list[tuple[str, dict]]) -> dict[str, pd.core.frame.DataFrame] :
+    """Compute the indicators in specs (see run_pipeline) for many symbols at once.
+    high, low, close: (time x symbols) DataFrames with the same index and columns, NaN where a symbol has no bar.
+    Returns {output column: (time x symbols) DataFrame}, e.g. result['ADX14']['VWAGY'].
+    Symbols with too short histories get NaN instead of an error.
+    """
+    assert high.shape == low.shape == close.shape, f'High, Low and Close need the same shape.'
+    fields = {'High': high.to_numpy(dtype=float), 'Low': low.to_numpy(dtype=float), 'Close': close.to_numpy(dtype=float)}
+    order, count = pack_order(fields['High'], fields['Low'], fields['Close'])
+    fields = {name: pack(block, order, count) for name, block in fields.items()}
+
+    results = {}
+    for node in plan(specs) :
+        results.update(_PANEL_NODES[node[0]](fields, results, *node[1:]))
+
+    panel = {}
+    for name, params in specs :
+        for col in output_columns(name, params) :
+            if col not in panel :
+                panel[col] = pd.DataFrame(unpack(results[col], order, count), index=close.index, columns=close.columns)
+    return panel
+
+
+def to_panel(histories: dict[str, pd.core.frame.DataFrame], field: str) -> pd.core.frame.DataFrame :
+    """(time x symbols) block of one field from {symbol: OHLC DataFrame} (e.g. from get_watchlist_hist).
+    Histories are aligned on the union of their timestamps.
+    """
+    return pd.DataFrame({symbol: df[field] for symbol, df in histories.items()})
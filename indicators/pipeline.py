@@ -0,0 +1,188 @@
+import inspect
+
+import numpy as np
+import pandas as pd
+
+from indicators.moving_average import add_sma, add_ema, add_wma, exponential_moving_average, weighted_moving_average
+from indicators.trend_indicators import add_true_range, add_average_true_range, add_adx, add_macd
+from indicators.trend_indicators import true_range_one, directional_movement, wilder_smooth, directional_index
+from indicators.price_channels import add_bollinger_bands, add_donchian_channel, add_keltner_channel
+from common.profiling import profiled
+
+
+# Declarative indicator pipeline.
+# Every indicator is split into nodes (intermediates like TR1, EMA-n, SMA-n or the rolling std of Bollinger).
+# The planner collects the nodes of all requested indicators into one dependency DAG, so that shared
+# intermediates are computed exactly once, and the result only contains the requested output columns.
+# The nodes use the same operations as the add_* functions, so the values are identical.
+
+
+def _tr1(df, results) :
+    return {'TR1': true_range_one(df)}
+
+
+def _dm(df, results) :
+    dm_plus, dm_minus = directional_movement(df)
+    return {'DMplus': dm_plus, 'DMminus': dm_minus}
+
+
+def _tr(df, results, n) :
+    return {f'TR{n}': pd.Series(wilder_smooth(results['TR1'], n), index=df.index)}
+
+
+def _dm_smooth(df, results, n) :
+    return {
+        f'DM{n}plus': pd.Series(wilder_smooth(results['DMplus'], n), index=df.index),
+        f'DM{n}minus': pd.Series(wilder_smooth(results['DMminus'], n), index=df.index)}
+
+
+def _adx(df, results, n) :
+    di_plus, di_minus, dx, adx = directional_index(
+        dm_plus=results[f'DM{n}plus'], dm_minus=results[f'DM{n}minus'], tr=results[f'TR{n}'], n_smooth=n)
+    return {f'DI{n}plus': di_plus, f'DI{n}minus': di_minus, 'DX': dx, f'ADX{n}': pd.Series(adx, index=df.index)}
+
+
+def _sma(df, results, n) :
+    return {f'SMA{n}': df['Close'].rolling(window=n, min_periods=n).mean()}
+
+
+def _ema(df, results, n) :
+    return {f'EMA{n}': pd.Series(exponential_moving_average(df['Close'], n_smooth=n), index=df.index)}
+
+
+def _wma(df, results, n) :
+    return {f'WMA{n}': weighted_moving_average(df['Close'], window_size=n)}
+
+
+def _atr(df, results, n) :
+    return {f'ATR{n}': results['TR1'].rolling(window=n, min_periods=n).mean()}
+
+
+def _macd(df, results, fast, slow) :
+    col = f'MACD{fast}-{slow}'
+    macd = results[f'EMA{fast}'] - results[f'EMA{slow}']
+    return {col: macd, f'{col}-trigger-{9}': pd.Series(exponential_moving_average(macd, n_smooth=9), index=df.index)}
+
+
+def _std(df, results, n) :
+    return {f'STD{n}': (df['Close'] - results[f'SMA{n}']).rolling(window=n).std()}
+
+
+def _bollinger(df, results, n, factor) :
+    return {
+        f'BBand-upper-{n}-{factor}': results[f'SMA{n}'] + factor * results[f'STD{n}'],
+        f'BBand-lower-{n}-{factor}': results[f'SMA{n}'] - factor * results[f'STD{n}']}
+
+
+def _donchian(df, results, n) :
+    upper = df['High'].rolling(window=n).max()
+    lower = df['Low'].rolling(window=n).min()
+    return {f'MAX{n}': upper, f'MIN{n}': lower, f'MIDDLE{n}': (upper + lower) / 2}
+
+
+def _keltner(df, results, ema_window, atr_range, atr_factor) :
+    ema, atr = results[f'EMA{ema_window}'], results[f'ATR{atr_range}']
+    return {
+        f'Keltner-upper-{ema_window}-{atr_range}': ema + atr * atr_factor,
+        f'Keltner-lower-{ema_window}-{atr_range}': ema - atr * atr_factor}
+
+
+# Node type: (compute function, dependencies(*params) -> list of nodes)
+_NODES = {
+    'TR1': (_tr1, lambda : []),
+    'DM': (_dm, lambda : []),
+    'TR': (_tr, lambda n : [('TR1',)]),
+    'DMS': (_dm_smooth, lambda n : [('DM',)]),
+    'ADX': (_adx, lambda n : [('TR', n), ('DMS', n)]),
+    'SMA': (_sma, lambda n : []),
+    'EMA': (_ema, lambda n : []),
+    'WMA': (_wma, lambda n : []),
+    'ATR': (_atr, lambda n : [('TR1',)]),
+    'MACD': (_macd, lambda fast, slow : [('EMA', fast), ('EMA', slow)]),
+    'STD': (_std, lambda n : [('SMA', n)]),
+    'BB': (_bollinger, lambda n, factor : [('SMA', n), ('STD', n)]),
+    'DONCHIAN': (_donchian, lambda n : []),
+    'KELTNER': (_keltner, lambda ema_window, atr_range, atr_factor : [('EMA', ema_window), ('ATR', atr_range)]),
+}
+
+
+# Indicator name -> (add_* function (for parameter names, defaults and output columns), node)
+# Bollinger and Keltner also return their middle line, which the plot functions need (see add_fn.outputs).
+_INDICATORS = {
+    'sma': (add_sma, lambda p : ('SMA', p['window_size'])),
+    'ema': (add_ema, lambda p : ('EMA', p['n_smooth'])),
+    'wma': (add_wma, lambda p : ('WMA', p['window_size'])),
+    'true_range': (add_true_range, lambda p : ('TR', p['tr_factor'])),
+    'average_true_range': (add_average_true_range, lambda p : ('ATR', p['window_size'])),
+    'adx': (add_adx, lambda p : ('ADX', p['n_smooth'])),
+    'macd': (add_macd, lambda p : ('MACD', p['fast'], p['slow'])),
+    'bollinger_bands': (add_bollinger_bands, lambda p : ('BB', p['sma_window'], p['factor'])),
+    'donchian_channel': (add_donchian_channel, lambda p : ('DONCHIAN', p['window_size'])),
+    'keltner_channel': (add_keltner_channel, lambda p : ('KELTNER', p['ema_window'], p['atr_range'], p['atr_factor'])),
+}
+
+
+def indicator_params(name: str, params: dict) -> dict :
+    """Parameters of an indicator, completed with the defaults of its add_* function.
+    """
+    assert name in _INDICATORS, f'Unknown indicator {name}. Available: {list(_INDICATORS)}'
+    bound = inspect.signature(_INDICATORS[name][0]).bind(df=None, **params)
+    bound.apply_defaults()
+    return bound.arguments
+
+
+def output_columns(name: str, params: dict) -> list[str] :
+    """Output columns of an indicator (the columns its add_* function keeps with intermediates=False).
+    """
+    return _INDICATORS[name][0].outputs(indicator_params(name, params))
+
+
+def plan(specs: list[tuple[str, dict]]) -> list[tuple] :
+    """Dependency-ordered list of the nodes needed for specs; every node appears once.
+    specs: [(indicator, parameters), ...], e.g. [('sma', {'window_size': 50}), ('adx', {'n_smooth': 14})].
+    """
+    order, visited = [], set()
+
+    def visit(node: tuple) :
+        if node in visited :
+            return
+        visited.add(node)
+        for dep in _NODES[node[0]][1](*node[1:]) :
+            visit(dep)
+        order.append(node)
+
+    for name, params in specs :
+        visit(_INDICATORS[name][1](indicator_params(name, params)))
+    return order
+
+
+@profiled('compute')
+def run_pipeline(df: pd.core.frame.DataFrame, specs: list[tuple[str, dict]], dtype=None) -> pd.core.frame.DataFrame :
+    """Compute the indicators in specs on df (columns 'High', 'Low', 'Close').
+    Shared intermediates are computed once; df is not modified.
+    dtype: dtype of the output columns (e.g. np.float32; default: float64 as computed).
+    Returns a DataFrame with the output columns of the requested indicators, e.g. stockview.py uses:
+    run_pipeline(df, [('sma', {'window_size': 50}), ('ema', {'n_smooth': 10}), ('adx', {'n_smooth': 14}), ...])
+    """
+    for name, params in specs :
+        p = indicator_params(name, params)
+        if name == 'ema' :
+            assert p['refcol'] == 'Close' and p['colname'] is None, f'The pipeline computes EMAs of Close only.'
+        elif name == 'adx' :
+            n = p['n_smooth']
+            assert n > 0, f'n_smooth must be positive.'
+            assert len(df) > 2*n+2, f'At least {2*n+2} trading days for ADX{n} needed.'
+        elif name in ('sma', 'wma') :
+            n = p['window_size']
+            assert len(df) > n, f'At least {n} trading days for {name.upper()}{n} needed.'
+
+    results = {}
+    for node in plan(specs) :
+        results.update(_NODES[node[0]][0](df, results, *node[1:]))
+
+    columns = []
+    for name, params in specs :
+        for col in output_columns(name, params) :
+            if col not in columns :
+                columns.append(col)
+    return pd.DataFrame({col: np.asarray(results[col], dtype=dtype) for col in columns}, index=df.index)
@@ -0,0 +1,92 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from common import profiling
+from common.profiling import profiled
+from indicators.moving_average import plot_average
+from indicators.trend_indicators import plot_macd, plot_adx
+from indicators.price_channels import plot_bollinger_bands, plot_donchian_channel, plot_keltner_channel
+
+
+# Batch rendering of charts.
+# Every job is rendered in its own figure which is closed after saving or when it fails (see common/plotting.py),
+# so a worker process can render any number of charts without growing.
+
+# Chart name -> plot function; the parameters of a job are passed as keyword arguments.
+CHARTS = {
+    'average': plot_average,
+    'macd': plot_macd,
+    'adx': plot_adx,
+    'bollinger_bands': plot_bollinger_bands,
+    'donchian_channel': plot_donchian_channel,
+    'keltner_channel': plot_keltner_channel,
+}
+
+FORMATS = ('pdf', 'png', 'svg')
+
+
+def init_worker() :
+    """Initializer of rendering worker processes: they never show figures, the non-interactive backend
+    avoids any GUI setup.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_chart(path: str, symbol: str, chart: str, df: pd.core.frame.DataFrame, params: dict, fmt: str = 'pdf') -> str :
+    """Render one chart of one symbol. Returns the path of the file (<path>/<name>.<fmt>).
+    """
+    assert chart in CHARTS, f'Unknown chart {chart}. Available: {list(CHARTS)}'
+    assert fmt in FORMATS, f'Unknown output format {fmt}. Available: {FORMATS}'
+    return CHARTS[chart](path=path, df=df, company=symbol, fmt=fmt, **params)
+
+
+def _render_job(path: str, symbol: str, chart: str, df: pd.core.frame.DataFrame, params: dict, fmt: str, memory: bool = None) :
+    """render_chart in a worker process; with memory not None, the calls are profiled and returned with the file.
+    """
+    if memory is None :
+        return render_chart(path, symbol, chart, df, params, fmt), None
+    with profiling.profile(memory=memory) as prof :
+        file = render_chart(path, symbol, chart, df, params, fmt)
+    return file, (prof.events, prof.counters)
+
+
+@profiled('run')
+def render_batch(jobs: list[tuple[str, str, pd.core.frame.DataFrame, dict]], path: str, fmt: str = 'pdf',
+    max_workers: int = None) -> tuple[list[str], dict[tuple[str, str], Exception]] :
+    """Render many (symbol, chart, df, params) jobs across a process pool, e.g.
+    render_batch([('VWAGY', 'adx', df, {'adx_num': 14}), ('VWAGY', 'macd', df, {})], path, fmt='png').
+    df must already contain the indicator columns the chart needs.
+    max_workers=1 renders in the calling process.
+    Returns (files in job order, {(symbol, chart): exception} of the failed jobs).
+    If a profile is active (see common/profiling.py), the calls in the worker processes are added to it.
+    """
+    assert fmt in FORMATS, f'Unknown output format {fmt}. Available: {FORMATS}'
+    os.makedirs(path, exist_ok=True)
+    files, failures = [None] * len(jobs), {}
+
+    if max_workers == 1 :
+        for i, (symbol, chart, df, params) in enumerate(jobs) :
+            try :
+                files[i] = render_chart(path, symbol, chart, df, params, fmt)
+            except Exception as e :
+                failures[(symbol, chart)] = e
+    else :
+        prof = profiling.active()
+        memory = None if prof is None else prof.memory
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker) as executor :
+            futures = {
+                executor.submit(_render_job, path, symbol, chart, df, params, fmt, memory): (i, symbol, chart)
+                for i, (symbol, chart, df, params) in enumerate(jobs)}
+            for future in as_completed(futures) :
+                i, symbol, chart = futures[future]
+                try :
+                    files[i], recorded = future.result()
+                except Exception as e :
+                    failures[(symbol, chart)] = e
+                    continue
+                if recorded is not None :
+                    prof.merge(*recorded)
+    return [file for file in files if file is not None], failures
@@ -0,0 +1,99 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+# Trading rules of the indicators as vectorized signals.
+# Every function takes the indicator columns of one symbol (Series or 1-D array) or of many symbols
+# ((time x symbols) DataFrame or 2-D array, e.g. from run_panel) and returns boolean buy and sell events
+# of the same shape and type. An event is True on the bar (at its close) on which the rule fires.
+
+
+class Signals(NamedTuple) :
+    """Buy and sell events (boolean, same shape as the inputs).
+    """
+    buy: np.ndarray
+    sell: np.ndarray
+
+
+def _values(x) -> np.ndarray :
+    return np.asarray(x, dtype=np.float64)
+
+
+def _previous(x: np.ndarray, fill) -> np.ndarray :
+    """x shifted one bar forward along the time axis; the first bar gets fill.
+    """
+    prev = np.empty_like(x)
+    prev[:1] = fill
+    prev[1:] = x[:-1]
+    return prev
+
+
+def _like(template, values: np.ndarray) :
+    """values with the index (and columns) of template if it is a Series or DataFrame.
+    """
+    if isinstance(template, pd.DataFrame) :
+        return pd.DataFrame(values, index=template.index, columns=template.columns)
+    if isinstance(template, pd.Series) :
+        return pd.Series(values, index=template.index)
+    return values
+
+
+def _first(condition: np.ndarray) -> np.ndarray :
+    """Bars on which condition becomes True (it was False on the bar before).
+    """
+    return condition & ~_previous(condition, False)
+
+
+def crossings(a, b) -> Signals :
+    """a crosses above b (buy) and a falls back to or below b (sell), like the crossings drawn by plot_macd and plot_adx.
+    """
+    above = _values(a) > _values(b)
+    prev = _previous(above, False)
+    # The first bar has no previous bar and is never a crossing.
+    buy, sell = above & ~prev, ~above & prev
+    buy[:1], sell[:1] = False, False
+    return Signals(_like(a, buy), _like(a, sell))
+
+
+def adx_signals(di_plus, di_minus, adx, strong_trend: float = 25) -> Signals :
+    """+DI crosses above -DI (buy) and -DI crosses above +DI (sell) while ADX > strong_trend (see plot_adx).
+    """
+    cross = crossings(di_plus, di_minus)
+    strong = _values(adx) > strong_trend
+    return Signals(_like(di_plus, np.asarray(cross.buy) & strong), _like(di_plus, np.asarray(cross.sell) & strong))
+
+
+def macd_signals(macd, trigger) -> Signals :
+    """MACD crosses its trigger line from below (buy) and from above (sell) (see plot_macd).
+    """
+    return crossings(macd, trigger)
+
+
+def donchian_signals(close, upper, lower) -> Signals :
+    """Close breaks above the upper (buy) or below the lower (sell) Donchian line of the bar before
+    (see plot_donchian_channel). The lines of the same bar contain its own High and Low, so the close cannot break them.
+    """
+    close = _values(close)
+    buy = close > _previous(_values(upper), np.nan)
+    sell = close < _previous(_values(lower), np.nan)
+    return Signals(_like(upper, buy), _like(upper, sell))
+
+
+def keltner_signals(close, upper, lower) -> Signals :
+    """Breakout of the close above the upper band (buy) and below the lower band (sell) (see plot_keltner_channel).
+    """
+    close = _values(close)
+    buy = _first(close > _values(upper))
+    sell = _first(close < _values(lower))
+    return Signals(_like(upper, buy), _like(upper, sell))
+
+
+def bollinger_signals(high, low, upper, lower) -> Signals :
+    """The low touches the lower band (oversold, buy) and the high touches the upper band (overbought, sell)
+    (see plot_bollinger_bands). Only the first bar of a touch is an event.
+    """
+    buy = _first(_values(low) <= _values(lower))
+    sell = _first(_values(high) >= _values(upper))
+    return Signals(_like(upper, buy), _like(upper, sell))
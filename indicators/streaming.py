@@ -0,0 +1,372 @@
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+# Streaming counterparts of the add_* functions.
+# Each indicator keeps a compact state and is updated with one bar (update) or a micro-batch (update_many) at a time.
+# The recursive indicators (EMA, MACD, ADX) reproduce the batch functions bit for bit,
+# the window indicators (SMA, WMA, ATR, Bollinger, Keltner) up to floating-point rounding of the running sums,
+# Donchian exactly. Bars with NaN prices are handled like in the batch functions: a window containing a NaN value
+# gives NaN (the running sums leave NaN out and count it), recursive indicators propagate NaN.
+# state_dict()/from_state() allow a worker to resume without replaying history.
+
+
+def _div(a: float, b: float) -> float :
+    """a / b with the NaN/inf semantics of pandas (instead of ZeroDivisionError).
+    """
+    if b == 0 :
+        return math.nan if a == 0 or a != a else math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def _nanmean(values: list) -> float :
+    """Mean of the non-NaN values, summed the same way as pandas Series.mean().
+    """
+    values = np.array(values, dtype=np.float64)
+    mask = np.isnan(values)
+    count = len(values) - mask.sum()
+    if count == 0 :
+        return math.nan
+    return float(np.where(mask, 0.0, values).sum() / count)
+
+
+class StreamingIndicator :
+    """Base class of all streaming indicators.
+    Subclasses set columns and implement _update(high, low, close), which returns one value per column.
+    """
+    columns: list[str] = []
+
+    def update(self, bar) -> dict :
+        """Add one bar (mapping with 'High', 'Low' and 'Close', e.g. a row of the DataFrame).
+        Returns {column: value}; values are NaN during the warm-up phase, like in the batch functions.
+        """
+        return dict(zip(self.columns, self._update(float(bar['High']), float(bar['Low']), float(bar['Close']))))
+
+    def update_many(self, df: pd.core.frame.DataFrame) -> pd.core.frame.DataFrame :
+        """Add a micro-batch of bars (DataFrame with 'High', 'Low' and 'Close'). Returns one row per bar.
+        """
+        rows = [self._update(h, l, c) for h, l, c in zip(
+            df['High'].to_numpy(dtype=float).tolist(), df['Low'].to_numpy(dtype=float).tolist(), df['Close'].to_numpy(dtype=float).tolist())]
+        return pd.DataFrame(rows, index=df.index, columns=self.columns, dtype=np.float64)
+
+    def state_dict(self) -> dict :
+        """JSON-serializable state of the indicator.
+        """
+        return _encode(self)
+
+    @staticmethod
+    def from_state(state: dict) -> 'StreamingIndicator' :
+        """Restore an indicator from state_dict().
+        """
+        return _decode(state)
+
+
+def _encode(value) :
+    if type(value).__name__ in _CLASSES :
+        return {'class': type(value).__name__, 'state': {k: _encode(v) for k, v in vars(value).items()}}
+    if isinstance(value, deque) :
+        return {'deque': [_encode(v) for v in value], 'maxlen': value.maxlen}
+    if isinstance(value, (list, tuple)) :
+        return [_encode(v) for v in value]
+    if isinstance(value, np.generic) :
+        return value.item()
+    return value
+
+
+def _decode(value) :
+    if isinstance(value, dict) and 'class' in value :
+        obj = object.__new__(_CLASSES[value['class']])
+        for k, v in value['state'].items() :
+            setattr(obj, k, _decode(v))
+        return obj
+    if isinstance(value, dict) and 'deque' in value :
+        return deque([_decode(v) for v in value['deque']], maxlen=value['maxlen'])
+    if isinstance(value, list) :
+        return [_decode(v) for v in value]
+    return value
+
+
+class _RollingSum :
+    """Sum over the last window_size values (ring buffer + running sum).
+    NaN values are not added to the sum but counted, a window with NaN values is not full.
+    The sum is recomputed exactly every window_size updates, so rounding errors do not accumulate.
+    """
+    def __init__(self, window_size: int) :
+        self.window_size = window_size
+        self.buffer = deque(maxlen=window_size)
+        self.total = 0.0
+        self.nans = 0
+        self.updates = 0
+
+    def push(self, value: float) -> float :
+        if len(self.buffer) == self.window_size :
+            old = self.buffer[0]
+            if old != old :
+                self.nans -= 1
+            else :
+                self.total -= old
+        self.buffer.append(value)
+        if value != value :
+            self.nans += 1
+        else :
+            self.total += value
+        self.updates += 1
+        if self.updates % self.window_size == 0 :
+            self.total = math.fsum(v for v in self.buffer if v == v)
+        return self.total
+
+    def full(self) -> bool :
+        """window_size values without NaN.
+        """
+        return len(self.buffer) == self.window_size and self.nans == 0
+
+
+class StreamingSMA(StreamingIndicator) :
+    """Simple Moving Average of 'Close' (see add_sma).
+    """
+    def __init__(self, window_size: int) :
+        self.columns = [f'SMA{window_size}']
+        self.sum = _RollingSum(window_size)
+
+    def push(self, value: float) -> float :
+        total = self.sum.push(value)
+        return total / self.sum.window_size if self.sum.full() else math.nan
+
+    def _update(self, high: float, low: float, close: float) -> tuple :
+        return (self.push(close),)
+
+
+class StreamingEMA(StreamingIndicator) :
+    """Exponential Moving Average (see add_ema). The first value seeds the EMA.
+    """
+    def __init__(self, n_smooth: int, colname: str = None) :
+        self.columns = [f'EMA{n_smooth}' if colname is None else colname]
+        self.sf = 2 / (n_smooth + 1)
+        self.ema = None
+
+    def push(self, value: float) -> float :
+        if self.ema is None :
+            self.ema = value
+        else :
+            self.ema = value * self.sf + (1 - self.sf) * self.ema
+        return self.ema
+
+    def _update(self, high: float, low: float, close: float) -> tuple :
+        return (self.push(close),)
+
+
+class StreamingWMA(StreamingIndicator) :
+    """Weighted Moving Average of 'Close' (see add_wma).
+    Keeps the plain and the weighted sum of the window: WS(t) = WS(t-1) + n * c(t) - S(t-1).
+    NaN closes count as 0 in the sums and make the next window_size values NaN (like the batch version).
+    """
+    def __init__(self, window_size: int) :
+        self.columns = [f'WMA{window_size}']
+        self.window_size = window_size
+        self.buffer = deque(maxlen=window_size)
+        self.sum = 0.0
+        self.weighted = 0.0
+        self.nans = 0
+        self.updates = 0
+
+    def _update(self, high: float, low: float, close: float) -> tuple :
+        n = self.window_size
+        value = close if close == close else 0.0
+        if len(self.buffer) == n :
+            old = self.buffer[0]
+            self.weighted += n * value - self.sum
+            self.sum += value - (old if old == old else 0.0)
+            self.nans -= old != old
+        else :
+            self.sum += value
+            self.weighted += (len(self.buffer) + 1) * value
+        self.buffer.append(close)
+        self.nans += close != close
+        self.updates += 1
+        if self.updates % n == 0 :
+            self.sum = math.fsum(c for c in self.buffer if c == c)
+            self.weighted = math.fsum(c * w for w, c in enumerate(self.buffer, start=1) if c == c)
+        if len(self.buffer) < n or self.nans > 0 :
+            return (math.nan,)
+        return (self.weighted / (n * (n + 1) / 2),)
+
+
+class _TrueRange :
+    """True Range of the current bar (TR1, see add_true_range_one). NaN for the first bar and for bars with a NaN High or Low.
+    """
+    def __init__(self) :
+        self.prev_close = None
+
+    def push(self, high: float, low: float, close: float) -> float :
+        prev_close, self.prev_close = self.prev_close, close
+        if prev_close is None :
+            return math.nan
+        # Like the batch TR1 (true_range_values), a NaN previous close is skipped by max().
+        return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+class StreamingATR(StreamingIndicator) :
+    """Average True Range (see add_average_true_range).
+    """
+    def __init__(self, window_size: int = 20) :
+        self.columns = [f'ATR{window_size}']
+        self.tr = _TrueRange()
+        self.sma = StreamingSMA(window_size)
+
+    def push(self, high: float, low: float, close: float) -> float :
+        # The NaN True Range of the first bar fills the first window position, like in the batch version.
+        return self.sma.push(self.tr.push(high, low, close))
+
+    def _update(self, high: float, low: float, close: float) -> tuple :
+        return (self.push(high, low, close),)
+
+
+class StreamingADX(StreamingIndicator) :
+    """Average Directional Index with +DI and -DI (see add_adx).
+    Wilder sums are seeded like the batch version (sum of the first n_smooth values, mean of the first n_smooth+1 DX).
+    """
+    def __init__(self, n_smooth: int = 14) :
+        n = n_smooth
+        self.columns = [f'ADX{n}', f'DI{n}plus', f'DI{n}minus']
+        self.n = n
+        self.count = 0
+        self.prev = None
+        self.tr = _TrueRange()
+        self.seeds = [[], [], []]  # TR1, DMplus, DMminus of bars 1..n
+        self.sums = [math.nan, math.nan, math.nan]  # TRn, DMnplus, DMnminus
+        self.dx_seed = []  # DX of bars n..2n
+        self.adx = math.nan
+
+    def _update(self, high: float, low: float, close: float) -> tuple :
+        n, i = self.n, self.count
+        self.count += 1
+        tr = self.tr.push(high, low, close)
+        prev, self.prev = self.prev, (high, low)
+        if prev is None :
+            return (math.nan, math.nan, math.nan)
+
+        up, down = high - prev[0], prev[1] - low
+        values = (tr, up if up > down and up > 0 else 0.0, down if down > up and down > 0 else 0.0)
+        if i < n :
+            for seed, value in zip(self.seeds, values) :
+                seed.append(value)
+            return (math.nan, math.nan, math.nan)
+        if i == n :
+            for seed, value in zip(self.seeds, values) :
+                seed.append(value)
+            self.sums = [float(np.array(seed, dtype=np.float64).sum()) for seed in self.seeds]
+            self.seeds = [[], [], []]
+        else :
+            self.sums = [s - s / n + v for s, v in zip(self.sums, values)]
+
+        di_plus = _div(100 * self.sums[1], self.sums[0])
+        di_minus = _div(100 * self.sums[2], self.sums[0])
+        dx = 100 * abs(_div(di_plus - di_minus, di_plus + di_minus))
+        if i < 2 * n :
+            self.dx_seed.append(dx)
+        elif i == 2 * n :
+            self.dx_seed.append(dx)
+            self.adx = _nanmean(self.dx_seed)
+            self.dx_seed = []
+        else :
+            self.adx = ((n - 1) * self.adx + dx) / n
+        return (self.adx, di_plus, di_minus)
+
+
+class StreamingMACD(StreamingIndicator) :
+    """MACD and its trigger line (see add_macd).
+    """
+    def __init__(self, fast: int = 12, slow: int = 26) :
+        col = f'MACD{fast}-{slow}'
+        self.columns = [col, f'{col}-trigger-{9}']
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.trigger = StreamingEMA(9)
+
+    def _update(self, high: float, low: float, close: float) -> tuple :
+        macd = self.fast.push(close) - self.slow.push(close)
+        return (macd, self.trigger.push(macd))
+
+
+class StreamingBollingerBands(StreamingIndicator) :
+    """Bollinger Bands (see add_bollinger_bands).
+    sigma is the rolling standard deviation of Close - SMA over sma_window bars.
+    """
+    def __init__(self, sma_window: int = 20, factor: int = 2) :
+        self.columns = [f'BBand-upper-{sma_window}-{factor}', f'BBand-lower-{sma_window}-{factor}']
+        self.factor = factor
+        self.sma = StreamingSMA(sma_window)
+        self.sum = _RollingSum(sma_window)
+        self.sum_sq = _RollingSum(sma_window)
+
+    def _update(self, high: float, low: float, close: float) -> tuple :
+        sma = self.sma.push(close)
+        d = close - sma  # NaN while the SMA is NaN, so sigma needs sma_window further bars
+        n = self.sum.window_size
+        total, total_sq = self.sum.push(d), self.sum_sq.push(d * d)
+        if not self.sum.full() :
+            return (math.nan, math.nan)
+        sigma = math.sqrt(max(total_sq - total * total / n, 0.0) / (n - 1))
+        return (sma + self.factor * sigma, sma - self.factor * sigma)
+
+
+class StreamingDonchianChannel(StreamingIndicator) :
+    """Donchian Channel (see add_donchian_channel).
+    Monotonic deques keep the candidates for the rolling maximum/minimum, so each bar costs amortized O(1).
+    NaN prices are not added to the deques; the maximum (minimum) is NaN while the window contains a NaN high (low).
+    """
+    def __init__(self, window_size: int = 20) :
+        self.columns = [f'MAX{window_size}', f'MIN{window_size}', f'MIDDLE{window_size}']
+        self.window_size = window_size
+        self.count = 0
+        self.highs = deque()  # (bar number, high), highs decreasing
+        self.lows = deque()  # (bar number, low), lows increasing
+        self.nan_high = -window_size  # bar number of the last NaN high
+        self.nan_low = -window_size
+
+    def _update(self, high: float, low: float, close: float) -> tuple :
+        i = self.count
+        self.count += 1
+        if high == high :
+            while self.highs and self.highs[-1][1] <= high :
+                self.highs.pop()
+            self.highs.append((i, high))
+        else :
+            self.nan_high = i
+        if low == low :
+            while self.lows and self.lows[-1][1] >= low :
+                self.lows.pop()
+            self.lows.append((i, low))
+        else :
+            self.nan_low = i
+        while self.highs and self.highs[0][0] <= i - self.window_size :
+            self.highs.popleft()
+        while self.lows and self.lows[0][0] <= i - self.window_size :
+            self.lows.popleft()
+        if self.count < self.window_size :
+            return (math.nan, math.nan, math.nan)
+        upper = self.highs[0][1] if i - self.nan_high >= self.window_size else math.nan
+        lower = self.lows[0][1] if i - self.nan_low >= self.window_size else math.nan
+        return (upper, lower, (upper + lower) / 2)
+
+
+class StreamingKeltnerChannel(StreamingIndicator) :
+    """Keltner Channel (see add_keltner_channel).
+    """
+    def __init__(self, ema_window: int = 20, atr_range: int = 20, atr_factor: float = 2.0) :
+        self.columns = [f'Keltner-upper-{ema_window}-{atr_range}', f'Keltner-lower-{ema_window}-{atr_range}']
+        self.atr_factor = atr_factor
+        self.ema = StreamingEMA(ema_window)
+        self.atr = StreamingATR(atr_range)
+
+    def _update(self, high: float, low: float, close: float) -> tuple :
+        ema, atr = self.ema.push(close), self.atr.push(high, low, close)
+        return (ema + atr * self.atr_factor, ema - atr * self.atr_factor)
+
+
+_CLASSES = {cls.__name__: cls for cls in [
+    _RollingSum, _TrueRange, StreamingSMA, StreamingEMA, StreamingWMA, StreamingATR, StreamingADX, StreamingMACD,
+    StreamingBollingerBands, StreamingDonchianChannel, StreamingKeltnerChannel]}
@@ -0,0 +1,155 @@
+import itertools
+from typing import NamedTuple
+
+import numpy as np
+
+from indicators.kernels import recursive_filter, EMA
+from indicators.trend_indicators import true_range_values
+
+
+# Parameter sweeps: compute an indicator family for a whole grid of parameters from shared precomputation.
+# Window sums of all window sizes come from one set of prefix sums, rolling maxima/minima from a sparse table
+# (one doubling level at a time). Prefix sums are restarted every _BLOCK values and taken of centered values,
+# so their rounding error does not grow with the length of the history.
+# Results agree with the add_* functions up to floating-point rounding (EMA and Donchian exactly).
+
+_BLOCK = 1 << 10
+
+
+class Sweep(NamedTuple) :
+    """Result of a sweep: row i of every array in values belongs to params[i].
+    values: {output: C-contiguous (len(params), time) array}
+    """
+    params: list[dict]
+    values: dict[str, np.ndarray]
+
+
+def _as_array(values) -> np.ndarray :
+    return np.asarray(values, dtype=np.float64)
+
+
+def _window_sums(x: np.ndarray, windows: list[int], weighted: bool = False) -> np.ndarray :
+    """Sums of the last n values for every n in windows -> (len(windows), len(x)).
+    weighted: sum of the last n values with weights 1..n (the most recent value has weight n).
+    NaN where the window is incomplete or contains NaN (like rolling(min_periods=n)).
+    """
+    out = np.full((len(windows), len(x)), np.nan)
+    if len(x) == 0 :
+        return out
+    n = np.asarray(windows)
+    max_window = n.max()
+    for begin in range(0, len(x), _BLOCK) :
+        end = min(begin + _BLOCK, len(x))
+        first = max(0, begin - max_window + 1)
+        segment = x[first:end]
+        nan = np.isnan(segment)
+        ref = np.nanmean(segment) if not nan.all() else 0.0
+        centered = np.where(nan, 0.0, segment - ref)
+        # Prefix sums with a leading 0: c[k] = sum of the first k values of the segment.
+        c = np.concatenate(([0.0], np.cumsum(centered)))
+        nans = np.concatenate(([0], np.cumsum(nan)))
+        if weighted :
+            k = np.concatenate(([0.0], np.cumsum(centered * np.arange(1, len(segment) + 1))))
+        t = (np.arange(begin, end) - first + 1)[None, :]  # prefix length up to and including day t
+        lo = t - n[:, None]
+        ok = lo >= 0
+        lo = np.maximum(lo, 0)
+        if weighted :
+            # sum_{i in window} (i - lo) * x_i with segment positions i = lo+1..t
+            values = (k[t] - k[lo]) - lo * (c[t] - c[lo]) + ref * (n * (n + 1) / 2)[:, None]
+        else :
+            values = (c[t] - c[lo]) + ref * n[:, None]
+        values[~ok | (nans[t] - nans[lo] > 0)] = np.nan
+        out[:, begin:end] = values
+    return out
+
+
+def _rolling_extreme(x: np.ndarray, windows: list[int], func) -> np.ndarray :
+    """Rolling maximum (func=np.maximum) or minimum (np.minimum) for every n in windows -> (len(windows), len(x)).
+    Sparse table: level k holds the extreme of [i, i + 2^k). A window of size n is covered by two
+    (overlapping) blocks of level floor(log2(n)). Only one level is kept in memory at a time.
+    """
+    out = np.full((len(windows), len(x)), np.nan)
+    level, size = x.copy(), 1
+    for row, n in sorted(enumerate(windows), key=lambda item : item[1]) :
+        while size * 2 <= n :
+            level = func(level[:len(level) - size], level[size:])
+            size *= 2
+        if n > len(x) :
+            continue
+        # window ending at t: [t-n+1, t] = [t-n+1, t-n+size] u [t-size+1, t]
+        t = np.arange(n - 1, len(x))
+        out[row, n - 1:] = func(level[t - n + 1], level[t - size + 1])
+    return out
+
+
+def sweep_sma(close, windows: list[int]) -> Sweep :
+    """SMA of close for every window size (see add_sma).
+    """
+    sums = _window_sums(_as_array(close), windows)
+    return Sweep([{'window_size': n} for n in windows], {'SMA': sums / np.array(windows, dtype=float)[:, None]})
+
+
+def sweep_wma(close, windows: list[int]) -> Sweep :
+    """WMA of close for every window size (see add_wma).
+    """
+    sums = _window_sums(_as_array(close), windows, weighted=True)
+    return Sweep([{'window_size': n} for n in windows], {'WMA': sums / np.array([n * (n + 1) / 2 for n in windows])[:, None]})
+
+
+def sweep_ema(close, windows: list[int]) -> Sweep :
+    """EMA of close for every smoothing window (see add_ema).
+    """
+    x = _as_array(close)
+    values = np.empty((len(windows), len(x)))
+    for row, n in enumerate(windows) :
+        values[row] = recursive_filter(x, kind=EMA, a=2 / (n + 1), seed=x[0])
+    return Sweep([{'n_smooth': n} for n in windows], {'EMA': values})
+
+
+def sweep_donchian_channel(high, low, windows: list[int]) -> Sweep :
+    """Donchian Channel for every window size (see add_donchian_channel).
+    """
+    upper = _rolling_extreme(_as_array(high), windows, np.maximum)
+    lower = _rolling_extreme(_as_array(low), windows, np.minimum)
+    return Sweep([{'window_size': n} for n in windows], {'MAX': upper, 'MIN': lower, 'MIDDLE': (upper + lower) / 2})
+
+
+def sweep_bollinger_bands(close, sma_windows: list[int], factors: list[float]) -> Sweep :
+    """Bollinger Bands for every (sma_window, factor) (see add_bollinger_bands).
+    sigma(n) is the rolling standard deviation of d = Close - SMA(n) over n days, from window sums of d and d^2.
+    """
+    x = _as_array(close)
+    sma = sweep_sma(x, sma_windows).values['SMA']
+    sigma = np.empty_like(sma)
+    for row, n in enumerate(sma_windows) :
+        d = x - sma[row]
+        s1 = _window_sums(d, [n])[0]
+        s2 = _window_sums(d * d, [n])[0]
+        with np.errstate(invalid='ignore', divide='ignore') :
+            sigma[row] = np.sqrt(np.maximum(s2 - s1 * s1 / n, 0.0) / (n - 1))
+    factors = np.asarray(factors, dtype=float)
+    # (windows, factors, time) -> rows in itertools.product(sma_windows, factors) order
+    upper = (sma[:, None, :] + factors[None, :, None] * sigma[:, None, :]).reshape(-1, len(x))
+    lower = (sma[:, None, :] - factors[None, :, None] * sigma[:, None, :]).reshape(-1, len(x))
+    params = [{'sma_window': n, 'factor': f} for n, f in itertools.product(sma_windows, factors.tolist())]
+    return Sweep(params, {'upper': upper, 'lower': lower})
+
+
+def sweep_keltner_channel(high, low, close, ema_windows: list[int], atr_ranges: list[int], atr_factors: list[float]) -> Sweep :
+    """Keltner Channel for every (ema_window, atr_range, atr_factor) (see add_keltner_channel).
+    All ATRs share the prefix sums of one TR1 series, all EMAs the same Close series.
+    """
+    h, l, c = _as_array(high), _as_array(low), _as_array(close)
+    prev_close = np.concatenate(([np.nan], c[:-1]))
+    tr1 = true_range_values(h, l, prev_close)
+    tr1[:1] = np.nan
+    atr = _window_sums(tr1, atr_ranges) / np.array(atr_ranges, dtype=float)[:, None]
+    ema = sweep_ema(c, ema_windows).values['EMA']
+    factors = np.asarray(atr_factors, dtype=float)
+    band = atr[None, :, None, :] * factors[None, None, :, None]
+    upper = (ema[:, None, None, :] + band).reshape(-1, len(c))
+    lower = (ema[:, None, None, :] - band).reshape(-1, len(c))
+    params = [{'ema_window': e, 'atr_range': a, 'atr_factor': f}
+        for e, a, f in itertools.product(ema_windows, atr_ranges, factors.tolist())]
+    return Sweep(params, {'upper': upper, 'lower': lower})
@@ -1,9 +1,34 @@
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 
 from indicators.moving_average import *
+from indicators.kernels import recursive_filter, WILDER, RUNNING_MEAN
+from indicators.compact import compact_output
+from indicators.signals import adx_signals
+from common.profiling import profiled
+from common.plotting import closes_figures, subplots, price_range, bar_collection, signal_lines, thin, axis_width, save_figure
 
 
+def true_range_values(high, low, prev_close) -> np.ndarray :
+    """max(High - Low, |High - Prev Close|, |Low - Prev Close|) of arrays (1-D or time x symbols).
+    Compared like Python's max(): a NaN previous close is skipped (the bar after a missing bar gets High - Low).
+    """
+    tr = np.asarray(high - low, dtype=np.float64)
+    for move in (np.abs(high - prev_close), np.abs(low - prev_close)) :
+        tr = np.where(move > tr, move, tr)
+    return tr
+
+
+def true_range_one(df: pd.core.frame.DataFrame) -> pd.Series :
+    """True Range of every day: max(High - Low, |High - Prev Close|, |Low - Prev Close|). NaN for the first day.
+    """
+    tr = true_range_values(df['High'].to_numpy(dtype=float), df['Low'].to_numpy(dtype=float), df['Close'].shift(1).to_numpy(dtype=float))
+    tr[:1] = np.nan
+    return pd.Series(tr, index=df.index)
+
+
+@profiled('compute')
+@compact_output(lambda p : ['TR1'])
 def add_true_range_one(df: pd.core.frame.DataFrame) :
     """True Range (TR): High True Range indicates high volatility.
     Low values are typical during consolidation phases and when markets reach a top.
@@ -11,13 +36,19 @@ def add_true_range_one(df: pd.core.frame.DataFrame) :
     Conversely, low indicator values suggest a sideways trend with low volatility.
     """
     if not f'TR{1}' in df.columns :
-        temp_df = pd.DataFrame(index=df.index)
-        temp_df['Th_Tl'] = df['High'] - df['Low']
-        temp_df['Th_Yc'] = df['High'] - df['Close'].shift(1)
-        temp_df['Tl_Yc'] = df['Low'] - df['Close'].shift(1)
-        df['TR1'] = temp_df.iloc[1:].apply(lambda row: max(row['Th_Tl'], abs(row['Th_Yc']), abs(row['Tl_Yc'])), axis=1)
+        df['TR1'] = true_range_one(df)
+
+
+def wilder_smooth(series: pd.Series, n: int) -> np.ndarray :
+    """Wilder smoothing (used for TRn and DMn).
+    First value (at n): Sum of series[1:n+1]
+    Subsequent = Prior - (Prior/n) + Current
+    """
+    return recursive_filter(series, kind=WILDER, a=n, seed=series[1:(n + 1)].sum(), start=n)
 
 
+@profiled('compute')
+@compact_output(lambda p : [f"TR{p['tr_factor']}"])
 def add_true_range(df: pd.core.frame.DataFrame, tr_factor: int = 14) :
     """True Range (TR)
     First TR: Sum of first tr_factor TR1
@@ -25,13 +56,11 @@ def add_true_range(df: pd.core.frame.DataFrame, tr_factor: int = 14) :
     """
     if not f'TR{tr_factor}' in df.columns :
         add_true_range_one(df)
-        tr = pd.Series(float("NaN"), index=df.index)
-        tr.iloc[tr_factor] = df['TR1'][1:(tr_factor + 1)].sum()
-        for i in range((tr_factor + 1), len(df)):
-            tr.iloc[i] = tr.iloc[i-1] - tr.iloc[i-1]/tr_factor + df.iloc[i]['TR1']
-        df[f'TR{tr_factor}'] = tr
+        df[f'TR{tr_factor}'] = wilder_smooth(df['TR1'], tr_factor)
 
 
+@profiled('compute')
+@compact_output(lambda p : [f"ATR{p['window_size']}"])
 def add_average_true_range(df: pd.core.frame.DataFrame, window_size: int = 20) :
     """Average True Range (ATR)
     """
@@ -40,6 +69,8 @@ def add_average_true_range(df: pd.core.frame.DataFrame, window_size: int = 20) :
         df[f'ATR{window_size}'] = df['TR1'].rolling(window=window_size, min_periods=window_size).mean()
 
 
+@profiled('compute')
+@compact_output(lambda p : [f"MACD{p['fast']}-{p['slow']}", f"MACD{p['fast']}-{p['slow']}-trigger-{9}"])
 def add_macd(df: pd.core.frame.DataFrame, fast: int = 12, slow: int = 26) :
     """The Moving Average Convergence/Divergence (MACD) indicator is a trend-following tool in market analysis.
     It calculates the difference between two exponential moving averages and is often used with a signal line (trigger line) for analysis.
@@ -57,7 +88,21 @@ def add_macd(df: pd.core.frame.DataFrame, fast: int = 12, slow: int = 26) :
     add_ema(df=df, n_smooth=9, refcol=col, colname=f'{col}-trigger-{9}')
 
 
-def plot_macd(path: str, df: pd.core.frame.DataFrame, company: str, fast: int = 12, slow: int = 26) :
+def macd_histogram(df: pd.core.frame.DataFrame, fast: int = 12, slow: int = 26) -> pd.core.frame.DataFrame :
+    """Split MACD - trigger into a positive ('diff_pos') and a negative ('diff_neg') part.
+    The other part is 0 (also for days without a MACD value).
+    """
+    diff = df[f'MACD{fast}-{slow}'] - df[f'MACD{fast}-{slow}-trigger-{9}']
+    tmp_df = pd.DataFrame(index=df.index)
+    tmp_df['diff_pos'] = diff.where(diff > 0, 0.0)
+    tmp_df['diff_neg'] = diff.where(diff < 0, 0.0)
+    return tmp_df
+
+
+@profiled('plot')
+@closes_figures
+def plot_macd(path: str, df: pd.core.frame.DataFrame, company: str, fast: int = 12, slow: int = 26, fmt: str = 'pdf',
+    downsample: bool = False) -> str :
     """Plot MACD for one company.
     Both the signal line and MACD are represented as lines in a two-line model.
     A rising MACD indicates an uptrend, while a falling MACD indicates a downtrend.
@@ -68,21 +113,23 @@ def plot_macd(path: str, df: pd.core.frame.DataFrame, company: str, fast: int =
     A very large distance may suggest overbought/oversold conditions, potentially leading to trend reversals.
     If the gap between the signal line and the MACD widens, the trend strengthens; if it narrows, the trend weakens.
     Divergences between the MACD and its base (price series on which the MACD is calculated) can be interpreted as a possible signal for an impending trend reversal.
+    downsample: see plot_average.
     """    
-    fig, axs = plt.subplots(2, figsize=(15,5))
+    fig, axs = subplots(2, figsize=(15,5))
     fig.suptitle(f'MACD{fast}-{slow} for company {company}')
+    max_points = axis_width(axs[0]) if downsample else None
 
-    axs[0].bar(x=df.index, height=df['High']-df['Low'], bottom=df['Low'], color='blue', label=f'{company} Chart')
+    price_range(axs[0], df, company, max_points=max_points)
     
+    macd, trigger = f'MACD{fast}-{slow}', f'MACD{fast}-{slow}-trigger-{9}'
+    lines = thin(df, [macd, trigger], max_points)
     axs[1].axhline(y=0, color='grey', linewidth=0.2, linestyle='--')
-    axs[1].plot(df.index, df[f'MACD{fast}-{slow}'], label=f'MACD{fast}-{slow}', color='blue', linewidth=0.5)
-    axs[1].plot(df.index, df[f'MACD{fast}-{slow}-trigger-{9}'], label=f'MACD{fast}-{slow}-trigger-{9}', color='red', linewidth=0.5)
+    axs[1].plot(lines.index, lines[macd], label=macd, color='blue', linewidth=0.5)
+    axs[1].plot(lines.index, lines[trigger], label=trigger, color='red', linewidth=0.5)
     
-    tmp_df = pd.DataFrame(index=df.index)
-    tmp_df['diff_pos'] = df.apply(lambda row: row[f'MACD{fast}-{slow}'] - row[f'MACD{fast}-{slow}-trigger-{9}'] if row[f'MACD{fast}-{slow}'] - row[f'MACD{fast}-{slow}-trigger-{9}'] > 0 else 0, axis=1)
-    tmp_df['diff_neg'] = df.apply(lambda row: row[f'MACD{fast}-{slow}'] - row[f'MACD{fast}-{slow}-trigger-{9}'] if row[f'MACD{fast}-{slow}'] - row[f'MACD{fast}-{slow}-trigger-{9}'] < 0 else 0, axis=1)
-    axs[1].bar(x=df.index, height=tmp_df['diff_pos'], color='blue', label=f'Positive diff')
-    axs[1].bar(x=df.index, height=tmp_df['diff_neg'], color='orange', label=f'Negative diff')
+    tmp_df = macd_histogram(df, fast=fast, slow=slow)
+    bar_collection(axs[1], df.index, height=tmp_df['diff_pos'], max_points=max_points, color='blue', label=f'Positive diff')
+    bar_collection(axs[1], df.index, height=tmp_df['diff_neg'], max_points=max_points, color='orange', label=f'Negative diff')
 
     axs[0].set_xlim(left=df.index.min(), right=df.index.max())
     axs[1].set_xlim(left=df.index.min(), right=df.index.max())
@@ -90,99 +137,112 @@ def plot_macd(path: str, df: pd.core.frame.DataFrame, company: str, fast: int =
     axs[0].legend(loc='upper left')
     axs[1].legend(loc='upper left')
 
-    plt.tight_layout()
-    plt.savefig(f'{path}/MACD{fast}-{slow}_{company}.pdf')
+    return save_figure(fig, path, f'MACD{fast}-{slow}_{company}', fmt)
 
 
+def directional_movement(df: pd.core.frame.DataFrame) -> tuple[pd.Series, pd.Series] :
+    """+DM and -DM of every day (NaN for the first day).
+    UpMove = Curr High - Prev High
+    DownMove = Prev Low - Curr Low
+    DMplus = UpMove if UpMove > DownMove and UpMove > 0, else: DMplus = 0
+    DMminus = DownMove if DownMove > Upmove and Downmove > 0, else DMminus = 0
+    """
+    up = df['High'] - df['High'].shift(1)
+    down = df['Low'].shift(1) - df['Low']
+    dm_plus = up.where((up > down) & (up > 0), 0.0)
+    dm_minus = down.where((down > up) & (down > 0), 0.0)
+    dm_plus.iloc[:1] = np.nan
+    dm_minus.iloc[:1] = np.nan
+    return dm_plus, dm_minus
+
+
+def directional_index(dm_plus, dm_minus, tr, n_smooth: int) -> tuple :
+    """+DI, -DI, DX and ADX from the Wilder-smoothed DMn and TRn.
+    DI = 100 * DMn / TRn
+    DX = ABS[(+DIn - -DIn) / (+DIn + -DIn)]
+    First ADXn: Mean of first n+1 DX
+    Subsequent ADXn: ((Prior ADXn * (n-1)) + Current DX Value)/n
+    """
+    n = n_smooth
+    di_plus = 100 * dm_plus / tr
+    di_minus = 100 * dm_minus / tr
+    dx = 100 * abs((di_plus - di_minus) / (di_plus + di_minus))
+    adx = recursive_filter(dx, kind=RUNNING_MEAN, a=n, seed=dx[n:(2*n + 1)].mean(), start=2*n)
+    return di_plus, di_minus, dx, adx
+
+
+@profiled('compute')
+@compact_output(lambda p : [f"ADX{p['n_smooth']}", f"DI{p['n_smooth']}plus", f"DI{p['n_smooth']}minus"])
 def add_adx(df: pd.core.frame.DataFrame, n_smooth: int = 14) :
     """The Average Directional Index (ADX) signals market direction, trend presence, and momentum.
     +DI higher suggests an upward trend, while a greater -DI indicates a downward trend.
     ADX values above 20 confirm a trend.
-    We currently use an EMA over 14 trading days.
+    All sums and averages are smoothed with Wilder's method over n_smooth trading days (default: 14).
     """
-    assert n_smooth == 14, f'Not implemented.'
+    assert n_smooth > 0, f'n_smooth must be positive.'
     assert len(df) > 2*n_smooth+2, f'At least {2*n_smooth+2} trading days for ADX{n_smooth} needed.'
 
-    # UpMove = Curr High - Prev High
-    # DownMove = Prev Low - Curr Low
-    temp_df = pd.DataFrame(index=df.index)
-    temp_df['UpMove'] = df['High'] - df['High'].shift(1)
-    temp_df['DownMove'] = df['Low'].shift(1) - df['Low']
-
-    # DMplus = UpMove if UpMove > DownMove and UpMove > 0, else: DMplus = 0
-    # DMminus = DownMove if DownMove > Upmove and Downmove > 0, else DMminus = 0
-    df['DMplus']  = temp_df.iloc[1:].apply(lambda row: row['UpMove'] if row['UpMove'] > row['DownMove'] and row['UpMove'] > 0 else 0.0, axis=1)
-    df['DMminus'] = temp_df.iloc[1:].apply(lambda row: row['DownMove'] if row['DownMove'] > row['UpMove'] and row['DownMove'] > 0 else 0.0, axis=1)
+    df['DMplus'], df['DMminus'] = directional_movement(df)
 
     # Calculate True Range (TR)
     add_true_range_one(df)
     
-    # Calcuate TR 14
-    add_true_range(df, 14)
-
-    # Calculate DM14plus and DM14minus
-    dm14minus = pd.Series(float("NaN"), index=df.index)
-    dm14plus = pd.Series(float("NaN"), index=df.index)
-    dm14minus.iloc[14] = df['DMminus'][1:15].sum()
-    dm14plus.iloc[14] = df['DMplus'][1:15].sum()
-    for i in range(15, len(df)):
-        dm14minus.iloc[i] = dm14minus.iloc[i-1] - dm14minus.iloc[i-1]/14 + df.iloc[i]['DMminus']
-        dm14plus.iloc[i] = dm14plus.iloc[i-1] - dm14plus.iloc[i-1]/14 + df.iloc[i]['DMplus']
-    df['DM14minus'] = dm14minus
-    df['DM14plus'] = dm14plus
-
-    # Calculate Directional Indicators (DI) +DI (DI14plus) and -DI (DI14minus)
-    df['DI14minus'] = 100 * df['DM14minus'] / df['TR14']
-    df['DI14plus'] = 100 * df['DM14plus'] / df['TR14']
-
-    # Calculate Directional Movement Index (DX)
-    # DX = ABS[(+DI14 - -DI14) / (+DI14 + -DI14)].
-    df['DX'] = 100 * abs((df['DI14plus'] - df['DI14minus']) / (df['DI14plus'] + df['DI14minus']))
-
-    # First ADX14: Mean of first 14 DX
-    # Subsequent ADX14: ((Prior ADX14 * 13) + Current DX Value)/14
-    adx = pd.Series(float("NaN"), index=df.index)
-    adx.iloc[28] = df['DX'][14:29].mean()
-    for i in range(29, len(df)):
-        adx.iloc[i] = (13 * adx.iloc[i-1] + df.iloc[i]['DX']) / 14
-    df[f'ADX{n_smooth}'] = adx
-
-
-def plot_adx(path: str, df: pd.core.frame.DataFrame, company: str, adx_num: int = 14, week_trend: int = 20, strong_trend: int = 25) :
+    # Calcuate TR n_smooth
+    add_true_range(df, n_smooth)
+
+    # Calculate DMnplus and DMnminus
+    n = n_smooth
+    df[f'DM{n}minus'] = wilder_smooth(df['DMminus'], n)
+    df[f'DM{n}plus'] = wilder_smooth(df['DMplus'], n)
+
+    # Calculate Directional Indicators (DI), Directional Movement Index (DX) and ADX
+    di_plus, di_minus, dx, adx = directional_index(dm_plus=df[f'DM{n}plus'], dm_minus=df[f'DM{n}minus'], tr=df[f'TR{n}'], n_smooth=n)
+    df[f'DI{n}minus'] = di_minus
+    df[f'DI{n}plus'] = di_plus
+    df['DX'] = dx
+    df[f'ADX{n}'] = adx
+
+
+def adx_crossovers(df: pd.core.frame.DataFrame, adx_num: int = 14, strong_trend: int = 25) -> tuple[pd.DatetimeIndex, pd.DatetimeIndex] :
+    """Days on which +DI crosses above -DI (first) and -DI crosses above +DI (second) while ADX > strong_trend.
+    """
+    buy, sell = adx_signals(df[f'DI{adx_num}plus'], df[f'DI{adx_num}minus'], df[f'ADX{adx_num}'], strong_trend=strong_trend)
+    return df.index[buy.to_numpy()], df.index[sell.to_numpy()]
+
+
+@profiled('plot')
+@closes_figures
+def plot_adx(path: str, df: pd.core.frame.DataFrame, company: str, adx_num: int = 14, week_trend: int = 20, strong_trend: int = 25,
+    fmt: str = 'pdf', downsample: bool = False) -> str :
     """Plot stock value, ADX, +DI, and -DI for one company.
     Week trend: strong_trend > ADX > week_trend.
     Strong trend: ADX > strong_trend. Otherwise: No trend.
     Crossovers of the -DI and +DI lines can be used to generate trade signals.
     For example, if the +DI line crosses above the -DI line and the ADX is above 20, or ideally above 25, then that is a potential signal to buy.
     On the other hand, if the -DI crosses above the +DI, and the ADX is above 20 or 25, then that is an opportunity to enter a potential short trade.
+    downsample: see plot_average.
     """
-    tmp_df = pd.DataFrame(index=df.index)
-    tmp_df['diff'] = df.apply(lambda row: 1 if row[f'DI{adx_num}plus'] > row[f'DI{adx_num}minus'] else 0, axis=1)
-    tmp_df['crossover'] = tmp_df['diff'] - tmp_df['diff'].shift(1)
+    buy_days, sell_days = adx_crossovers(df, adx_num=adx_num, strong_trend=strong_trend)
 
-    fig, axs = plt.subplots(2, figsize=(15,5))
+    fig, axs = subplots(2, figsize=(15,5))
     fig.suptitle(f'ADX{adx_num} for company {company}')
-    for day in list(tmp_df.loc[tmp_df['crossover'] == 1].index) :
-        if df.loc[day][f'ADX{adx_num}'] > strong_trend :
-            axs[0].axvline(x=day, color='green', linestyle='--', linewidth=0.5)
-            axs[1].axvline(x=day, color='green', linestyle='--', linewidth=0.5)
-    for day in list(tmp_df.loc[tmp_df['crossover'] == -1].index) :
-        if df.loc[day][f'ADX{adx_num}'] > strong_trend :
-            axs[0].axvline(x=day, color='red', linestyle='--', linewidth=0.5)
-            axs[1].axvline(x=day, color='red', linestyle='--', linewidth=0.5)
+    # The signals are computed on all days, so they stay on their exact dates when the lines are downsampled.
+    signal_lines(axs, buy_days, color='green')
+    signal_lines(axs, sell_days, color='red')
+    max_points = axis_width(axs[0]) if downsample else None
 
-    axs[0].bar(x=df.index, height=df['High']-df['Low'], bottom=df['Low'], color='blue', label=f'{company} Chart')
+    price_range(axs[0], df, company, max_points=max_points)
 
+    lines = thin(df, [f'DI{adx_num}plus', f'DI{adx_num}minus', f'ADX{adx_num}'], max_points)
     axs[1].axhline(y=week_trend, color='grey', linestyle='--', linewidth=0.5)
     axs[1].axhline(y=strong_trend, color='grey', linestyle='--', linewidth=0.5)
-    axs[1].plot(df.index, df[f'DI{adx_num}plus'], label=f'+DI{adx_num}', color='green', linewidth=0.5)
-    axs[1].plot(df.index, df[f'DI{adx_num}minus'], label=f'-DI{adx_num}', color='red', linewidth=0.5)
-    axs[1].plot(df.index, df[f'ADX{adx_num}'], label=f'ADX{adx_num}', color='blue', linewidth=0.5)
+    axs[1].plot(lines.index, lines[f'DI{adx_num}plus'], label=f'+DI{adx_num}', color='green', linewidth=0.5)
+    axs[1].plot(lines.index, lines[f'DI{adx_num}minus'], label=f'-DI{adx_num}', color='red', linewidth=0.5)
+    axs[1].plot(lines.index, lines[f'ADX{adx_num}'], label=f'ADX{adx_num}', color='blue', linewidth=0.5)
 
     axs[0].set_xlim(left=df.index.min(), right=df.index.max())
     axs[1].set_xlim(left=df.index.min(), right=df.index.max())
 
     axs[0].legend(loc='upper left')
     axs[1].legend(loc='upper left')
-    plt.tight_layout()
-    plt.savefig(f'{path}/ADX{adx_num}_{company}.pdf')
+    return save_figure(fig, path, f'ADX{adx_num}_{company}', fmt)
@@ -1,26 +1,49 @@
 import os
 
-from common.get_data import *
-from indicators.moving_average import *
-from indicators.trend_indicators import *
-from indicators.price_channels import *
+import pandas as pd
+
+from common.get_data import get_last_years
+from indicators.pipeline import run_pipeline
+from indicators.render import render_batch
+from common import profiling
+from common.profiling import profiled
 
 company = {'name': 'VW', 'tickersymbol': 'VWAGY'}
-df = get_last_years(years=4, company=company['tickersymbol'])
-
-add_sma(df=df, window_size=50)
-add_sma(df=df, window_size=200)
-add_ema(df=df, n_smooth=10)
-add_wma(df=df, window_size=5)
-add_adx(df=df, n_smooth=14)
-add_macd(df=df, fast=12, slow=26)
-add_bollinger_bands(df=df, sma_window=20, factor=2)
-add_donchian_channel(df=df, window_size=20)
-add_keltner_channel(df=df, ema_window=20, atr_range=20, atr_factor=2.0)
-
-plot_adx(path=f'{os.getcwd()}', df=df, company=company['name'], adx_num=14, strong_trend=25)
-plot_average(path=f'{os.getcwd()}', df=df, company=company['name'], indicators=['SMA50', 'SMA200', 'EMA10', 'WMA5'])
-plot_macd(path=f'{os.getcwd()}', df=df, company=company['name'], fast=12, slow=26)
-plot_bollinger_bands(path=f'{os.getcwd()}', df=df, company=company['name'], sma_window=20, factor=2)
-plot_donchian_channel(path=f'{os.getcwd()}', df=df, company=company['name'], window_size=20)
-plot_keltner_channel(path=f'{os.getcwd()}', df=df, company=company['name'], ema_window=20, atr_range=20, atr_factor=2.0)
+
+indicators = [
+    ('sma', {'window_size': 50}),
+    ('sma', {'window_size': 200}),
+    ('ema', {'n_smooth': 10}),
+    ('wma', {'window_size': 5}),
+    ('adx', {'n_smooth': 14}),
+    ('macd', {'fast': 12, 'slow': 26}),
+    ('bollinger_bands', {'sma_window': 20, 'factor': 2}),
+    ('donchian_channel', {'window_size': 20}),
+    ('keltner_channel', {'ema_window': 20, 'atr_range': 20, 'atr_factor': 2.0}),
+]
+
+charts = [
+    ('adx', {'adx_num': 14, 'strong_trend': 25}),
+    ('average', {'indicators': ['SMA50', 'SMA200', 'EMA10', 'WMA5']}),
+    ('macd', {'fast': 12, 'slow': 26}),
+    ('bollinger_bands', {'sma_window': 20, 'factor': 2}),
+    ('donchian_channel', {'window_size': 20}),
+    ('keltner_channel', {'ema_window': 20, 'atr_range': 20, 'atr_factor': 2.0}),
+]
+
+
+@profiled('run')
+def run_stockview(df: pd.core.frame.DataFrame, company: str, path: str, fmt: str = 'pdf', max_workers: int = None) -> tuple[list[str], dict] :
+    """Compute the indicators and render the charts above for one company (see render_batch for the result).
+    Profiling: run with STOCKVIEW_PROFILE=profile.trace.json (see common/profiling.py).
+    """
+    with profiling.symbol(company) :
+        df = df.join(run_pipeline(df=df, specs=indicators))
+        return render_batch([(company, chart, df, params) for chart, params in charts], path=path, fmt=fmt, max_workers=max_workers)
+
+
+if __name__ == '__main__' :
+    df = get_last_years(years=4, company=company['tickersymbol'])
+    files, failures = run_stockview(df, company=company['name'], path=f'{os.getcwd()}')
+    for (symbol, chart), error in failures.items() :
+        print(f'Could not render {chart} for {symbol}: {error}')
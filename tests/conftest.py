@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import synthetic_ohlcv
+
+
+# Shared test data: deterministic daily bars (see benchmarks/synthetic.py).
+
+
+def daily_bars(n_bars: int = 800, seed: int = 0, tick: float = 0.5) :
+    """Daily bars with prices rounded to tick, so neighbouring highs, lows and closes are often tied.
+    """
+    df = synthetic_ohlcv(n_bars, seed=seed, freq='B', end='2024-01-02', volatility=0.02)
+    for col in ('Open', 'High', 'Low', 'Close') :
+        df[col] = np.round(df[col] / tick) * tick
+    return df
+
+
+def with_nan_bar(df, row: int) :
+    """Copy of df whose bar at position row has no prices (like a missing bar in a download).
+    """
+    df = df.copy()
+    df.iloc[row, [df.columns.get_loc(col) for col in ('Open', 'High', 'Low', 'Close')]] = np.nan
+    return df
+
+
+@pytest.fixture
+def make_bars() :
+    return daily_bars
+
+
+@pytest.fixture
+def bars() :
+    return daily_bars()
+
+
+@pytest.fixture
+def nan_bar() :
+    return with_nan_bar
@@ -0,0 +1,90 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators.pipeline import run_pipeline
+from indicators.panel import to_panel
+from indicators.backtest import backtest, backtest_grid, RULES
+
+
+def loop_backtest(close: np.ndarray, buy: np.ndarray, sell: np.ndarray, short: bool, cost: float) -> dict :
+    """One strategy, bar by bar: trade at the close of the event bar, earn the return of the bar after.
+    """
+    pos, price, curve, peak = 0.0, math.nan, 1.0, 1.0
+    stats = {'pnl': 0.0, 'return': 0.0, 'max_drawdown': 0.0, 'trades': 0, 'exposure': 0.0}
+    equity = []
+    for t in range(len(close)) :
+        prev, held = price, pos
+        price = close[t] if not math.isnan(close[t]) else prev
+        if buy[t] and not sell[t] :
+            pos = 1.0
+        elif sell[t] and not buy[t] :
+            pos = -1.0 if short else 0.0
+        turnover = abs(pos - held)
+        ret = held * (price / prev - 1) if held != 0 and not math.isnan(price / prev) else 0.0
+        curve *= 1 + ret - cost * turnover
+        peak = max(peak, curve)
+        equity.append(curve)
+        if held != 0 and not math.isnan(price - prev) :
+            stats['pnl'] += held * (price - prev)
+        if not math.isnan(price) :
+            stats['pnl'] -= cost * turnover * price
+        stats['max_drawdown'] = max(stats['max_drawdown'], 1 - curve / peak)
+        stats['trades'] += pos != 0 and pos != held
+        stats['exposure'] += held != 0
+    stats['return'] = curve - 1
+    stats['exposure'] /= max(len(close), 1)
+    return stats, np.array(equity)
+
+
+@pytest.mark.parametrize('short', [False, True])
+@pytest.mark.parametrize('cost', [0.0, 0.001])
+def test_backtest_matches_loop(short, cost) :
+    rng = np.random.default_rng(1)
+    n, k = 500, 6
+    close = 100 * np.cumprod(1 + 0.01 * rng.standard_normal((n, k)), axis=0)
+    close[:5, 0] = np.nan
+    close[rng.random((n, k)) < 0.02] = np.nan
+    buy, sell = rng.random((n, k)) < 0.05, rng.random((n, k)) < 0.05
+    buy[:, 1] = sell[:, 1] = False
+    buy[10:20, 2] = sell[10:20, 2] = True
+    buy[2, 0] = True
+
+    res = backtest(close, buy, sell, short=short, cost=cost)
+    for j in range(k) :
+        stats, equity = loop_backtest(close[:, j], buy[:, j], sell[:, j], short, cost)
+        for name, value in stats.items() :
+            assert res.stats[name].iloc[j] == pytest.approx(value, rel=1e-12, abs=1e-12), (j, name)
+        np.testing.assert_allclose(res.equity[j].to_numpy(), equity, rtol=1e-12)
+
+
+@pytest.mark.parametrize('rule, grid', [
+    ('adx', {'n_smooth': [10, 14], 'strong_trend': [20, 25]}),
+    ('macd', {'fast': [8, 12]}),
+    ('donchian_channel', {'window_size': [10, 20]}),
+    ('keltner_channel', {'atr_factor': [1.5, 2.0]}),
+    ('bollinger_bands', {}),
+])
+def test_grid_matches_per_symbol_backtests(make_bars, rule, grid) :
+    histories = {f'S{j}' : make_bars(600 - 50 * j, seed=j) for j in range(4)}
+    histories['S1'] = histories['S1'].drop(histories['S1'].index[100:110])
+    res = backtest_grid(histories, rule, grid, short=True, cost=0.001)
+    index = to_panel(histories, 'Close').index
+
+    for key in res.stats.index :
+        params, symbol = dict(zip(res.stats.index.names[:-1], key[:-1])), key[-1]
+        df = histories[symbol]
+
+        def panel(specs) :
+            c = {col : df[col].to_numpy(dtype=float) for col in ('High', 'Low', 'Close')}
+            c.update({col : values.to_numpy() for col, values in run_pipeline(df, specs).items()})
+            return c
+
+        signals = RULES[rule](panel, **params)
+        buy = pd.Series(signals.buy, index=df.index).reindex(index, fill_value=False)
+        sell = pd.Series(signals.sell, index=df.index).reindex(index, fill_value=False)
+        ref = backtest(df['Close'].reindex(index), buy, sell, short=True, cost=0.001).stats.iloc[0]
+        for name in ref.index :
+            assert res.stats.loc[key, name] == pytest.approx(ref[name], rel=1e-12, abs=1e-12), (key, name)
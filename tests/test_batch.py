@@ -0,0 +1,87 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import batch
+from benchmarks.synthetic import synthetic_ohlcv
+from common import get_data
+from common.data_source import FileSource
+
+
+@pytest.fixture
+def csv_dir(tmp_path) :
+    """AAA.csv and CCC.csv with identical daily bars up to today."""
+    directory = tmp_path / 'csv'
+    directory.mkdir()
+    df = synthetic_ohlcv(300, freq='B', end=pd.Timestamp.today().normalize(), tz='UTC', volatility=0.02)
+    for symbol in ('AAA', 'CCC') :
+        df.to_csv(directory / f'{symbol}.csv')
+    return directory
+
+
+def run(tmp_path, csv_dir, symbols: list[str], monkeypatch) -> tuple[int, list[str]] :
+    monkeypatch.setattr(get_data, '_default_source', get_data._default_source)  # restored after the test
+    monkeypatch.setenv('STOCKVIEW_CACHE_DIR', str(tmp_path / 'cache'))
+    watchlist, config, output = tmp_path / 'watchlist.txt', tmp_path / 'config.json', tmp_path / 'charts'
+    watchlist.write_text('\n'.join(symbols))
+    config.write_text(json.dumps({'years': 1, 'fmt': 'png', 'charts': [['macd', {}]]}))
+    code = batch.main([str(watchlist), '--config', str(config), '--output', str(output), '--csv-dir', str(csv_dir),
+        '--memo-dir', str(tmp_path / 'memo'), '--workers', '1'])
+    return code, sorted(os.listdir(output))
+
+
+def test_identical_bars_of_different_symbols(tmp_path, csv_dir, monkeypatch) :
+    assert run(tmp_path, csv_dir, ['AAA'], monkeypatch) == (0, ['MACD12-26_AAA.png'])
+    # Same bars and chart, but another symbol: the chart must be rendered for CCC, not served from AAA's entry.
+    code, files = run(tmp_path, csv_dir, ['CCC'], monkeypatch)
+    assert code == 0 and 'MACD12-26_CCC.png' in files
+
+
+def test_csv_bars_bypass_the_download_cache(tmp_path, csv_dir, monkeypatch) :
+    assert run(tmp_path, csv_dir, ['AAA'], monkeypatch)[0] == 0
+    assert not (tmp_path / 'cache' / '1d').exists()
+
+
+def test_relative_output_directory(tmp_path, csv_dir, monkeypatch) :
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(get_data, '_default_source', get_data._default_source)
+    monkeypatch.setenv('STOCKVIEW_CACHE_DIR', str(tmp_path / 'cache'))
+    (tmp_path / 'wl.txt').write_text('AAA\nCCC\n')
+    config = batch.read_config()
+    config['charts'] = [('macd', {}), ('adx', {'adx_num': 14})]
+    data, _ = get_data.get_watchlist_hist(['AAA', 'CCC'], fetch=get_data.get_last_years, years=1, cache=False,
+        source=FileSource(str(csv_dir)))
+    memo = batch.ResultCache(str(tmp_path / 'memo'))
+    expected = {symbol : [f'MACD12-26_{symbol}.pdf', f'ADX14_{symbol}.pdf'] for symbol in ('AAA', 'CCC')}
+    # Rendered the first time, served from the result cache the second time: the same file names.
+    for _ in range(2) :
+        results, files, failures = batch.run_batch(data, config, 'charts', memo=memo, max_workers=1)
+        assert failures == {} and files == expected
+        assert sorted(os.listdir(tmp_path / 'charts')) == sorted(expected['AAA'] + expected['CCC'])
+
+    code = batch.main(['wl.txt', '--output', 'charts', '--csv-dir', str(csv_dir), '--memo-dir', 'memo', '--workers', '1'])
+    assert code == 0
+
+
+def test_window_moves_once_a_month() :
+    config = batch.read_config()
+    days = pd.date_range('2024-03-01', '2024-03-31 18:00', freq='6h')
+    assert {batch.window_start(config, today) for today in days} == {pd.Timestamp('2020-03-01')}
+    assert batch.window_start(config, '2024-04-01') == pd.Timestamp('2020-04-01')
+    assert batch.window_start(dict(config, start='2021-05-03'), '2024-04-01') == pd.Timestamp('2021-05-03')
+
+
+def test_rerun_on_the_next_day_is_served_from_the_memo(tmp_path, csv_dir, monkeypatch) :
+    today = pd.Timestamp.today().normalize()
+    if (today + pd.Timedelta(days=1)).month != today.month :
+        today -= pd.Timedelta(days=1)
+    window_start = batch.window_start
+    monkeypatch.setattr(batch, 'window_start', lambda config : window_start(config, today))
+    assert run(tmp_path, csv_dir, ['AAA', 'CCC'], monkeypatch)[0] == 0
+
+    # No new bars on the next day: nothing is computed or rendered again.
+    monkeypatch.setattr(batch, 'window_start', lambda config : window_start(config, today + pd.Timedelta(days=1)))
+    monkeypatch.setattr(batch, '_symbol_job', lambda *args : pytest.fail('result cache missed'))
+    assert run(tmp_path, csv_dir, ['AAA', 'CCC'], monkeypatch) == (0, ['MACD12-26_AAA.png', 'MACD12-26_CCC.png'])
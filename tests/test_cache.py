@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from common import cache
+from common.cache import write_hist, append_hist, read_hist, read_meta, iter_hist
+
+
+def assert_bars(cached: pd.core.frame.DataFrame, expected: pd.core.frame.DataFrame) :
+    # The cache stores ns timestamps, pandas may create the expected index with another unit.
+    pd.testing.assert_frame_equal(cached, expected.set_axis(expected.index.as_unit('ns')), check_freq=False)
+
+
+def test_append_replaces_overlapping_bars(make_bars, tmp_path) :
+    df = make_bars(300)
+    write_hist(df.iloc[:200], 'AAA', cache_dir=str(tmp_path))
+    changed = df.iloc[190:].copy()
+    changed['Close'] += 1
+    meta = append_hist(changed, 'AAA', cache_dir=str(tmp_path))
+    assert meta['rows'] == 300
+    assert_bars(read_hist('AAA', cache_dir=str(tmp_path)), pd.concat([df.iloc[:190], changed]))
+    assert not (tmp_path / '1d' / 'AAA' / 'pending.npz').exists()
+
+
+@pytest.mark.parametrize('crash_after', [0, 1, 3])
+def test_interrupted_append_is_finished(make_bars, tmp_path, monkeypatch, crash_after) :
+    # The append dies after crash_after of the index/column files were rewritten (before meta.json).
+    df = make_bars(300)
+    write_hist(df.iloc[:200], 'AAA', cache_dir=str(tmp_path))
+    changed = df.iloc[190:].copy()
+    changed['Close'] += 1
+    write_columns = cache._write_columns
+
+    def crashing(path, arrays, rows, mode) :
+        write_columns(path, arrays[:crash_after], rows, mode)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(cache, '_write_columns', crashing)
+    with pytest.raises(KeyboardInterrupt) :
+        append_hist(changed, 'AAA', cache_dir=str(tmp_path))
+    monkeypatch.setattr(cache, '_write_columns', write_columns)
+
+    assert read_meta('AAA', cache_dir=str(tmp_path))['rows'] == 300
+    expected = pd.concat([df.iloc[:190], changed])
+    assert_bars(read_hist('AAA', cache_dir=str(tmp_path)), expected)
+    assert_bars(pd.concat(iter_hist('AAA', chunk_size=64, cache_dir=str(tmp_path))), expected)
+
+
+def test_interrupted_rewrite_keeps_old_history(make_bars, tmp_path, monkeypatch) :
+    df = make_bars(300)
+    write_hist(df.iloc[:200], 'AAA', cache_dir=str(tmp_path))
+
+    def crashing(path, arrays, rows, mode) :
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(cache, '_write_columns', crashing)
+    with pytest.raises(KeyboardInterrupt) :
+        write_hist(df, 'AAA', cache_dir=str(tmp_path))
+    monkeypatch.undo()
+    assert_bars(read_hist('AAA', cache_dir=str(tmp_path)), df.iloc[:200])
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_ohlcv
+from common.cache import write_hist, append_hist
+from indicators.pipeline import run_pipeline
+from indicators.chunked import run_chunked, run_cached
+
+
+SPECS = [
+    ('sma', {'window_size': 50}), ('ema', {'n_smooth': 10}), ('wma', {'window_size': 20}), ('true_range', {}),
+    ('average_true_range', {}), ('adx', {'n_smooth': 14}), ('macd', {}), ('bollinger_bands', {}),
+    ('donchian_channel', {}), ('keltner_channel', {}), ('adx', {'n_smooth': 5}),
+    ('bollinger_bands', {'sma_window': 3, 'factor': 1.5}),
+]
+
+
+@pytest.fixture
+def minute_bars() -> pd.core.frame.DataFrame :
+    """Intraday bars with NaN closes, a NaN bar and a run of identical bars.
+    """
+    n = 5000
+    df = synthetic_ohlcv(n, seed=3)
+    rng = np.random.default_rng(0)
+    df.loc[df.index[rng.random(n) < 0.002], 'Close'] = np.nan
+    df.iloc[2500, :4] = np.nan
+    df.iloc[n // 3:n // 3 + 100, :4] = df.iloc[n // 3, :4].to_numpy()
+    return df
+
+
+def assert_same(got: pd.core.frame.DataFrame, ref: pd.core.frame.DataFrame) :
+    assert got.index.equals(ref.index)
+    assert list(got.columns) == list(ref.columns)
+    for col in ref.columns :
+        assert np.array_equal(got[col].to_numpy(), ref[col].to_numpy(), equal_nan=True), col
+
+
+@pytest.mark.parametrize('chunk_size', [1, 13, 29, 100, 997, 5000])
+def test_chunked_matches_pipeline(minute_bars, chunk_size) :
+    chunks = (minute_bars.iloc[i:i + chunk_size] for i in range(0, len(minute_bars), chunk_size))
+    assert_same(pd.concat(list(run_chunked(chunks, SPECS))), run_pipeline(minute_bars, SPECS))
+
+
+def test_chunked_float32_with_empty_chunks(minute_bars) :
+    chunks = [minute_bars.iloc[:10], minute_bars.iloc[10:10], minute_bars.iloc[10:]]
+    got = pd.concat(list(run_chunked(chunks, SPECS, dtype=np.float32)))
+    assert_same(got, run_pipeline(minute_bars, SPECS, dtype=np.float32))
+
+
+def test_run_cached(minute_bars, tmp_path) :
+    n = len(minute_bars)
+    write_hist(minute_bars.iloc[:n // 2], 'SYN', '1m', str(tmp_path))
+    append_hist(minute_bars.iloc[n // 2:], 'SYN', '1m', str(tmp_path))
+    ref = run_pipeline(minute_bars, SPECS)
+    got = pd.concat(list(run_cached('SYN', SPECS, interval='1m', chunk_size=777, cache_dir=str(tmp_path))))
+    assert_same(got.set_axis(got.index.as_unit(ref.index.unit)), ref)
+
+    start, end = minute_bars.index[1000], minute_bars.index[3 * n // 4]
+    got = pd.concat(list(run_cached('SYN', SPECS, interval='1m', chunk_size=500, start=start, end=end, cache_dir=str(tmp_path))))
+    ref = run_pipeline(minute_bars.loc[start:end], SPECS)
+    assert_same(got.set_axis(got.index.as_unit(ref.index.unit)), ref)
+
+
+def test_short_history_is_rejected(minute_bars) :
+    with pytest.raises(AssertionError) :
+        list(run_chunked([minute_bars.iloc[:20]], SPECS))
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from indicators.moving_average import add_sma
+from indicators.trend_indicators import add_adx, add_macd
+from indicators.price_channels import add_bollinger_bands, add_keltner_channel
+
+
+CASES = [
+    (add_adx, {'n_smooth': 14}),
+    (add_macd, {'fast': 12, 'slow': 26}),
+    (add_bollinger_bands, {'sma_window': 20, 'factor': 2}),
+    (add_keltner_channel, {'ema_window': 20, 'atr_range': 20, 'atr_factor': 2.0}),
+]
+
+
+@pytest.mark.parametrize('add, params', CASES)
+def test_dtype_keeps_intermediates(bars, add, params) :
+    full, compact = bars.copy(), bars.copy()
+    add(full, **params)
+    add(compact, **params, dtype=np.float32)
+    assert list(compact.columns) == list(full.columns)
+    outputs = add.outputs(dict(params, df=bars))
+    for col in full.columns :
+        if col in outputs :
+            assert compact[col].dtype == np.float32
+            assert np.array_equal(compact[col].to_numpy(), full[col].to_numpy(dtype=np.float32), equal_nan=True)
+        else :
+            assert compact[col].dtype == full[col].dtype
+            assert np.array_equal(compact[col].to_numpy(), full[col].to_numpy(), equal_nan=True), col
+
+
+@pytest.mark.parametrize('add, params', CASES)
+def test_without_intermediates(bars, add, params) :
+    full, compact = bars.copy(), bars.copy()
+    add(full, **params)
+    add(compact, **params, intermediates=False)
+    outputs = add.outputs(dict(params, df=bars))
+    assert list(compact.columns) == list(bars.columns) + [col for col in full.columns if col in outputs]
+    for col in outputs :
+        assert np.array_equal(compact[col].to_numpy(), full[col].to_numpy(), equal_nan=True)
+
+
+def test_not_inplace(bars) :
+    before = bars.copy()
+    values = add_sma(bars, window_size=20, inplace=False, dtype=np.float32)
+    assert list(bars.columns) == list(before.columns)
+    assert list(values.values) == ['SMA20'] and values.values['SMA20'].dtype == np.float32
+    add_sma(before, window_size=20)
+    assert np.array_equal(values.to_frame()['SMA20'], before['SMA20'].to_numpy(dtype=np.float32), equal_nan=True)
@@ -0,0 +1,40 @@
+import threading
+
+import pandas as pd
+
+from common.data_source import DataSource
+from common.get_data import get_watchlist_hist, get_since
+
+
+class CountingSource(DataSource) :
+    """Serves fixed bars and counts the downloads per ticker.
+    """
+    def __init__(self, df: pd.core.frame.DataFrame) :
+        super().__init__(retries=0, backoff=0.0)
+        self.df = df
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def history(self, company: str, period: str = None, interval: str = '1d', start=None) -> pd.core.frame.DataFrame :
+        with self.lock :
+            self.calls[company] = self.calls.get(company, 0) + 1
+        return self.df if start is None else self.df[self.df.index >= start]
+
+
+def test_watchlist_duplicates_are_fetched_once(bars, tmp_path) :
+    source = CountingSource(bars)
+    data, failures = get_watchlist_hist(['aaa', 'BBB', 'AAA', 'bbb', 'aaa'], cache_dir=str(tmp_path), source=source)
+    assert failures == {}
+    assert list(data) == ['aaa', 'BBB']
+    assert sum(source.calls.values()) == 2
+    assert len(data['aaa']) == len(bars)
+
+
+def test_get_since(bars, tmp_path, monkeypatch) :
+    monkeypatch.setenv('STOCKVIEW_CACHE_DIR', str(tmp_path))
+    source = CountingSource(bars)
+    start = bars.index[100]
+    for cache in (True, False) :
+        df = get_since(start.strftime('%Y-%m-%d'), 'AAA', cache=cache, source=source)
+        assert df.index[0] == start and df.index[-1] == bars.index[-1] and len(df) == len(bars) - 100
+        assert df.index.tz is not None
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators.kernels import rolling_mean, rolling_var
+
+
+# rolling_mean/rolling_var replicate the pandas rolling aggregations (including their rounding), continued
+# chunk by chunk. They must stay bit for bit equal to the installed pandas.
+
+
+def series(kind: str, n_values: int = 2000) -> np.ndarray :
+    rng = np.random.default_rng(7)
+    x = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n_values)))
+    if kind == 'nan' :
+        x[rng.random(n_values) < 0.02] = np.nan
+        x[500:530] = np.nan
+    elif kind == 'constant' :
+        x[300:400] = x[300]
+        x[1000:1003] = x[1000]
+    elif kind == 'offset' :
+        # Large values with tiny changes: the variance is numerically unstable and gets recomputed.
+        x = 1e9 + rng.normal(0, 1e-3, n_values)
+        x[700:800] = 1e-3 * rng.normal(0, 1, 100)
+    return x
+
+
+def chunked(func, x: np.ndarray, n: int, size: int) -> np.ndarray :
+    out, state = [], None
+    for begin in range(0, len(x), size) :
+        values, state = func(x[begin:begin + size], n, state)
+        out.append(values)
+    return np.concatenate(out)
+
+
+@pytest.mark.parametrize('kind', ['random', 'nan', 'constant', 'offset'])
+@pytest.mark.parametrize('n', [1, 2, 3, 20, 50])
+@pytest.mark.parametrize('size', [1, 7, 64, 2000])
+def test_rolling_mean_and_var_match_pandas(kind, n, size) :
+    x = series(kind)
+    rolling = pd.Series(x).rolling(n)
+    assert np.array_equal(chunked(rolling_mean, x, n, size), rolling.mean().to_numpy(), equal_nan=True)
+    assert np.array_equal(chunked(rolling_var, x, n, size), rolling.var().to_numpy(), equal_nan=True)
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from indicators.pipeline import run_pipeline
+from indicators.panel import run_panel, to_panel
+
+
+SPECS = [
+    ('sma', {'window_size': 50}), ('ema', {'n_smooth': 10}), ('wma', {'window_size': 5}), ('adx', {'n_smooth': 14}),
+    ('macd', {}), ('bollinger_bands', {'sma_window': 20}), ('donchian_channel', {}), ('keltner_channel', {}),
+    ('average_true_range', {}), ('true_range', {}),
+]
+
+
+def ragged_histories(make_bars) -> dict[str, pd.core.frame.DataFrame] :
+    """Symbols with different first and last bars, gaps and one history too short for most indicators.
+    """
+    histories = {}
+    for j in range(8) :
+        df = make_bars(800 - 37 * j, seed=j)
+        if j % 3 == 1 :
+            df = df.iloc[:-50]
+        if j % 4 == 2 :
+            df = df.drop(df.index[200:210])
+        histories[f'S{j}'] = df
+    histories['SHORT'] = make_bars(20, seed=99)
+    return histories
+
+
+def test_panel_matches_pipeline_per_symbol(make_bars) :
+    histories = ragged_histories(make_bars)
+    panel = run_panel(to_panel(histories, 'High'), to_panel(histories, 'Low'), to_panel(histories, 'Close'), SPECS)
+    for symbol, df in histories.items() :
+        if len(df) < 40 :
+            assert panel['ADX14'][symbol].isna().all()
+            continue
+        ref = run_pipeline(df, SPECS)
+        assert set(ref.columns) == set(panel)
+        for col in ref.columns :
+            values = panel[col][symbol]
+            assert np.array_equal(values.reindex(df.index).to_numpy(), ref[col].to_numpy(), equal_nan=True), (symbol, col)
+            # Timestamps without a bar of this symbol stay empty.
+            assert values.drop(df.index).isna().all(), (symbol, col)
@@ -0,0 +1,45 @@
+import collections
+
+import numpy as np
+import pytest
+
+import stockview
+from indicators import pipeline
+from indicators.pipeline import run_pipeline, output_columns
+
+
+# run_pipeline is the reference of the panel, chunked and streaming tests, so it is checked here against the add_*
+# functions, and its plan against computing every shared intermediate once.
+
+SPECS = stockview.indicators + [
+    ('ema', {'n_smooth': 12}), ('true_range', {'tr_factor': 14}), ('average_true_range', {'window_size': 20}),
+    ('adx', {'n_smooth': 5}), ('bollinger_bands', {'sma_window': 50, 'factor': 1.5}),
+]
+
+
+@pytest.mark.parametrize('nan_row', [None, 400])
+def test_pipeline_matches_add_functions(bars, nan_bar, nan_row) :
+    df = bars if nan_row is None else nan_bar(bars, nan_row)
+    res = run_pipeline(df, SPECS)
+    for name, params in SPECS :
+        ref = df.copy()
+        pipeline._INDICATORS[name][0](ref, **params)
+        for col in output_columns(name, params) :
+            assert np.array_equal(res[col].to_numpy(), ref[col].to_numpy(), equal_nan=True), (name, col)
+
+
+def test_shared_nodes_are_computed_once(bars, monkeypatch) :
+    calls = collections.Counter()
+    for kind, (compute, deps) in pipeline._NODES.items() :
+        def counted(df, results, *params, kind=kind, compute=compute) :
+            calls[(kind,) + params] += 1
+            return compute(df, results, *params)
+        monkeypatch.setitem(pipeline._NODES, kind, (counted, deps))
+
+    run_pipeline(bars, SPECS)
+    # TR1 feeds TR14, TR5 and ATR20, EMA12 the ema spec and MACD, SMA50 the sma spec and a Bollinger band.
+    assert calls[('TR1',)] == 1
+    assert calls[('EMA', 12)] == 1 and calls[('EMA', 26)] == 1 and calls[('EMA', 20)] == 1
+    assert calls[('ATR', 20)] == 1 and calls[('TR', 14)] == 1 and calls[('SMA', 50)] == 1
+    assert set(calls.values()) == {1}
+    assert len(calls) == len(pipeline.plan(SPECS))
@@ -0,0 +1,95 @@
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.collections import LineCollection
+
+from common.plotting import line_points, thin, bar_collection, x_values
+from indicators import trend_indicators
+from indicators.trend_indicators import add_adx, adx_crossovers, plot_adx
+
+
+matplotlib.use('Agg')
+
+
+# Downsampling (see common/plotting.py): every bucket of the thinned lines and merged bars must keep the extremes
+# of the full series, so the chart looks the same.
+
+
+def buckets(n: int, max_points: int) -> list[slice] :
+    size = -(-n // max_points)
+    return [slice(start, min(start + size, n)) for start in range(0, n, size)]
+
+
+@pytest.fixture
+def series() -> pd.core.frame.DataFrame :
+    rng = np.random.default_rng(0)
+    n = 5003
+    df = pd.DataFrame({'a': np.cumsum(rng.standard_normal(n)), 'b': rng.standard_normal(n)},
+        index=pd.date_range('2000-01-03', periods=n, freq='B'))
+    df.iloc[100:400, 0] = np.nan  # buckets without values
+    df.iloc[1000:1003, 1] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('max_points', [1, 37, 500, 2600])
+def test_thin_keeps_first_last_min_and_max_of_every_bucket(series, max_points) :
+    lines = thin(series, ['a', 'b'], max_points)
+    assert lines.index.is_monotonic_increasing and lines.index.is_unique
+    kept = set(lines.index)
+    for bucket in buckets(len(series), max_points) :
+        full = series.iloc[bucket]
+        assert full.index[0] in kept and full.index[-1] in kept
+        part = lines.loc[full.index[0]:full.index[-1]]
+        for col in ('a', 'b') :
+            if full[col].notna().any() :
+                assert part[col].min() == full[col].min() and part[col].max() == full[col].max()
+
+
+def test_short_series_are_not_thinned(series) :
+    assert np.array_equal(line_points([series['a']], len(series)), np.arange(len(series)))
+    assert thin(series, ['a'], None) is series
+
+
+@pytest.mark.parametrize('max_points', [37, 500])
+def test_merged_bars_span_every_bucket(series, max_points) :
+    low = series['b'].fillna(0) - 1
+    height = np.abs(series['a'].to_numpy())
+    fig, ax = plt.subplots()
+    try :
+        collection = bar_collection(ax, series.index, height=height, bottom=low, width=0.8, max_points=max_points)
+        verts = [path.vertices[:4] for path in collection.get_paths()]
+    finally :
+        plt.close(fig)
+
+    x = x_values(series.index)
+    expected = []
+    for bucket in buckets(len(series), max_points) :
+        lo, hi = low.to_numpy()[bucket], (low.to_numpy() + height)[bucket]
+        drawn = ~np.isnan(hi)  # bars with a NaN height are not drawn
+        if not drawn.any() :
+            continue
+        expected.append((x[bucket][0] - 0.4, x[bucket][-1] + 0.4, lo[drawn].min(), hi[drawn].max()))
+    assert len(verts) == len(expected)
+    for v, (left, right, bottom, top) in zip(verts, expected) :
+        assert v[:, 0].min() == pytest.approx(left) and v[:, 0].max() == pytest.approx(right)
+        assert v[:, 1].min() == bottom and v[:, 1].max() == pytest.approx(top, rel=1e-12)
+
+
+def test_adx_signal_days_are_not_downsampled(make_bars, tmp_path, monkeypatch) :
+    df = make_bars(6000)
+    add_adx(df)
+    drawn = []
+
+    def record(fig, path, name, fmt) :
+        lines = [c for ax in fig.axes for c in ax.collections if isinstance(c, LineCollection)]
+        drawn.append(sorted(seg[0][0] for c in lines[:len(lines) // 2] for seg in c.get_segments()))
+        plt.close(fig)
+
+    monkeypatch.setattr(trend_indicators, 'save_figure', record)
+    plot_adx(str(tmp_path), df, 'AAA', strong_trend=20)
+    plot_adx(str(tmp_path), df, 'AAA', strong_trend=20, downsample=True)
+    buy, sell = adx_crossovers(df, strong_trend=20)
+    assert len(buy) > 0 and len(sell) > 0
+    assert drawn[0] == drawn[1] == sorted(x_values(buy.append(sell)))
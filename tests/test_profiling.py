@@ -0,0 +1,95 @@
+import json
+import os
+
+import matplotlib
+import pandas as pd
+import pytest
+
+from common import profiling
+from common.get_data import refresh_cache
+from indicators.pipeline import run_pipeline
+from indicators.render import render_batch
+from indicators.trend_indicators import add_adx
+from tests.test_get_data import CountingSource
+
+
+matplotlib.use('Agg')
+
+
+def compute_events(prof: profiling.Profile) -> list[dict] :
+    return [e for e in prof.events if e['stage'] == 'compute']
+
+
+def test_no_events_without_an_active_profile(bars, monkeypatch) :
+    with profiling.profile() as prof :
+        pass
+    assert profiling.active() is None
+    monkeypatch.setattr(profiling.Profile, 'call', lambda *args : pytest.fail('recorded without an active profile'))
+    add_adx(bars)
+    profiling.count('cache_hit', 'AAA')
+    assert prof.events == [] and prof.counters == {}
+
+
+def test_nested_calls(bars) :
+    with profiling.profile() as prof, profiling.symbol('AAA') :
+        add_adx(bars)
+    events = compute_events(prof)
+    # Inner calls finish (and are recorded) first; add_true_range calls add_true_range_one again (which finds TR1).
+    assert [e['name'] for e in events] == ['add_true_range_one', 'add_true_range_one', 'add_true_range', 'add_adx']
+    assert all(e['symbol'] == 'AAA' and e['rows'] == len(bars) and e['pid'] == os.getpid() for e in events)
+    assert events[-1]['seconds'] >= events[0]['seconds'] + events[2]['seconds']
+    assert events[0]['start'] >= events[-1]['start']
+    assert 'bytes' not in events[0]
+
+
+def test_memory(bars) :
+    with profiling.profile(memory=True) as prof :
+        run_pipeline(bars, [('adx', {'n_smooth': 14})])
+    event, = compute_events(prof)
+    assert event['name'] == 'run_pipeline' and event['symbol'] is None and event['bytes'] > 0
+
+
+def test_cache_counters(bars, tmp_path) :
+    source = CountingSource(bars)
+    with profiling.profile() as prof :
+        refresh_cache('AAA', cache_dir=str(tmp_path), source=source)
+        refresh_cache('AAA', cache_dir=str(tmp_path), source=source, max_age=pd.Timedelta(days=36500))
+        refresh_cache('AAA', cache_dir=str(tmp_path), source=source, max_age=pd.Timedelta(0))
+        refresh_cache('BBB', cache_dir=str(tmp_path), source=source)
+    assert prof.counters == {('cache_miss', 'AAA'): 1, ('cache_hit', 'AAA'): 1, ('cache_stale', 'AAA'): 1, ('cache_miss', 'BBB'): 1}
+    cache = [e for e in prof.events if e['name'] == 'refresh_cache']
+    assert [e['symbol'] for e in cache] == ['AAA', 'AAA', 'AAA', 'BBB']
+    assert {e['name'] for e in prof.events if e['stage'] == 'fetch'} == {'get_comp_stock_hist'}
+
+
+def test_chrome_trace(bars, tmp_path) :
+    with profiling.profile() as prof, profiling.symbol('AAA') :
+        add_adx(bars)
+        profiling.count('memo_hit')
+    prof.save(str(tmp_path / 'profile.trace.json'))
+    prof.save(str(tmp_path / 'profile.json'))
+    trace = json.loads((tmp_path / 'profile.trace.json').read_text())
+    assert trace['displayTimeUnit'] == 'ms'
+    spans = [e for e in trace['traceEvents'] if e['ph'] == 'X']
+    instants = [e for e in trace['traceEvents'] if e['ph'] == 'i']
+    assert [e['name'] for e in spans] == ['add_true_range_one', 'add_true_range_one', 'add_true_range', 'add_adx']
+    assert all(e['cat'] == 'compute' and e['ts'] >= 0 and e['dur'] >= 0 and e['args'] == {'symbol': 'AAA', 'rows': len(bars)} for e in spans)
+    assert min(e['ts'] for e in trace['traceEvents']) == 0
+    assert instants == [{'name': 'memo_hit', 'cat': 'counter', 'ph': 'i', 's': 't', 'ts': instants[0]['ts'],
+        'pid': os.getpid(), 'tid': instants[0]['tid'], 'args': {'symbol': 'AAA'}}]
+    saved = json.loads((tmp_path / 'profile.json').read_text())
+    assert len(saved['events']) == 5 and saved['counters'] == [{'name': 'memo_hit', 'symbol': 'AAA', 'count': 1}]
+
+
+def test_render_batch_merges_worker_events(bars, tmp_path) :
+    df = bars.join(run_pipeline(bars, [('macd', {}), ('donchian_channel', {})]))
+    jobs = [('AAA', 'macd', df, {}), ('BBB', 'macd', df, {}), ('CCC', 'donchian_channel', df, {})]
+    with profiling.profile() as prof :
+        files, failures = render_batch(jobs, str(tmp_path), fmt='png', max_workers=2)
+    assert failures == {} and len(files) == 3
+    plots = [e for e in prof.events if e['stage'] == 'plot']
+    assert sorted(e['symbol'] for e in plots) == ['AAA', 'BBB', 'CCC']
+    assert all(e['pid'] != os.getpid() for e in plots)
+    assert len([e for e in prof.events if e['stage'] == 'save']) == 3
+    run, = [e for e in prof.events if e['stage'] == 'run']
+    assert run['name'] == 'render_batch' and run['pid'] == os.getpid()
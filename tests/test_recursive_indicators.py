@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import kernels
+from indicators.moving_average import add_ema
+from indicators.trend_indicators import add_true_range, add_adx
+from tests.test_trend_indicators import old_true_range_one, old_directional_movement, assert_same
+
+
+# The recursive indicators (EMA, TRn, DMn, ADXn) share the smoothing kernel of indicators/kernels.py and must give
+# bit for bit the values of the former iloc loops, which are kept here as reference (with 14 replaced by n).
+
+
+def old_ema(df: pd.core.frame.DataFrame, n_smooth: int, refcol: str = 'Close') -> pd.Series :
+    sf = 2 / (n_smooth + 1)
+    ema = pd.Series(0.0, index=df.index)
+    ema.iloc[0] = df.iloc[0][refcol]
+    for i in range(1, len(df)):
+        ema.iloc[i] = df.iloc[i][refcol] * sf + (1 - sf) * ema.iloc[i-1]
+    return ema
+
+
+def old_wilder(df: pd.core.frame.DataFrame, col: str, n: int) -> pd.Series :
+    out = pd.Series(float("NaN"), index=df.index)
+    out.iloc[n] = df[col][1:(n + 1)].sum()
+    for i in range((n + 1), len(df)):
+        out.iloc[i] = out.iloc[i-1] - out.iloc[i-1]/n + df.iloc[i][col]
+    return out
+
+
+def old_adx(df: pd.core.frame.DataFrame, n: int) -> dict[str, pd.Series] :
+    df = df.copy()
+    df['TR1'] = old_true_range_one(df)
+    df['DMplus'], df['DMminus'] = old_directional_movement(df)
+    res = {f'TR{n}': old_wilder(df, 'TR1', n), f'DM{n}plus': old_wilder(df, 'DMplus', n), f'DM{n}minus': old_wilder(df, 'DMminus', n)}
+    res[f'DI{n}minus'] = 100 * res[f'DM{n}minus'] / res[f'TR{n}']
+    res[f'DI{n}plus'] = 100 * res[f'DM{n}plus'] / res[f'TR{n}']
+    res['DX'] = dx = 100 * abs((res[f'DI{n}plus'] - res[f'DI{n}minus']) / (res[f'DI{n}plus'] + res[f'DI{n}minus']))
+    adx = pd.Series(float("NaN"), index=df.index)
+    adx.iloc[2*n] = dx[n:(2*n + 1)].mean()
+    for i in range((2*n + 1), len(df)):
+        adx.iloc[i] = ((n - 1) * adx.iloc[i-1] + dx.iloc[i]) / n
+    res[f'ADX{n}'] = adx
+    return res
+
+
+@pytest.fixture(params=['numba', 'python'])
+def kernel(request, monkeypatch) :
+    """Run the test with the compiled loops and with the plain Python fallback (numba not installed).
+    """
+    if request.param == 'numba' :
+        pytest.importorskip('numba')
+    else :
+        monkeypatch.setattr(kernels, '_numba', False)
+        for name in ('_filter_loop', '_filter_loop_2d') :
+            loop = getattr(kernels, name)
+            monkeypatch.setattr(kernels, name, getattr(loop, 'py_func', loop))
+    return request.param
+
+
+@pytest.fixture(params=[None, 400])
+def df(request, bars, nan_bar) :
+    return bars if request.param is None else nan_bar(bars, request.param)
+
+
+@pytest.mark.parametrize('n_smooth', [9, 12, 26])
+def test_ema(kernel, df, n_smooth) :
+    add_ema(df, n_smooth)
+    assert_same(df[f'EMA{n_smooth}'], old_ema(df, n_smooth))
+
+
+def test_ema_of_column(kernel, bars) :
+    bars['MACD'] = bars['Close'] - bars['Open']
+    add_ema(bars, 9, refcol='MACD', colname='trigger')
+    assert_same(bars['trigger'], old_ema(bars, 9, refcol='MACD'))
+
+
+@pytest.mark.parametrize('n_smooth', [14, 5, 20])
+def test_adx(kernel, df, n_smooth) :
+    ref = old_adx(df, n_smooth)
+    add_adx(df, n_smooth=n_smooth)
+    for col, values in ref.items() :
+        assert_same(df[col], values)
+    assert df[f'ADX{n_smooth}'].notna().sum() > 0
+
+
+def test_true_range(kernel, df) :
+    ref = old_wilder(df.assign(TR1=old_true_range_one(df)), 'TR1', 14)
+    add_true_range(df, 14)
+    assert_same(df['TR14'], ref)
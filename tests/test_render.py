@@ -0,0 +1,35 @@
+import matplotlib
+import matplotlib.pyplot as plt
+import pytest
+
+from indicators.pipeline import run_pipeline
+from indicators.render import render_batch
+from indicators.price_channels import plot_bollinger_bands
+import stockview
+
+
+matplotlib.use('Agg')
+
+
+@pytest.fixture
+def full(bars) :
+    return bars.join(run_pipeline(bars, stockview.indicators))
+
+
+def test_failed_jobs_close_their_figures(full, tmp_path) :
+    plt.close('all')
+    # The indicator columns of these charts are missing, so they fail after their figure has been opened.
+    jobs = [('AAA', 'macd', full, {'fast': 8}), ('AAA', 'donchian_channel', full, {'window_size': 5}),
+        ('AAA', 'average', full, {'indicators': ['SMA7']}), ('AAA', 'adx', full, {})]
+    files, failures = render_batch(jobs, str(tmp_path), fmt='png', max_workers=1)
+    assert set(failures) == {('AAA', 'macd'), ('AAA', 'donchian_channel'), ('AAA', 'average')} and len(files) == 1
+    assert plt.get_fignums() == []
+
+
+def test_open_figures_of_the_caller_are_kept(full, tmp_path) :
+    plt.close('all')
+    fig = plt.figure()
+    with pytest.raises(KeyError) :
+        plot_bollinger_bands(str(tmp_path), full, 'AAA', sma_window=5, fmt='png')
+    assert plt.get_fignums() == [fig.number]
+    plt.close(fig)
@@ -0,0 +1,15 @@
+from benchmarks.startup import check_startup
+
+
+# The import budget of the compute-only API (see benchmarks/startup.py), checked in fresh interpreters.
+
+
+def test_compute_imports_within_budget() :
+    result, = check_startup(['indicators.compute'])
+    assert result['forbidden'] == []
+    assert result['violations'] == []
+
+
+def test_batch_loads_no_plotting_or_compiler() :
+    result, = check_startup(['batch'], repeat=1)
+    assert result['forbidden'] == []
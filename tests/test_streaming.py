@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators.pipeline import run_pipeline
+from indicators.streaming import (StreamingIndicator, StreamingSMA, StreamingEMA, StreamingWMA, StreamingATR, StreamingADX,
+    StreamingMACD, StreamingBollingerBands, StreamingDonchianChannel, StreamingKeltnerChannel)
+
+
+# Every streaming indicator against the batch pipeline: same NaN positions, the same values (exact for the
+# recursive indicators and Donchian, up to rounding of the running sums for the window indicators).
+
+INDICATORS = [
+    (StreamingSMA, {'window_size': 20}, ('sma', {'window_size': 20})),
+    (StreamingEMA, {'n_smooth': 10}, ('ema', {'n_smooth': 10})),
+    (StreamingWMA, {'window_size': 5}, ('wma', {'window_size': 5})),
+    (StreamingATR, {'window_size': 20}, ('average_true_range', {'window_size': 20})),
+    (StreamingADX, {'n_smooth': 14}, ('adx', {'n_smooth': 14})),
+    (StreamingMACD, {'fast': 12, 'slow': 26}, ('macd', {'fast': 12, 'slow': 26})),
+    (StreamingBollingerBands, {'sma_window': 20, 'factor': 2}, ('bollinger_bands', {'sma_window': 20, 'factor': 2})),
+    (StreamingDonchianChannel, {'window_size': 20}, ('donchian_channel', {'window_size': 20})),
+    (StreamingKeltnerChannel, {'ema_window': 20, 'atr_range': 20, 'atr_factor': 2.0},
+        ('keltner_channel', {'ema_window': 20, 'atr_range': 20, 'atr_factor': 2.0})),
+]
+EXACT = (StreamingEMA, StreamingADX, StreamingMACD, StreamingDonchianChannel)
+
+
+def stream(cls, params: dict, df: pd.core.frame.DataFrame) -> pd.core.frame.DataFrame :
+    """Streaming values of df: a micro-batch, single bars after a JSON round trip of the state, another micro-batch.
+    """
+    first, second = len(df) // 3, len(df) // 3 + 50
+    ind = cls(**params)
+    head = ind.update_many(df.iloc[:first])
+    ind = StreamingIndicator.from_state(json.loads(json.dumps(ind.state_dict())))
+    rows = pd.DataFrame([ind.update(bar) for _, bar in df.iloc[first:second].iterrows()], index=df.index[first:second])
+    return pd.concat([head, rows, ind.update_many(df.iloc[second:])])
+
+
+def assert_matches(cls, streamed: pd.core.frame.DataFrame, batch: pd.core.frame.DataFrame) :
+    for col in streamed.columns :
+        x, y = streamed[col].to_numpy(), batch[col].to_numpy()
+        assert np.array_equal(np.isnan(x), np.isnan(y)), f'{cls.__name__} {col}: NaN at {np.flatnonzero(np.isnan(x) != np.isnan(y))}'
+        if cls in EXACT :
+            assert np.array_equal(x, y, equal_nan=True), col
+        else :
+            np.testing.assert_allclose(x, y, rtol=1e-9, atol=1e-9, err_msg=col)
+
+
+@pytest.mark.parametrize('cls, params, spec', INDICATORS)
+def test_streaming_matches_batch(bars, cls, params, spec) :
+    assert_matches(cls, stream(cls, params, bars), run_pipeline(bars, [spec]))
+
+
+@pytest.mark.parametrize('cls, params, spec', INDICATORS)
+@pytest.mark.parametrize('rows', [[400], [400, 401, 410]])
+def test_streaming_matches_batch_with_nan_bars(bars, nan_bar, cls, params, spec, rows) :
+    for row in rows :
+        bars = nan_bar(bars, row)
+    assert_matches(cls, stream(cls, params, bars), run_pipeline(bars, [spec]))
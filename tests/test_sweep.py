@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from indicators import sweep
+from indicators.sweep import sweep_sma, sweep_wma, sweep_ema, sweep_donchian_channel, sweep_bollinger_bands, sweep_keltner_channel
+from indicators.moving_average import exponential_moving_average, weighted_moving_average
+from indicators.price_channels import add_bollinger_bands, add_keltner_channel
+
+
+# Every row of a sweep against the add_* function with the same parameters: exact for Donchian and EMA,
+# up to the rounding of the (blockwise restarted) prefix sums for the window indicators.
+
+WINDOWS = [2, 5, 10, 20, 50, 100, 200]
+
+
+def assert_close(a: np.ndarray, b: np.ndarray) :
+    assert np.array_equal(np.isnan(a), np.isnan(b))
+    np.testing.assert_allclose(a, b, rtol=1e-9, atol=0)
+
+
+@pytest.fixture(params=[sweep._BLOCK, 100], ids=['default-block', 'small-block'])
+def df(request, make_bars, nan_bar, monkeypatch) :
+    monkeypatch.setattr(sweep, '_BLOCK', request.param)
+    return nan_bar(make_bars(3000, seed=5), 1000)
+
+
+def test_sweep_moving_averages(df) :
+    sma, wma = sweep_sma(df['Close'], WINDOWS), sweep_wma(df['Close'], WINDOWS)
+    for i, n in enumerate(WINDOWS) :
+        assert sma.params[i] == {'window_size': n}
+        assert_close(sma.values['SMA'][i], df['Close'].rolling(n, min_periods=n).mean().to_numpy())
+        assert_close(wma.values['WMA'][i], weighted_moving_average(df['Close'], n).to_numpy())
+
+
+def test_sweep_ema(df) :
+    close = df['Close'].ffill()
+    ema = sweep_ema(close, WINDOWS)
+    for i, n in enumerate(WINDOWS) :
+        assert np.array_equal(ema.values['EMA'][i], exponential_moving_average(close, n))
+
+
+def test_sweep_donchian_channel(df) :
+    res = sweep_donchian_channel(df['High'], df['Low'], WINDOWS)
+    for i, n in enumerate(WINDOWS) :
+        assert np.array_equal(res.values['MAX'][i], df['High'].rolling(n).max().to_numpy(), equal_nan=True)
+        assert np.array_equal(res.values['MIN'][i], df['Low'].rolling(n).min().to_numpy(), equal_nan=True)
+
+
+def test_sweep_bollinger_bands(df) :
+    res = sweep_bollinger_bands(df['Close'], sma_windows=[10, 20, 30], factors=[1.5, 2, 2.5])
+    assert len(res.params) == 9
+    for i, p in enumerate(res.params) :
+        ref = df[['High', 'Low', 'Close']].copy()
+        add_bollinger_bands(ref, **p)
+        assert_close(res.values['upper'][i], ref[f"BBand-upper-{p['sma_window']}-{p['factor']}"].to_numpy())
+        assert_close(res.values['lower'][i], ref[f"BBand-lower-{p['sma_window']}-{p['factor']}"].to_numpy())
+
+
+def test_sweep_keltner_channel(df) :
+    res = sweep_keltner_channel(df['High'], df['Low'], df['Close'], ema_windows=[10, 20], atr_ranges=[14, 20], atr_factors=[1.5, 2.0])
+    assert len(res.params) == 8
+    for i, p in enumerate(res.params) :
+        ref = df[['High', 'Low', 'Close']].copy()
+        add_keltner_channel(ref, **p)
+        assert_close(res.values['upper'][i], ref[f"Keltner-upper-{p['ema_window']}-{p['atr_range']}"].to_numpy())
+        assert_close(res.values['lower'][i], ref[f"Keltner-lower-{p['ema_window']}-{p['atr_range']}"].to_numpy())
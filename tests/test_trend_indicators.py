@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators.trend_indicators import add_true_range_one, add_adx, add_macd, macd_histogram, adx_crossovers
+
+
+# The column operations must give bit for bit the values of the former row-wise DataFrame.apply implementations,
+# which are kept here as reference.
+
+
+def old_true_range_one(df: pd.core.frame.DataFrame) -> pd.Series :
+    temp_df = pd.DataFrame(index=df.index)
+    temp_df['Th_Tl'] = df['High'] - df['Low']
+    temp_df['Th_Yc'] = df['High'] - df['Close'].shift(1)
+    temp_df['Tl_Yc'] = df['Low'] - df['Close'].shift(1)
+    return temp_df.iloc[1:].apply(lambda row: max(row['Th_Tl'], abs(row['Th_Yc']), abs(row['Tl_Yc'])), axis=1).reindex(df.index)
+
+
+def old_directional_movement(df: pd.core.frame.DataFrame) -> tuple[pd.Series, pd.Series] :
+    temp_df = pd.DataFrame(index=df.index)
+    temp_df['UpMove'] = df['High'] - df['High'].shift(1)
+    temp_df['DownMove'] = df['Low'].shift(1) - df['Low']
+    dm_plus = temp_df.iloc[1:].apply(lambda row: row['UpMove'] if row['UpMove'] > row['DownMove'] and row['UpMove'] > 0 else 0.0, axis=1)
+    dm_minus = temp_df.iloc[1:].apply(lambda row: row['DownMove'] if row['DownMove'] > row['UpMove'] and row['DownMove'] > 0 else 0.0, axis=1)
+    return dm_plus.reindex(df.index), dm_minus.reindex(df.index)
+
+
+def old_macd_histogram(df: pd.core.frame.DataFrame, fast: int = 12, slow: int = 26) -> pd.core.frame.DataFrame :
+    macd, trigger = f'MACD{fast}-{slow}', f'MACD{fast}-{slow}-trigger-{9}'
+    tmp_df = pd.DataFrame(index=df.index)
+    tmp_df['diff_pos'] = df.apply(lambda row: row[macd] - row[trigger] if row[macd] - row[trigger] > 0 else 0, axis=1)
+    tmp_df['diff_neg'] = df.apply(lambda row: row[macd] - row[trigger] if row[macd] - row[trigger] < 0 else 0, axis=1)
+    return tmp_df
+
+
+def old_adx_crossovers(df: pd.core.frame.DataFrame, adx_num: int = 14, strong_trend: int = 25) -> tuple[list, list] :
+    tmp_df = pd.DataFrame(index=df.index)
+    tmp_df['diff'] = df.apply(lambda row: 1 if row[f'DI{adx_num}plus'] > row[f'DI{adx_num}minus'] else 0, axis=1)
+    tmp_df['crossover'] = tmp_df['diff'] - tmp_df['diff'].shift(1)
+    buy = [day for day in tmp_df.loc[tmp_df['crossover'] == 1].index if df.loc[day][f'ADX{adx_num}'] > strong_trend]
+    sell = [day for day in tmp_df.loc[tmp_df['crossover'] == -1].index if df.loc[day][f'ADX{adx_num}'] > strong_trend]
+    return buy, sell
+
+
+def assert_same(new, old) :
+    new, old = np.asarray(new, dtype=np.float64), np.asarray(old, dtype=np.float64)
+    assert np.array_equal(new, old, equal_nan=True)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_true_range_one(make_bars, seed) :
+    df = make_bars(seed=seed)
+    add_true_range_one(df)
+    assert_same(df['TR1'], old_true_range_one(df))
+
+
+@pytest.mark.parametrize('rows', [[400], [400, 401], [0], [400, 410, 411]])
+def test_true_range_one_after_missing_bars(bars, nan_bar, rows) :
+    # The bar after a missing bar has no previous close; max() then keeps High - Low.
+    df = bars
+    for row in rows :
+        df = nan_bar(df, row)
+    add_true_range_one(df)
+    assert_same(df['TR1'], old_true_range_one(df))
+    assert df['TR1'].iloc[rows[-1] + 1] == df['High'].iloc[rows[-1] + 1] - df['Low'].iloc[rows[-1] + 1]
+
+
+def test_close_missing(bars) :
+    bars.iloc[400, bars.columns.get_loc('Close')] = np.nan
+    add_true_range_one(bars)
+    assert_same(bars['TR1'], old_true_range_one(bars))
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_directional_movement(make_bars, seed) :
+    df = make_bars(seed=seed)
+    dm_plus, dm_minus = old_directional_movement(df)
+    add_adx(df)
+    assert_same(df['DMplus'], dm_plus)
+    assert_same(df['DMminus'], dm_minus)
+
+
+def test_directional_movement_after_missing_bar(bars, nan_bar) :
+    df = nan_bar(bars, 400)
+    dm_plus, dm_minus = old_directional_movement(df)
+    add_adx(df)
+    assert_same(df['DMplus'], dm_plus)
+    assert_same(df['DMminus'], dm_minus)
+
+
+def test_directional_movement_ties(bars) :
+    # UpMove == DownMove (highs and lows move apart by the same amount) gives no directional movement.
+    bars.iloc[100:120, bars.columns.get_loc('High')] = 100.0 + np.arange(20) % 2
+    bars.iloc[100:120, bars.columns.get_loc('Low')] = 99.0 - np.arange(20) % 2
+    dm_plus, dm_minus = old_directional_movement(bars)
+    add_adx(bars)
+    assert (bars['DMplus'].iloc[101:120] == 0).all() and (bars['DMminus'].iloc[101:120] == 0).all()
+    assert_same(bars['DMplus'], dm_plus)
+    assert_same(bars['DMminus'], dm_minus)
+
+
+@pytest.mark.parametrize('seed, nan_row', [(0, None), (1, None), (2, None), (0, 400)])
+def test_macd_histogram(make_bars, nan_bar, seed, nan_row) :
+    df = make_bars(seed=seed)
+    if nan_row is not None :
+        df = nan_bar(df, nan_row)
+    add_macd(df)
+    new, old = macd_histogram(df), old_macd_histogram(df)
+    assert_same(new['diff_pos'], old['diff_pos'])
+    assert_same(new['diff_neg'], old['diff_neg'])
+
+
+@pytest.mark.parametrize('strong_trend', [0, 20, 25])
+def test_adx_crossovers(bars, strong_trend) :
+    add_adx(bars)
+    buy, sell = adx_crossovers(bars, strong_trend=strong_trend)
+    old_buy, old_sell = old_adx_crossovers(bars, strong_trend=strong_trend)
+    assert len(old_buy) > 0 and len(old_sell) > 0
+    assert list(buy) == old_buy
+    assert list(sell) == old_sell